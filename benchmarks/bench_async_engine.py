@@ -0,0 +1,80 @@
+"""
+Threaded vs asyncio EventEngine latency benchmark
+
+Mimics the tick -> strategy -> order path of TradingSystem: a producer on
+the asyncio loop puts TickEvents into the market engine, the tick handler
+puts an OrderEvent into the action engine, and the order handler records
+the time since the tick was put. Threaded mode uses two EventEngines (one
+thread each, as TradingSystem does by default), async mode a single
+AsyncEventEngine on the producer's loop.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_async_engine [n_ticks] [ticks_per_second]
+"""
+import asyncio
+import sys
+import time
+
+from src.events import EventType, Exchange, OrderDir, OrderEvent, OrderType, TickEvent
+from src.events_engine import AsyncEventEngine, EventEngine
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+async def bench(mkt_engine, action_engine, n, rate):
+    tick_latency, order_latency = [], []
+    put_ns = {}  # tick timestamp -> time it was put
+    done = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    def on_tick(event):
+        tick_latency.append(time.perf_counter_ns() - put_ns[event.timestamp])
+        order = OrderEvent(1, event.sym, OrderType.LMT, OrderDir.BID, 1.0, event.bid_p)
+        order.oid = event.timestamp
+        action_engine.put(order)
+
+    def on_order(event):
+        order_latency.append(time.perf_counter_ns() - put_ns[event.oid])
+        if len(order_latency) == n:
+            loop.call_soon_threadsafe(done.set)
+
+    mkt_engine.register_handler(EventType.TICK, on_tick)
+    action_engine.register_handler(EventType.ORDER, on_order)
+    for engine in {mkt_engine, action_engine}:
+        engine.start()
+
+    interval = 1 / rate
+    for i in range(n):
+        tick = TickEvent("XBTMYR", Exchange.LUNO, "XBTMYR.luno", i, 1.0, 2.0)
+        put_ns[i] = time.perf_counter_ns()
+        mkt_engine.put(tick)
+        await asyncio.sleep(interval)
+    await done.wait()
+    for engine in {mkt_engine, action_engine}:
+        engine.stop()
+    return tick_latency, order_latency
+
+
+async def run_async(n, rate):
+    engine = AsyncEventEngine()
+    return await bench(engine, engine, n, rate)
+
+
+async def run_threaded(n, rate):
+    return await bench(EventEngine(), EventEngine(), n, rate)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print(f"{n} ticks at {rate:g}/s")
+    for name, run in (("threaded", run_threaded), ("async", run_async)):
+        tick_latency, order_latency = asyncio.run(run(n, rate))
+        for stage, values in (("put -> tick handler", tick_latency), ("tick put -> order handler", order_latency)):
+            print(
+                f"  {name:8s} {stage:26s} p50 {percentile(values, 0.5) / 1000:7.1f} us"
+                f"  p99 {percentile(values, 0.99) / 1000:7.1f} us"
+            )
@@ -0,0 +1,71 @@
+"""
+EventEngine throughput benchmark
+
+Reports events per second through a trivial tick handler for single-event
+dispatch and for batch draining (per-event and batch handlers), on a FIFO
+Queue and on a PriorityLaneQueue, in two settings:
+    live   the main thread puts events while the engine runs
+    drain  the queue is filled first, measuring the dispatch side alone
+
+Usage (from the repo root):
+    python -m benchmarks.bench_event_engine [n_events] [batch_size]
+"""
+import sys
+import threading
+import time
+
+from src.events import EventType, Exchange, TickEvent
+from src.events_engine import EventEngine, PriorityLaneQueue
+
+
+def bench(n, batch_size=None, batch_handler=False, lanes=False, prefill=False):
+    queue = PriorityLaneQueue(capacity={"market_data": 0}) if lanes else None
+    engine = EventEngine(queue=queue, batch_size=batch_size)
+    done = threading.Event()
+    handled = [0]
+
+    def on_tick(event):
+        handled[0] += 1
+        if handled[0] == n:
+            done.set()
+
+    def on_ticks(events):
+        handled[0] += len(events)
+        if handled[0] == n:
+            done.set()
+
+    if batch_handler:
+        engine.register_batch_handler(EventType.TICK, on_ticks)
+    else:
+        engine.register_handler(EventType.TICK, on_tick)
+    events = [TickEvent("XBTMYR", Exchange.LUNO, "XBTMYR.luno", i, 1.0, 2.0) for i in range(n)]
+
+    if prefill:
+        for event in events:
+            engine.put(event)
+        start = time.perf_counter()
+        engine.start()
+    else:
+        engine.start()
+        start = time.perf_counter()
+        for event in events:
+            engine.put(event)
+    done.wait()
+    elapsed = time.perf_counter() - start
+    engine.stop()
+    return n / elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print(f"{n} events, batch size {batch_size}")
+    for setting, prefill in (("live", False), ("drain", True)):
+        for queue_name, lanes in (("fifo", False), ("lanes", True)):
+            for mode, kwargs in (
+                ("single", {}),
+                ("batch", dict(batch_size=batch_size)),
+                ("batch handler", dict(batch_size=batch_size, batch_handler=True)),
+            ):
+                rate = bench(n, lanes=lanes, prefill=prefill, **kwargs)
+                print(f"  {setting:6s} {queue_name:6s} {mode:14s} {rate:12,.0f} events/s")
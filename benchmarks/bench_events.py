@@ -0,0 +1,70 @@
+"""
+Event object cost benchmark
+
+Reports, per event class, the creation time, the in-memory size of one
+event (the object plus its __dict__, if it has one), the pickled size (what
+crosses a multiprocessing Queue) and, where available, the encode() size and
+the to_dict()/_dict() and encode/decode times.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_events [n_events]
+"""
+import gc
+import pickle
+import sys
+import time
+
+from src.events import (
+    Exchange,
+    FillEvent,
+    OrderDir,
+    OrderEvent,
+    OrderType,
+    TickEvent,
+    TradeEvent,
+)
+
+FACTORIES = {
+    "TickEvent": lambda i: TickEvent("XBTMYR", Exchange.LUNO, "XBTMYR.luno", 1684972800000 + i, 123456.0, 123457.0, 0.25, 0.5),
+    "TradeEvent": lambda i: TradeEvent("XBTMYR", Exchange.LUNO, "XBTMYR.luno", 1684972800000 + i, 123456.0, 0.01, OrderDir.BID, "BXMC2CJ7HNB88U4", "BXHSYNT3FQ6CPVV"),
+    "OrderEvent": lambda i: OrderEvent(1, "XBTMYR.luno", OrderType.LMT, OrderDir.BID, 0.001, 123456.0),
+    "FillEvent": lambda i: FillEvent(1, "oid-1", "XBTMYR.luno", OrderDir.BID, "0.001", "123.456", "0.000001", 1684972800000, 1684972800500),
+}
+
+
+def per_call_ns(fn, n):
+    gc.collect()
+    start = time.perf_counter_ns()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter_ns() - start) / n
+
+
+def size_of(event):
+    size = sys.getsizeof(event)
+    if hasattr(event, "__dict__"):
+        size += sys.getsizeof(event.__dict__)
+    return size
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"{n} events per measurement")
+    for name, make in FACTORIES.items():
+        event = make(0)
+        to_dict = getattr(event, "to_dict", None) or getattr(event, "_dict", None)
+        line = (
+            f"  {name:10s} create {per_call_ns(make, n):7.0f} ns"
+            f"  object {size_of(event):4d} B  pickled {len(pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)):4d} B"
+        )
+        if to_dict is not None:
+            line += f"  to_dict {per_call_ns(lambda i: to_dict(), n // 10):7.0f} ns"
+        if hasattr(event, "encode"):
+            data = event.encode()
+            cls = type(event)
+            line += (
+                f"  encoded {len(data):4d} B"
+                f"  encode {per_call_ns(lambda i: event.encode(), n):5.0f} ns"
+                f"  decode {per_call_ns(lambda i: cls.decode(data), n):5.0f} ns"
+            )
+        print(line)
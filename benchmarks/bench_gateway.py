@@ -0,0 +1,123 @@
+"""
+Market data gateway benchmark against the local replay server
+
+Streams a recording (or a synthetic one) through ReplayServer ->
+websocket -> MarketDataGateway -> TickEvent and reports end to end
+messages per second plus frame-to-tick latency percentiles. Needs no
+network access.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_gateway [--recording ETHMYR.gz --pair ETHMYR]
+        [--speed N] [--drop 0.001] [--reorder 0.001] [--disconnect-every 50000]
+
+--speed defaults to as fast as possible, 1 replays at recorded pace.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.bench_orderbook import AUTH, synthetic_stream
+from src.marketdata.gateway import MarketDataGateway
+from src.marketdata.recorder import write_recording
+from src.marketdata.replay_server import ReplayServer
+
+
+class TickCounter:
+    """Stands in for the market EventEngine"""
+
+    def __init__(self):
+        self.ticks = 0
+
+    def put(self, event):
+        self.ticks += 1
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float("nan")
+
+
+async def bench(recording, pair, speed, drop, reorder, disconnect_every):
+    server = ReplayServer(
+        {pair: recording},
+        port=0,
+        speed=speed,
+        drop_rate=drop,
+        reorder_rate=reorder,
+        disconnect_every=disconnect_every,
+        seed=1,
+    )
+    await server.start()
+    feed = server.feeds[pair]
+    engine = TickCounter()
+    gateway = MarketDataGateway(
+        AUTH, engine, [f"{pair}.luno"], backoff=0.1, stream_url=server.url
+    )
+    book = gateway.books[f"{pair}.luno"]
+
+    # stamp frame receive time, measure it against the tick the frame produces
+    latencies = []
+    received = [0]
+    process_frame, publish_tick = book.process_frame, gateway.publish_tick
+
+    async def timed_process_frame(msg):
+        received[0] = time.perf_counter_ns()
+        await process_frame(msg)
+
+    def timed_publish_tick(b):
+        publish_tick(b)
+        if received[0]:  # not a tick from a session snapshot
+            latencies.append(time.perf_counter_ns() - received[0])
+            received[0] = 0
+
+    book.process_frame = timed_process_frame
+    book.on_top_of_book = timed_publish_tick
+
+    start = time.perf_counter()
+    task = asyncio.ensure_future(gateway.run())
+    await server.wait_done()
+    feed.snapshot()  # brings feed.sequence up to the end of the recording
+    while book.sequence != feed.sequence and not task.done():
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await server.close()
+
+    n = len(feed.frames) - 1
+    print(f"{n} updates, {pair}, speed {speed or 'max'}, decoder {book.decoder.name}")
+    print(f"  {n / elapsed:12,.0f} msg/s end to end, {engine.ticks} ticks")
+    for q in (0.5, 0.9, 0.99, 0.999):
+        print(f"  p{q * 100:g} frame to tick {percentile(latencies, q) / 1000:8.1f} us")
+    print(f"  server {server.stats}")
+    print(f"  book   {gateway.stats()[f'{pair}.luno']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording")
+    parser.add_argument("--pair", default="XBTMYR")
+    parser.add_argument("--speed", type=float, default=None)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--reorder", type=float, default=0.0)
+    parser.add_argument("--disconnect-every", type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        recording = args.recording
+        if recording is None:
+            recording = os.path.join(tmp, f"{args.pair}.gz")
+            # synthetic frames 1ms apart
+            write_recording(recording, ((i * 1_000_000, f) for i, f in enumerate(synthetic_stream())))
+        asyncio.run(
+            bench(
+                recording,
+                args.pair.upper(),
+                args.speed,
+                args.drop,
+                args.reorder,
+                args.disconnect_every,
+            )
+        )
@@ -0,0 +1,108 @@
+"""
+Luno REST client latency benchmark
+
+Places limit orders against a local keep-alive HTTP/1.1 server standing in
+for api.luno.com (replying after `delay_ms`), with luno_python's Client
+(through requests) and with AsyncLunoClient: sequential blocking calls from
+a thread as StrategyManager makes them, then `concurrency` orders at a time
+from the loop. Reports p50/p99 per call and orders per second.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_luno_rest [n_orders] [delay_ms] [concurrency]
+"""
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from luno_python.client import Client
+
+from src.brokerage.luno.async_client import AsyncLunoClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    body = json.dumps({"order_id": "BXMC2CJ7HNB88U4"}).encode()
+
+    def _reply(self):
+        if self.delay:
+            time.sleep(self.delay)
+        # one write, headers and body in separate segments stall on delayed ACKs
+        self.wfile.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+            % (len(self.body), self.body)
+        )
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def report(name, latencies, elapsed):
+    print(
+        f"  {name:34s} p50 {percentile(latencies, 0.5) / 1000:8.1f} us"
+        f"  p99 {percentile(latencies, 0.99) / 1000:8.1f} us  {len(latencies) / elapsed:8.0f} orders/s"
+    )
+
+
+def order(i):
+    return dict(pair="XBTMYR", price=123456.0, type="BID", volume=0.001, client_order_id=f"bench-{i}", post_only=True)
+
+
+def sequential(place, n):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n):
+        t = time.perf_counter_ns()
+        place(**order(i))
+        latencies.append(time.perf_counter_ns() - t)
+    return latencies, time.perf_counter() - start
+
+
+async def concurrent(client, n, concurrency):
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with limit:
+            t = time.perf_counter_ns()
+            await client.post_limit_order(**order(i))
+            latencies.append(time.perf_counter_ns() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    delay_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    _Handler.delay = delay_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"{n} limit orders, server delay {delay_ms} ms")
+
+    sync_client = Client(base_url=base_url, api_key_id="id", api_key_secret="secret")
+    report("luno_python Client", *sequential(sync_client.post_limit_order, n))
+
+    async_client = AsyncLunoClient("id", "secret", base_url=base_url, pool_size=concurrency)
+    report("AsyncLunoClient, blocking calls", *sequential(async_client.blocking().post_limit_order, n))
+    report(
+        f"AsyncLunoClient, {concurrency} in flight",
+        *asyncio.run(concurrent(async_client, n, concurrency)),
+    )
+    print(f"  AsyncLunoClient opened {async_client.connections} connections for {async_client.requests} requests")
+    async_client.close()
+    server.shutdown()
@@ -0,0 +1,109 @@
+"""
+Order book throughput benchmark
+
+Replays a stream through orderBook.process_frame (decode, apply, features,
+top of book check) and reports messages per second for each available
+decoder, in Decimal and fixed-point mode.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_orderbook [frames_file] [pair]
+
+frames_file is a recording from src/marketdata/recorder.py (.gz) or a file
+with one raw frame per line, the first being the snapshot. Without it a
+synthetic stream is generated.
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from src.marketdata.recorder import read_frames
+from src.orderbook.decoder import DECODERS
+from src.orderbook.orderbook import orderBook
+
+AUTH = {"luno_key_id": "", "luno_key_secret": ""}
+
+
+def synthetic_stream(n_orders=20000, n_updates=200000, seed=1):
+    """Snapshot + updates around a 10000.00 mid with a realistic create/delete/trade mix"""
+    rng = random.Random(seed)
+    next_id = 0
+    live = {}  # id -> (type, price, volume)
+
+    def new_order():
+        nonlocal next_id
+        side = "BID" if rng.random() < 0.5 else "ASK"
+        ticks = int(rng.expovariate(1 / 50))
+        price = 999900 - ticks if side == "BID" else 1000100 + ticks
+        order = (side, f"{price // 100}.{price % 100:02d}", f"{rng.randint(1, 50000) / 10000:.4f}")
+        next_id += 1
+        return f"BX{next_id:013d}", order
+
+    for _ in range(n_orders):
+        order_id, order = new_order()
+        live[order_id] = order
+    snapshot = {
+        "sequence": "1",
+        "timestamp": 0,
+        "bids": [{"id": k, "price": p, "volume": v} for k, (t, p, v) in live.items() if t == "BID"],
+        "asks": [{"id": k, "price": p, "volume": v} for k, (t, p, v) in live.items() if t == "ASK"],
+    }
+    frames = [json.dumps(snapshot)]
+    ids = list(live)
+    for seq in range(2, n_updates + 2):
+        update = {
+            "sequence": str(seq),
+            "trade_updates": None,
+            "create_update": None,
+            "delete_update": None,
+            "status_update": None,
+            "timestamp": seq,
+        }
+        r = rng.random()
+        if r < 0.5 or len(ids) < 100:
+            order_id, (t, p, v) = new_order()
+            live[order_id] = (t, p, v)
+            ids.append(order_id)
+            update["create_update"] = {"order_id": order_id, "type": t, "price": p, "volume": v}
+        else:
+            idx = rng.randrange(len(ids))
+            order_id = ids[idx]
+            ids[idx] = ids[-1]
+            ids.pop()
+            t, p, v = live.pop(order_id)
+            if r < 0.9:
+                update["delete_update"] = {"order_id": order_id}
+            else:
+                counter = f"{float(p) * float(v):.2f}"
+                update["trade_updates"] = [
+                    {"base": v, "counter": counter, "maker_order_id": order_id, "taker_order_id": "BXTAKER"}
+                ]
+        frames.append(json.dumps(update))
+    return frames
+
+
+async def replay(book: orderBook, frames):
+    book.load_snapshot(book.decoder.loads(frames[0]))
+    start = time.perf_counter()
+    for frame in frames[1:]:
+        await book.process_frame(frame)
+    return time.perf_counter() - start
+
+
+def run(frames, pair="XBTMYR", price_scale=2, volume_scale=4):
+    n = len(frames) - 1
+    print(f"{n} updates, {pair}")
+    for decoder in DECODERS:
+        for mode, scales in (("decimal", {}), ("fixed", dict(price_scale=price_scale, volume_scale=volume_scale))):
+            book = orderBook(AUTH, pair, decoder=decoder, **scales)
+            elapsed = asyncio.run(replay(book, frames))
+            print(f"  {decoder:8s} {mode:8s} {n / elapsed:12,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        frames = [f for f in read_frames(sys.argv[1]) if f != '""']  # drop keep alives
+        run(frames, pair=sys.argv[2] if len(sys.argv) > 2 else "XBTMYR")
+    else:
+        run(synthetic_stream())
@@ -1,7 +1,6 @@
 import os
 import time
 import yaml
-import importlib
 import logging
 import datetime
 import pathlib
@@ -10,25 +9,100 @@ from logging.handlers import SysLogHandler
 
 from dotenv import dotenv_values
 from src.brokerage.luno.luno import Luno
+from src.brokerage.luno.user_stream import LunoUserStream
 from src.brokerage.kraken.kraken import Kraken
-from src.events_engine import EventEngine
+from src.events_engine import (
+    EventEngine,
+    AsyncEventEngine,
+    PriorityLaneQueue,
+    ConflatingQueue,
+    ConflatingBuffer,
+)
+from src.event_journal import EventJournal
+from src.marketdata.gateway import MarketDataGateway
+from src.marketdata.shm_bus import MarketDataBusSubscriber
+from src.marketdata.ticker_poller import TickerPoller
 from src.events import (
     EventType,
     TickEvent,
+    TradeEvent,
     OrderEvent,
     CheckOrderStatusEvent,
     FillEvent,
 )
 from src.strategies.strategy_manager import StrategyManager
+from src.strategies.strategy_loader import load_strategies
 from src.utils.alerts import Alerts
 from src.utils.db_service import DBService
+from src.utils import latency, metrics
+
+HEARTBEAT_WORK = metrics.histogram("cts_heartbeat_work_seconds", "TradingSystem.run loop body time")
+HEARTBEAT_SLIP = metrics.gauge(
+    "cts_heartbeat_slip_seconds", "How late the last TradingSystem.run loop started past its heartbeat"
+)
 
 
 class TradingSystem:
-    def __init__(self, strat_config_path: str, heartbeat=1):
+    def __init__(
+        self,
+        strat_config_path: str,
+        heartbeat=1,
+        stream_market_data=False,
+        priority_lanes=False,
+        lane_capacity=None,
+        conflate_ticks=False,
+        event_batch_size=None,
+        async_engine=False,
+        strategy_workers=0,
+        shard_by="strategy",
+        market_data_bus=None,
+        journal_dir=None,
+        trace_latency=False,
+        latency_dump_interval=60,
+        metrics_port=None,
+        concurrent_polling=False,
+        polling_concurrency=None,
+        async_rest=False,
+        batch_order_status=False,
+        user_stream=False,
+        order_status_interval=None,
+        order_concurrency=None,
+    ):
         self._auth_config = dotenv_values(".env")
         # set up event_engine
         self.heartbeat = heartbeat
+        self.stream_market_data = stream_market_data
+        self.priority_lanes = priority_lanes
+        self.lane_capacity = lane_capacity  # e.g. {"market_data": 1000}, see PriorityLaneQueue
+        self.conflate_ticks = conflate_ticks  # latest tick per symbol only, see ConflatingBuffer
+        self.event_batch_size = event_batch_size  # drain up to this many events per wakeup
+        self.async_engine = async_engine  # handle events on the asyncio loop, see AsyncEventEngine
+        self._engine_started = False
+        self.strategy_workers = strategy_workers  # run strategies in worker processes
+        self.shard_by = shard_by  # "strategy" or "symbol"
+        self.batch_order_status = batch_order_status  # see OrderStatusReconciler
+        self.order_concurrency = order_concurrency  # bulk cancels in flight, see StrategyManager.cancel_orders
+        # fills pushed by Luno's user stream, polling the exchange every order_status_interval
+        # seconds (default 30 with the stream, every heartbeat without) as a safety net
+        self.use_user_stream = user_stream
+        if order_status_interval is None:
+            order_status_interval = 30 if user_stream else 0
+        self.order_status_interval = order_status_interval
+        self.market_data_bus = market_data_bus  # shared memory bus name, see src.marketdata.feed
+        # poll tickers in a thread pool, e.g. polling_concurrency={"luno": 8}, see TickerPoller
+        self.concurrent_polling = concurrent_polling
+        self.polling_concurrency = polling_concurrency
+        # record every dispatched event, see src/event_journal.py
+        self.journal = EventJournal(journal_dir) if journal_dir is not None else None
+        # tick-to-trade stage latencies, see src/utils/latency.py and latency_stats()
+        self.latency_tracer = None
+        self._latency_task = None
+        if trace_latency:
+            self.latency_tracer = latency.enable(
+                dump_interval=latency_dump_interval, dump_path="./src/logs/latency.json"
+            )
+        # Prometheus metrics on http://127.0.0.1:<metrics_port>/metrics, see src/utils/metrics.py
+        self.metrics_server = metrics.enable(port=metrics_port) if metrics_port is not None else None
         self.setup_event_engine()
         self.load_strategies(strat_config_path)
         # logging and alert systems
@@ -39,11 +113,16 @@ class TradingSystem:
         self._dbservice = self.setup_database("cryptotradingsystem")
         
         # connect
-        self.luno_tc = Luno(
+        # with async_rest, Luno REST calls share one keep-alive connection pool and
+        # luno_async_tc has coroutine versions of the ticker and order methods
+        luno = Luno(
             auth_config=self._auth_config,
             mkt_event_engine=self.mkt_event_engine,
             action_event_engine=self.action_event_engine,
-        ).get_trade_client()
+            async_rest=async_rest,
+        )
+        self.luno_tc = luno.get_trade_client()
+        self.luno_async_tc = luno.get_async_trade_client()
         self.kraken_tc = Kraken(
             auth_config=self._auth_config,
             mkt_event_engine=self.mkt_event_engine,
@@ -51,53 +130,72 @@ class TradingSystem:
         ).get_trade_client()
         
         self.setup_managers()
+        self.setup_market_data()
+        self.user_stream = None
+        self._user_stream_task = None
+        if self.use_user_stream:
+            self.user_stream = LunoUserStream(self._auth_config, self.action_event_engine)
+            self.strategy_manager.user_stream = self.user_stream
 
     def load_strategies(self, path):
         """Get all strategies, prepare tickers to load"""
         with open(path, "r") as f:
             self.trading_config = yaml.safe_load(f)
 
-        self.strat_dict = {}
-        self.instrument_list = {}
-
-        for _, _, files in os.walk(os.path.abspath("./src/strategies/")):
-            for file in files:
-                if file.endswith("strategy.py"):
-                    s = file.replace(".py", "")
-
-                    try:
-                        module = importlib.import_module(f"src.strategies.{s}")
-                        for k in dir(module):
-
-                            if k in self.trading_config["strategy"].keys():
-                                v = module.__getattribute__(k)
-                                _strategy = v()  # strategy class
-
-                                _strategy.set_name(k)
-
-                                self.strat_dict[k] = _strategy
-
-                                self.instrument_list[k] = self.trading_config[
-                                    "strategy"
-                                ][k]["instruments"]
-
-                    except Exception as e:
-                        print(f"Unable to load strategy {s}: {e}")
+        self.strat_dict, self.instrument_list = load_strategies(self.trading_config)
         print(self.instrument_list)
 
     def setup_event_engine(self):
-        """Set up listeners"""
-        self.action_event_engine = EventEngine()
+        """Set up listeners
+        With priority_lanes, market and action events share one engine whose
+        queue has a lane per event type group, so fills and orders are always
+        handled before queued ticks.
+        With conflate_ticks, queued ticks are replaced by newer ticks of the
+        same symbol, so a slow tick handler always gets the latest price.
+        With async_engine, all events are queued and dispatched by one
+        AsyncEventEngine on the loop that runs run(); it starts in run(). The
+        handlers place orders and poll order status over blocking REST, so they
+        run on the engine's handler thread, keeping the loop free for streams.
+        With a journal, every engine records the events it dispatches.
+        """
+        if self.async_engine:
+            if self.priority_lanes:
+                raise ValueError("priority_lanes needs the threaded EventEngine")
+            self._mkt_queue = ConflatingBuffer() if self.conflate_ticks else None
+            engine = AsyncEventEngine(
+                buffer=self._mkt_queue,
+                batch_size=self.event_batch_size,
+                journal=self.journal,
+                name="shared",
+                handler_thread=True,
+            )
+            self.action_event_engine = self.mkt_event_engine = engine
+        elif self.priority_lanes:
+            self._mkt_queue = PriorityLaneQueue(capacity=self.lane_capacity, conflate=self.conflate_ticks)
+            engine = EventEngine(
+                queue=self._mkt_queue, batch_size=self.event_batch_size, journal=self.journal, name="shared"
+            )
+            self.action_event_engine = self.mkt_event_engine = engine
+        else:
+            self._mkt_queue = ConflatingQueue() if self.conflate_ticks else None
+            self.action_event_engine = EventEngine(
+                batch_size=self.event_batch_size, journal=self.journal, name="action"
+            )
+            self.mkt_event_engine = EventEngine(
+                queue=self._mkt_queue, batch_size=self.event_batch_size, journal=self.journal, name="market"
+            )
         self.action_event_engine.register_handler(EventType.ORDER, self.order_handler)
         self.action_event_engine.register_handler(EventType.FILL, self.fill_handler)
         self.action_event_engine.register_handler(
             EventType.CHECK_ORDER_STATUS, self.check_order_status_handler
         )
-        self.mkt_event_engine = EventEngine()
         self.mkt_event_engine.register_handler(EventType.TICK, self.tick_handler)
+        self.mkt_event_engine.register_handler(EventType.TRADE, self.trade_handler)
         # start engine
-        self.mkt_event_engine.start()
-        self.action_event_engine.start()
+        if not self.async_engine:
+            self.mkt_event_engine.start()
+            if self.action_event_engine is not self.mkt_event_engine:
+                self.action_event_engine.start()
 
     def setup_managers(self):
         """Set up managers"""
@@ -109,37 +207,122 @@ class TradingSystem:
             instrument_list=self.instrument_list,
             alerts_system=self._alerts,
             database = self._dbservice,
+            workers=self.strategy_workers,
+            shard_by=self.shard_by,
+            batch_order_status=self.batch_order_status,
+            order_concurrency=self.order_concurrency,
+            async_broker=self.luno_async_tc,
+            order_status_interval=self.order_status_interval,
         )
         self.strategy_manager.load_strategy(strat_dict=self.strat_dict)
+        if self.conflate_ticks:
+            # strategies that opted out of conflation get every tick of their symbols
+            self._mkt_queue.set_passthrough(
+                {sym for s in self.strat_dict.values() if not s.conflate_ticks for sym in s.symbols}
+            )
+
+    def setup_market_data(self):
+        """Read market data from a feed process' shared memory bus and/or
+        stream Luno order books instead of polling tickers, if enabled.
+        Symbols the bus does not publish fall back to streaming/polling.
+        """
+        self.md_bus = None
+        self.md_gateway = None
+        self.ticker_poller = None
+        if self.concurrent_polling:
+            self.ticker_poller = TickerPoller(
+                {"luno": self.luno_tc, "kraken": self.kraken_tc}, concurrency=self.polling_concurrency
+            )
+        self._md_task = None
+        symbols = set(self.strategy_manager.active_symbols)
+        if self.market_data_bus is not None:
+            self.md_bus = MarketDataBusSubscriber(
+                mkt_event_engine=self.mkt_event_engine, name=self.market_data_bus
+            )
+            missing = self.md_bus.subscribe(sorted(symbols))
+            if missing:
+                self._logger.warning(f"{missing} not on market data bus {self.market_data_bus}")
+            symbols -= set(self.md_bus.codes)
+        if self.stream_market_data:
+            self.md_gateway = MarketDataGateway(
+                auth_config=self._auth_config,
+                mkt_event_engine=self.mkt_event_engine,
+                symbols=list(symbols),
+                markets_info=self.luno_tc.get_markets_info(),
+            )
 
     async def run(self):
         """Stream data"""
+        if self.async_engine and not self._engine_started:
+            self.mkt_event_engine.start()
+            self._engine_started = True
+        if self.md_gateway is not None and self._md_task is None:
+            self._md_task = asyncio.create_task(self.md_gateway.run())
+        if self.md_bus is not None:
+            self.md_bus.start()  # polls on its own thread
+        if self.latency_tracer is not None and self._latency_task is None:
+            self._latency_task = asyncio.create_task(self.latency_tracer.run())
+        if self.luno_async_tc is not None:
+            await self.luno_async_tc.connect()
+        if self.user_stream is not None and self._user_stream_task is None:
+            self._user_stream_task = asyncio.create_task(self.user_stream.run())
+        last_start = None
         while True:
             try:
-                # 1) check outstanding orders every tick
+                # 1) check outstanding orders
                 start = time.perf_counter()
+                if last_start is not None:
+                    HEARTBEAT_SLIP.set(max(start - last_start - self.heartbeat, 0))
+                last_start = start
                 self.action_event_engine.put(CheckOrderStatusEvent())
 
                 # 2) get all tickers
+                polled = []
                 for inst in list(set(self.strategy_manager.active_symbols)):
                     inst_code = inst.split(".")
                     sym, exc = inst_code[0], inst_code[1]
-                    if exc == "luno":
-                        ticker = await self.luno_tc.get_ticker(sym)
+                    if self.md_bus is not None and inst in self.md_bus.codes:
+                        continue
+                    if exc == "luno" and self.md_gateway is None:
+                        polled.append(inst)
                     if exc == "kraken":
-                        ticker = await self.kraken_tc.get_ticker(sym)
+                        polled.append(inst)
+                if self.ticker_poller is not None:
+                    # all at once, ticks are put as responses land
+                    await self.ticker_poller.poll(polled, timeout=self.heartbeat)
+                else:
+                    for inst in polled:
+                        sym, exc = inst.split(".")
+                        if exc == "luno":
+                            ticker = await (self.luno_async_tc or self.luno_tc).get_ticker(sym)
+                        if exc == "kraken":
+                            ticker = await self.kraken_tc.get_ticker(sym)
                 current = time.perf_counter()
-                
+                HEARTBEAT_WORK.observe(current - start)
+
                 await asyncio.sleep(max(self.heartbeat - (current-start),0))
             except Exception as e:
                 print(e)
 
+    def latency_stats(self) -> dict:
+        """Per stage latency percentiles by symbol and strategy, empty unless trace_latency"""
+        if self.latency_tracer is None:
+            return {}
+        return self.latency_tracer.snapshot()
+
     def tick_handler(self, event: TickEvent):
         """Tick handler
         When new ticks arrive, it is passed to strategies that require this data.
         """
         self.strategy_manager.on_tick(event)
 
+    def trade_handler(self, event: TradeEvent):
+        """Trade handler
+        Public trades (streamed market data only) update the rolling trade flow
+        and are passed to strategies that require this data.
+        """
+        self.strategy_manager.on_trade(event)
+
     def order_handler(self, event: OrderEvent):
         """Order Handler
         once order is placed, they get added into our order_dict, and our standing order set."""
@@ -148,11 +331,13 @@ class TradingSystem:
 
     def check_order_status_handler(self, event: CheckOrderStatusEvent):
         """Check Order status
-        open orders do not get informed on fills on Luno.
+        open orders do not get informed on fills on Luno's REST API.
         Therefore this helps to check whether order is filled every heartbeat, and
         order_manager will check whether any open orders have been filled.
+        With user_stream, fills are pushed and the exchange is only polled every
+        order_status_interval as a safety net, strategies still check every heartbeat.
         """
-        self.strategy_manager.on_order_status()
+        self.strategy_manager.on_order_status(event.force)
 
     def fill_handler(self, event: FillEvent):
         self.strategy_manager.on_fill(event)
@@ -8,9 +8,13 @@ from dateutil.relativedelta import relativedelta
 from pykrakenapi import KrakenAPI
 from src.events import TickEvent, Exchange
 from src.events_engine import EventEngine
+from src.utils import latency, metrics
 
 _logger = logging.getLogger("trading_system")
 
+REST_SECONDS = metrics.histogram("cts_rest_request_seconds", "REST call time", ("exchange", "method"))
+REST_ERRORS = metrics.counter("cts_rest_errors_total", "REST calls that raised", ("exchange", "method"))
+
 
 class TradeClient:
     """Wrapper functions that interact with Luno API
@@ -32,7 +36,7 @@ class TradeClient:
         self.api_key = auth_config["kraken_api_key"]
         self.private_key = auth_config["kraken_private_key"]
         kraken_api = krakenex.API(key=self.api_key, secret=self.private_key)
-        self.client = KrakenAPI(kraken_api)
+        self.client = metrics.instrument(KrakenAPI(kraken_api), REST_SECONDS, REST_ERRORS, ("kraken",))
         self._queue = mkt_event_engine
 
     def get_ohlcv(self, pair: str, interval: str, since: str) -> pd.DataFrame:
@@ -44,7 +48,13 @@ class TradeClient:
         ...
 
     async def get_ticker(self, pair: str) -> dict:
+        return self.fetch_ticker(pair)
+
+    def fetch_ticker(self, pair: str) -> TickEvent:
+        """Blocking get_ticker, safe to call from a worker thread"""
+        request_ns = time.monotonic_ns()
         ticker = self.client.get_ticker_information(pair=pair)
+        response_ns = time.monotonic_ns()
         ask_p = float(ticker["a"][0][0])
         ask_v = float(ticker["a"][0][2])
         bid_p = float(ticker["b"][0][0])
@@ -60,6 +70,8 @@ class TradeClient:
             bid_v=bid_v,
             ask_v=ask_v,
         )
+        latency.start_trace(tick_event, "ticker_request", request_ns)
+        latency.stamp(tick_event, "ticker_response", response_ns)
         self._queue.put(tick_event)
         return tick_event
 
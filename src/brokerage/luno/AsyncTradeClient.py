@@ -0,0 +1,122 @@
+import time
+
+from src.brokerage.luno.TradeClient import REST_ERRORS, REST_SECONDS, ticker_event
+from src.brokerage.luno.async_client import AsyncLunoClient
+from src.events import TickEvent
+from src.events_engine import EventEngine
+from src.utils import metrics
+
+
+class AsyncTradeClient:
+    """Coroutine ticker and order methods over an AsyncLunoClient
+
+    Not a TradeClient: get_ticker, place_limit_order, place_market_order,
+    get_order, get_order_status, cancel_order, get_L2, get_full_L2 and
+    get_fee_info take TradeClient's arguments but must be awaited, so it cannot
+    stand in for one. Luno(async_rest=True) shares its AsyncLunoClient with the
+    blocking TradeClient, and StrategyManager(async_broker=...) runs bulk
+    cancels and cancel-replaces on it.
+    """
+
+    def __init__(self, mkt_event_engine: EventEngine, client: AsyncLunoClient):
+        """
+        Args:
+            mkt_event_engine (EventEngine): polled ticks are put here
+            client (AsyncLunoClient): connection pool, usually shared with the TradeClient
+        """
+        self._mkt_queue = mkt_event_engine
+        self.async_client = client
+        self.aclient = metrics.instrument(client, REST_SECONDS, REST_ERRORS, ("luno",))
+
+    async def connect(self, n: int = 2):
+        """Open connections (and their TLS handshakes) ahead of the first orders"""
+        await self.async_client.connect(n)
+
+    def submit(self, coro):
+        """Run a coroutine on the client loop from any thread, returns a concurrent.futures.Future"""
+        return self.async_client.submit(coro)
+
+    def close(self):
+        self.async_client.close()
+
+    async def get_ticker(self, pair: str) -> TickEvent:
+        request_ns = time.monotonic_ns()
+        ticker = await self.aclient.get_ticker(pair=pair)
+        tick_event = ticker_event(pair, ticker, request_ns, time.monotonic_ns())
+        self._mkt_queue.put(tick_event)
+        return tick_event
+
+    async def get_L2(self, pair: str) -> dict:
+        return await self.aclient.get_order_book(pair=pair)
+
+    async def get_full_L2(self, pair: str) -> dict:
+        return await self.aclient.get_order_book_full(pair=pair)
+
+    async def place_limit_order(
+        self,
+        pair: str,
+        price: float,
+        type: str,  # BID or ASK only for buy/sell order respectively
+        volume: float,
+        base_account_id=None,
+        client_order_id=None,
+        counter_account_id=None,
+        post_only: bool = True,
+        stop_direction=None,
+        stop_price=None,  # for stop limit
+        timestamp=None,
+        ttl=None,
+    ):
+        return await self.aclient.post_limit_order(
+            pair=pair,
+            price=price,
+            type=type,
+            volume=volume,
+            base_account_id=base_account_id,
+            client_order_id=client_order_id,
+            counter_account_id=counter_account_id,
+            post_only=post_only,
+            stop_direction=stop_direction,
+            stop_price=stop_price,
+            timestamp=timestamp,
+            ttl=ttl,
+        )
+
+    async def place_market_order(
+        self,
+        pair: str,
+        type: str,  # direction BID/ASK
+        base_account_id=None,
+        base_volume=None,
+        client_order_id=None,
+        counter_account_id=None,
+        counter_volume=None,
+        timestamp=None,
+        ttl=None,
+    ):
+        return await self.aclient.post_market_order(
+            pair=pair,
+            type=type,
+            base_account_id=base_account_id,
+            base_volume=base_volume,
+            client_order_id=client_order_id,
+            counter_account_id=counter_account_id,
+            counter_volume=counter_volume,
+            timestamp=timestamp,
+            ttl=ttl,
+        )
+
+    async def get_order(self, order_id) -> dict:
+        return await self.aclient.get_order_v3(client_order_id=order_id)
+
+    async def get_order_status(self, order_id) -> str:
+        """
+        order status includes "AWAITING", "PENDING", "COMPLETE"
+        """
+        return (await self.get_order(order_id))["state"]
+
+    async def cancel_order(self, order_id):
+        return await self.aclient.stop_order(order_id=order_id)
+
+    async def get_fee_info(self, pair: str) -> dict:
+        return await self.aclient.get_fee_info(pair=pair)
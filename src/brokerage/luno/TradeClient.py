@@ -8,10 +8,14 @@ from luno_python.client import Client
 from dateutil.relativedelta import relativedelta
 from src.events import EventType, Exchange, TickEvent, OrderEvent
 from src.events_engine import EventEngine
+from src.utils import latency, metrics
 
 
 _logger = logging.getLogger("trading_system")
 
+REST_SECONDS = metrics.histogram("cts_rest_request_seconds", "REST call time", ("exchange", "method"))
+REST_ERRORS = metrics.counter("cts_rest_errors_total", "REST calls that raised", ("exchange", "method"))
+
 ALL_VALID_GRANULARITY = [
     60,
     300,
@@ -27,6 +31,24 @@ ALL_VALID_GRANULARITY = [
 ]
 
 
+def ticker_event(pair: str, ticker: dict, request_ns: int, response_ns: int) -> TickEvent:
+    """TickEvent of a get_ticker response, traced from request to response"""
+    ticker["timestamp"] = int(ticker["timestamp"])
+    ticker["ask"] = float(ticker["ask"])
+    ticker["bid"] = float(ticker["bid"])
+    tick_event = TickEvent(
+        sym=pair,
+        exchange=Exchange.LUNO,
+        code=f"{str(pair)}.{Exchange.LUNO.value}",
+        timestamp=ticker["timestamp"],
+        bid_p=ticker["bid"],
+        ask_p=ticker["ask"],
+    )
+    latency.start_trace(tick_event, "ticker_request", request_ns)
+    latency.stamp(tick_event, "ticker_response", response_ns)
+    return tick_event
+
+
 class TradeClient:
     """Wrapper functions that interact with Luno API
     For all underlying functions, please refer to: https://github.com/luno/luno-python/blob/master/luno_python/client.py for further details
@@ -43,10 +65,21 @@ class TradeClient:
         auth_config,
         mkt_event_engine: EventEngine,
         action_event_engine: EventEngine,
+        client=None,
     ):
+        """
+        Args:
+            auth_config (dict): .env config with the Luno keys
+            mkt_event_engine (EventEngine): polled ticks are put here
+            action_event_engine (EventEngine): order events
+            client (optional): luno_python Client compatible REST client, e.g. a
+                BlockingLunoClient over a shared connection pool. Defaults to a new Client.
+        """
         self.id = auth_config["luno_key_id"]
         self.secret = auth_config["luno_key_secret"]
-        self.client = Client(api_key_id=self.id, api_key_secret=self.secret)
+        if client is None:
+            client = Client(api_key_id=self.id, api_key_secret=self.secret)
+        self.client = metrics.instrument(client, REST_SECONDS, REST_ERRORS, ("luno",))
         self._mkt_queue = mkt_event_engine
         self._action_queue = action_event_engine
 
@@ -168,21 +201,18 @@ class TradeClient:
         return df
 
     async def get_ticker(self, pair: str) -> dict:
-        # ON AVERAGE THIS TAKES ABOUT 0.2s
-        
+        # ON AVERAGE THIS TAKES ABOUT 0.2s, and blocks the loop meanwhile, see TickerPoller
+        return self.fetch_ticker(pair)
+
+    def fetch_ticker(self, pair: str) -> TickEvent:
+        """Blocking get_ticker, safe to call from a worker thread"""
         #start = time.perf_counter()
+        request_ns = time.monotonic_ns()
         ticker = self.client.get_ticker(pair=pair)
-        ticker["timestamp"] = int(ticker["timestamp"])
-        ticker["ask"] = float(ticker["ask"])
-        ticker["bid"] = float(ticker["bid"])
-        tick_event = TickEvent(
-            sym=pair,
-            exchange=Exchange.LUNO,
-            code=f"{str(pair)}.{Exchange.LUNO.value}",
-            timestamp=ticker["timestamp"],
-            bid_p=ticker["bid"],
-            ask_p=ticker["ask"],
-        )
+        return self._publish_ticker(pair, ticker, request_ns, time.monotonic_ns())
+
+    def _publish_ticker(self, pair: str, ticker: dict, request_ns: int, response_ns: int) -> TickEvent:
+        tick_event = ticker_event(pair, ticker, request_ns, response_ns)
         # end = time.perf_counter()
         # print(f"get ticker time:{end- start}")
         #_logger.info(f"Tick: {tick_event}")
@@ -213,7 +243,7 @@ class TradeClient:
         ttl=None,
     ):
 
-        self.client.post_limit_order(
+        return self.client.post_limit_order(
             pair=pair,
             price=price,
             type=type,
@@ -240,7 +270,7 @@ class TradeClient:
         timestamp=None,
         ttl=None,
     ):
-        self.client.post_market_order(
+        return self.client.post_market_order(
             pair,
             type,
             base_account_id,
@@ -259,6 +289,11 @@ class TradeClient:
     def get_order(self, order_id) -> dict:
         return self.client.get_order_v3(client_order_id=order_id)
 
+    def list_closed_orders(self, pair: str, created_before=None, limit: int = 100) -> list:
+        """Most recently created closed orders of a pair, newest first, in get_order format"""
+        response = self.client.list_orders_v2(closed=True, created_before=created_before, limit=limit, pair=pair)
+        return response.get("orders") or []
+
     def get_order_status(self, order_id) -> str:
         """
         order status includes "AWAITING", "PENDING", "COMPLETE"
@@ -266,7 +301,7 @@ class TradeClient:
         return self.get_order(order_id)["state"]
 
     def cancel_order(self, order_id):
-        self.client.stop_order(order_id=order_id)
+        return self.client.stop_order(order_id=order_id)
 
     def get_fee_info(self, pair: str) -> dict:
         return self.client.get_fee_info(pair=pair)
@@ -0,0 +1,415 @@
+"""
+Async Luno REST client
+
+AsyncLunoClient is a drop-in for the luno_python Client methods the system
+uses, as coroutines, over a pool of persistent HTTP/1.1 keep-alive
+connections instead of a requests call per order:
+
+    - connections (TLS handshakes included) are reused, and can be opened
+      ahead of the first order with connect()
+    - the Basic auth and static headers are encoded once, a request is a
+      single write of the request line plus those bytes
+    - every call has a timeout, per method in `timeouts`
+    - up to pool_size requests are in flight at once, from any thread or loop
+
+The connections live on the client's own event loop thread ("luno-rest"),
+so coroutines can be awaited from any loop and blocking() gives a
+synchronous facade, with the luno_python method names, for engine threads.
+Errors are raised as luno_python does: APIError for Luno error payloads,
+Exception for anything else.
+"""
+import asyncio
+import base64
+import json
+import logging
+import ssl
+import threading
+import time
+from collections import deque
+from urllib.parse import quote, urlsplit
+
+from luno_python.error import APIError
+
+_logger = logging.getLogger("trading_system")
+
+DEFAULT_BASE_URL = "https://api.luno.com"
+DEFAULT_TIMEOUT = 10
+# seconds per method, tighter on the order path
+DEFAULT_TIMEOUTS = {
+    "get_ticker": 2,
+    "post_limit_order": 5,
+    "post_market_order": 5,
+    "get_order_v3": 5,
+    "stop_order": 5,
+}
+
+
+def _query_value(value) -> str:
+    if value is True or value is False:
+        return "true" if value else "false"
+    return str(value)
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "last_used")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def usable(self, idle_timeout: float) -> bool:
+        return (
+            not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and time.monotonic() - self.last_used < idle_timeout
+        )
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncLunoClient:
+    def __init__(
+        self,
+        api_key_id: str = "",
+        api_key_secret: str = "",
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT,
+        timeouts: dict = None,
+        pool_size: int = 8,
+        idle_timeout: float = 30,
+    ):
+        """
+        Args:
+            api_key_id (str): Luno API key id
+            api_key_secret (str): Luno API key secret
+            base_url (str, optional): Defaults to https://api.luno.com.
+            timeout (float, optional): seconds per call. Defaults to 10.
+            timeouts (dict, optional): method name -> seconds, over DEFAULT_TIMEOUTS
+            pool_size (int, optional): max connections, and requests in flight. Defaults to 8.
+            idle_timeout (float, optional): idle connections older than this are not reused. Defaults to 30.
+        """
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.base_path = url.path.rstrip("/")
+        self._ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.timeout = timeout
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        host = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        headers = f"Host: {host}\r\nUser-Agent: crypto_trading_system\r\nAccept: application/json\r\nContent-Length: 0\r\n"
+        self._headers = headers.encode("latin-1")
+        credentials = base64.b64encode(f"{api_key_id}:{api_key_secret}".encode()).decode()
+        self._auth_headers = self._headers + f"Authorization: Basic {credentials}\r\n".encode("latin-1")
+        self._idle = deque()  # most recently used last
+        self._slots = None  # asyncio.Semaphore(pool_size), made on the client loop
+        self.requests = 0
+        self.connections = 0  # opened so far
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="luno-rest", daemon=True)
+        self._thread.start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    # ---- plumbing ----
+
+    async def _open(self) -> _Connection:
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=self._ssl, server_hostname=self.host if self._ssl else None
+        )
+        self.connections += 1
+        return _Connection(reader, writer)
+
+    def _take_idle(self):
+        while self._idle:
+            connection = self._idle.pop()
+            if connection.usable(self.idle_timeout):
+                return connection
+            connection.close()
+        return None
+
+    async def _exchange(self, connection: _Connection, request: bytes):
+        """Write a request and read its response, returns (status, body, keep_alive)"""
+        connection.writer.write(request)
+        reader = connection.reader
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ", 2)[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":  # trailers
+                        pass
+                    break
+                chunks.append((await reader.readexactly(size + 2))[:-2])
+            body = b"".join(chunks)
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return status, body, keep_alive
+
+    async def _request(self, method: str, target: str, auth: bool) -> tuple:
+        request = f"{method} {target} HTTP/1.1\r\n".encode("latin-1")
+        request += self._auth_headers if auth else self._headers
+        request += b"\r\n"
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            connection = self._take_idle()
+            reused = connection is not None
+            if connection is None:
+                connection = await self._open()
+            try:
+                status, body, keep_alive = await self._exchange(connection, request)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                connection.close()
+                # the server closed an idle connection before reading the request, retry once on a new one
+                if not reused or (isinstance(e, asyncio.IncompleteReadError) and e.partial):
+                    raise
+                connection = await self._open()
+                try:
+                    status, body, keep_alive = await self._exchange(connection, request)
+                except BaseException:
+                    connection.close()
+                    raise
+            except BaseException:
+                connection.close()
+                raise
+            if keep_alive:
+                connection.last_used = time.monotonic()
+                self._idle.append(connection)
+            else:
+                connection.close()
+        self.requests += 1
+        return status, body
+
+    async def _do(self, name: str, method: str, path: str, req: dict, auth: bool):
+        target = self.base_path + path
+        if req:
+            query = "&".join(
+                f"{k}={quote(_query_value(v), safe='')}" for k, v in req.items() if v is not None
+            )
+            if query:
+                target += "?" + query
+        timeout = self.timeouts.get(name, self.timeout)
+        status, body = await asyncio.wait_for(self._request(method, target, auth), timeout)
+        try:
+            response = json.loads(body)
+        except ValueError:
+            raise Exception(f"luno: unknown API error ({status})")
+        if isinstance(response, dict) and "error" in response and "error_code" in response:
+            raise APIError(response["error_code"], response["error"])
+        return response
+
+    async def do(self, name: str, method: str, path: str, req: dict = None, auth: bool = False):
+        """One API call on the client loop, awaitable from any loop
+
+        Args:
+            name (str): method name, for its timeout
+            method (str): GET or POST
+            path (str): e.g. /api/1/ticker
+            req (dict, optional): query parameters, None values are left out
+            auth (bool, optional): send the API key. Defaults to False.
+        """
+        coro = self._do(name, method, path, req, auth)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self._loop))
+
+    def submit(self, coro):
+        """Run a coroutine of this client on its loop, returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def connect(self, n: int = 1):
+        """Open up to n connections ahead of the first calls"""
+
+        async def _warm():
+            opened = await asyncio.gather(
+                *(self._open() for _ in range(min(n, self.pool_size) - len(self._idle))),
+                return_exceptions=True,
+            )
+            for connection in opened:
+                if isinstance(connection, _Connection):
+                    self._idle.append(connection)
+                else:
+                    _logger.warning(f"Luno connection failed: {connection}")
+
+        await asyncio.wrap_future(self.submit(_warm()))
+
+    def blocking(self) -> "BlockingLunoClient":
+        return BlockingLunoClient(self)
+
+    def close(self):
+        async def _close():
+            while self._idle:
+                self._idle.pop().close()
+
+        if self._loop.is_running():
+            self.submit(_close()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    # ---- luno_python Client methods ----
+
+    async def get_ticker(self, pair):
+        return await self.do("get_ticker", "GET", "/api/1/ticker", {"pair": pair})
+
+    async def get_tickers(self, pair=None):
+        return await self.do("get_tickers", "GET", "/api/1/tickers", {"pair": pair})
+
+    async def get_order_book(self, pair):
+        return await self.do("get_order_book", "GET", "/api/1/orderbook_top", {"pair": pair})
+
+    async def get_order_book_full(self, pair):
+        return await self.do("get_order_book_full", "GET", "/api/1/orderbook", {"pair": pair})
+
+    async def markets(self, pair=None):
+        return await self.do("markets", "GET", "/api/exchange/1/markets", {"pair": pair})
+
+    async def get_balances(self, assets=None, account_id=None):
+        response = await self.do("get_balances", "GET", "/api/1/balance", {"assets": assets}, auth=True)
+        if account_id is not None:
+            for account in response.get("balance", ()):
+                if str(account.get("account_id")) == str(account_id):
+                    return account
+            return None
+        return response
+
+    async def get_fee_info(self, pair):
+        return await self.do("get_fee_info", "GET", "/api/1/fee_info", {"pair": pair}, auth=True)
+
+    async def get_candles(self, duration, pair, since):
+        req = {"duration": duration, "pair": pair, "since": since}
+        return await self.do("get_candles", "GET", "/api/exchange/1/candles", req, auth=True)
+
+    async def list_orders(self, created_before=None, limit=None, pair=None, state=None):
+        req = {"created_before": created_before, "limit": limit, "pair": pair, "state": state}
+        return await self.do("list_orders", "GET", "/api/1/listorders", req, auth=True)
+
+    async def list_orders_v2(self, closed=None, created_before=None, limit=None, pair=None):
+        req = {"closed": closed, "created_before": created_before, "limit": limit, "pair": pair}
+        return await self.do("list_orders_v2", "GET", "/api/exchange/2/listorders", req, auth=True)
+
+    async def list_user_trades(
+        self, pair, after_seq=None, before=None, before_seq=None, limit=None, since=None, sort_desc=None
+    ):
+        req = {
+            "pair": pair,
+            "after_seq": after_seq,
+            "before": before,
+            "before_seq": before_seq,
+            "limit": limit,
+            "since": since,
+            "sort_desc": sort_desc,
+        }
+        return await self.do("list_user_trades", "GET", "/api/1/listtrades", req, auth=True)
+
+    async def get_order_v3(self, client_order_id=None, id=None):
+        req = {"client_order_id": client_order_id, "id": id}
+        return await self.do("get_order_v3", "GET", "/api/exchange/3/order", req, auth=True)
+
+    async def post_limit_order(
+        self,
+        pair,
+        price,
+        type,
+        volume,
+        base_account_id=None,
+        client_order_id=None,
+        counter_account_id=None,
+        post_only=None,
+        stop_direction=None,
+        stop_price=None,
+        time_in_force=None,
+        timestamp=None,
+        ttl=None,
+    ):
+        req = {
+            "pair": pair,
+            "price": price,
+            "type": type,
+            "volume": volume,
+            "base_account_id": base_account_id,
+            "client_order_id": client_order_id,
+            "counter_account_id": counter_account_id,
+            "post_only": post_only,
+            "stop_direction": stop_direction,
+            "stop_price": stop_price,
+            "time_in_force": time_in_force,
+            "timestamp": timestamp,
+            "ttl": ttl,
+        }
+        return await self.do("post_limit_order", "POST", "/api/1/postorder", req, auth=True)
+
+    async def post_market_order(
+        self,
+        pair,
+        type,
+        base_account_id=None,
+        base_volume=None,
+        client_order_id=None,
+        counter_account_id=None,
+        counter_volume=None,
+        timestamp=None,
+        ttl=None,
+    ):
+        req = {
+            "pair": pair,
+            "type": type,
+            "base_account_id": base_account_id,
+            "base_volume": base_volume,
+            "client_order_id": client_order_id,
+            "counter_account_id": counter_account_id,
+            "counter_volume": counter_volume,
+            "timestamp": timestamp,
+            "ttl": ttl,
+        }
+        return await self.do("post_market_order", "POST", "/api/1/marketorder", req, auth=True)
+
+    async def stop_order(self, order_id):
+        return await self.do("stop_order", "POST", "/api/1/stoporder", {"order_id": order_id}, auth=True)
+
+
+class BlockingLunoClient:
+    """Synchronous AsyncLunoClient methods, a drop-in for luno_python's Client
+
+    Calls block the calling thread until the response, so they must not be made
+    from the client's own loop thread.
+    """
+
+    def __init__(self, client: AsyncLunoClient):
+        self.async_client = client
+
+    def __getattr__(self, name):
+        method = getattr(self.async_client, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+        client = self.async_client
+
+        def call(*args, **kwargs):
+            if threading.current_thread() is client._thread:
+                raise RuntimeError(f"blocking Luno {name}() called on the client loop, await it instead")
+            return client.submit(method(*args, **kwargs)).result()
+
+        self.__dict__[name] = call
+        return call
@@ -1,13 +1,27 @@
 from src.brokerage.luno.TradeClient import TradeClient
+from src.brokerage.luno.AsyncTradeClient import AsyncTradeClient
+from src.brokerage.luno.async_client import AsyncLunoClient
 from src.brokerage.luno.ServiceClient import ServiceClient
 
 
 class Luno:
-    def __init__(self, auth_config: dict, mkt_event_engine, action_event_engine):
+    def __init__(self, auth_config: dict, mkt_event_engine, action_event_engine, async_rest: bool = False):
+        """
+        Args:
+            async_rest (bool, optional): share one pooled keep-alive AsyncLunoClient
+                between the trade client (blocking calls) and an AsyncTradeClient (coroutines).
+        """
+        client = None
+        self.async_trade_client = None
+        if async_rest:
+            rest = AsyncLunoClient(auth_config["luno_key_id"], auth_config["luno_key_secret"])
+            client = rest.blocking()
+            self.async_trade_client = AsyncTradeClient(mkt_event_engine=mkt_event_engine, client=rest)
         self.trade_client = TradeClient(
             auth_config=auth_config,
             mkt_event_engine=mkt_event_engine,
             action_event_engine=action_event_engine,
+            client=client,
         )
         self.service_client = ServiceClient()
 
@@ -16,3 +30,7 @@ class Luno:
 
     def get_trade_client(self):
         return self.trade_client
+
+    def get_async_trade_client(self):
+        """AsyncTradeClient, None unless async_rest"""
+        return self.async_trade_client
@@ -0,0 +1,170 @@
+"""
+Luno user stream
+
+Luno pushes the account's order status and fill updates on an authenticated
+websocket (wss://ws.luno.com/api/1/userstream):
+
+    order_fill     cumulative base/counter filled and fees of an order
+    order_status   AWAITING / PENDING / COMPLETE
+
+LunoUserStream turns every order that goes COMPLETE with a fill into a
+FillEvent on the action engine, as soon as the update arrives, instead of at
+the next order status poll. Orders are matched by their Luno order id, from
+track() when they are placed; updates for orders not tracked yet are kept for
+a while in case the placement response is still on its way. Orders completed
+without any fill (cancelled) are dropped.
+
+After a reconnect a forced CheckOrderStatusEvent is put so the order status
+polling (kept as a slow safety net) catches anything missed while disconnected
+right away.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import websockets
+
+from src.events import CheckOrderStatusEvent, FillEvent, OrderEvent
+
+_logger = logging.getLogger("trading_system")
+
+DEFAULT_URL = "wss://ws.luno.com/api/1/userstream"
+
+
+class LunoUserStream:
+    def __init__(
+        self,
+        auth_config: dict,
+        action_event_engine,
+        url: str = None,
+        backoff: float = 10,
+        unmatched_ttl: float = 60,
+    ):
+        """
+        Args:
+            auth_config (dict): .env config with luno keys
+            action_event_engine (EventEngine): FillEvents are put here
+            url (str, optional): Defaults to Luno's user stream.
+            backoff (float, optional): seconds between connection attempts. Defaults to 10.
+            unmatched_ttl (float, optional): seconds completions of untracked orders are kept. Defaults to 60.
+        """
+        self.auth = {
+            "api_key_id": auth_config["luno_key_id"],
+            "api_key_secret": auth_config["luno_key_secret"],
+        }
+        self._action_queue = action_event_engine
+        self.url = url or DEFAULT_URL
+        self.backoff = backoff
+        self.unmatched_ttl = unmatched_ttl
+        self.ws = None
+        self.connected = False
+        self._orders = {}  # luno order id -> OrderEvent
+        self._luno_oids = {}  # client order id -> luno order id, of the tracked orders
+        self._fills = {}  # luno order id -> (base, counter, base fee), cumulative
+        self._unmatched = {}  # luno order id -> (received at, complete ts), completed before track()
+        self._lock = threading.Lock()  # track() runs on engine threads
+        self.stats = {"messages": 0, "fills": 0, "reconnects": 0}
+
+    def track(self, order: OrderEvent):
+        """Watch a placed order (luno_oid set) for its fill"""
+        with self._lock:
+            completed = self._unmatched.pop(order.luno_oid, None)
+            if completed is None:
+                self._orders[order.luno_oid] = order
+                self._luno_oids[order.oid] = order.luno_oid
+        if completed is not None:
+            self._fill(order, completed[1])
+
+    def untrack(self, oids: list):
+        """Stop watching orders (client order ids) closed by other means, e.g. polled fills or cancels"""
+        with self._lock:
+            for oid in oids:
+                luno_oid = self._luno_oids.pop(oid, None)
+                if luno_oid is not None:
+                    self._orders.pop(luno_oid, None)
+                    self._fills.pop(luno_oid, None)
+
+    def handle_message(self, data: dict):
+        self.stats["messages"] += 1
+        kind = data.get("type")
+        if kind == "order_fill":
+            update = data["order_fill_update"]
+            self._fills[update["order_id"]] = (
+                update.get("base_fill", "0"),
+                update.get("counter_fill", "0"),
+                update.get("base_fee", "0"),
+            )
+        elif kind == "order_status":
+            update = data["order_status_update"]
+            if update.get("status") == "COMPLETE":
+                self._complete(update["order_id"], data.get("timestamp"))
+
+    def _complete(self, order_id: str, timestamp):
+        with self._lock:
+            order = self._orders.pop(order_id, None)
+            if order is None:
+                now = time.monotonic()
+                self._unmatched[order_id] = (now, timestamp)
+                for stale in [k for k, (t, _) in self._unmatched.items() if now - t > self.unmatched_ttl]:
+                    del self._unmatched[stale]
+                    self._fills.pop(stale, None)
+                return
+            self._luno_oids.pop(order.oid, None)
+        self._fill(order, timestamp)
+
+    def _fill(self, order: OrderEvent, timestamp):
+        base, counter, fee_base = self._fills.pop(order.luno_oid, ("0", "0", "0"))
+        if float(base) == 0:
+            return  # cancelled before any fill
+        fill_event = FillEvent(
+            sid=order.sid,
+            oid=order.oid,
+            sym=order.sym,
+            dir=order.direction,
+            base=base,
+            counter=counter,
+            fee_base=fee_base,
+            create_ts=order.order_time,
+            complete_ts=timestamp if timestamp is not None else time.time() * 1000,
+        )
+        self.stats["fills"] += 1
+        self._action_queue.put(fill_event)
+
+    async def connect(self):
+        await self.close()
+        self.ws = await websockets.connect(self.url)
+        await self.ws.send(json.dumps(self.auth))
+        self.connected = True
+        _logger.info("Luno user stream connected")
+
+    async def run(self):
+        """Consume the stream, reconnecting every backoff seconds when it drops"""
+        first = True
+        while True:
+            try:
+                await self.connect()
+                if not first:
+                    self.stats["reconnects"] += 1
+                    self._action_queue.put(CheckOrderStatusEvent(force=True))  # catch up on missed updates
+                first = False
+                async for msg in self.ws:
+                    if msg == '""':
+                        continue  # keep alive
+                    try:
+                        self.handle_message(json.loads(msg))
+                    except Exception as e:
+                        _logger.error(f"Luno user stream message failed: {e}: {msg}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f"Luno user stream failed: {e}")
+            self.connected = False
+            await asyncio.sleep(self.backoff)
+
+    async def close(self):
+        self.connected = False
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
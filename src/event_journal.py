@@ -0,0 +1,172 @@
+"""
+Event journal
+
+EventJournal records every event an EventEngine dispatches, in dispatch
+order, with a time.monotonic_ns() timestamp, to segmented binary files:
+
+    <directory>/<prefix>-<session>-<segment>.jrnl
+    segment header   magic, wall clock ns and monotonic ns when it was opened
+    records          monotonic ns, payload length, Event.encode() payload
+
+append() only snapshots the event's fields (to_tuple) onto a deque, a
+background thread encodes and writes them in buffered batches every
+flush_interval, so the engines never wait on disk. A crash loses at most the
+last flush_interval of events, and a torn last record is skipped by the reader.
+
+read_journal() yields (ts_ns, event) back, see
+src/strategies/journal_replay.py to replay a journal through StrategyManager.
+"""
+import datetime
+import logging
+import pathlib
+import struct
+import threading
+import time
+from collections import deque
+
+from src.events import decode_event
+
+_logger = logging.getLogger("trading_system")
+
+MAGIC = b"CTSJRNL1"
+_SEGMENT_HEADER = struct.Struct("<8sQQ")  # magic, wall clock ns, monotonic ns
+_RECORD = struct.Struct("<QI")  # monotonic ns, payload length
+SUFFIX = ".jrnl"
+
+
+class EventJournal:
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "events",
+        segment_bytes: int = 64 * 1024 * 1024,
+        flush_interval: float = 0.2,
+    ):
+        """
+        Args:
+            directory (str): where segments are written, created if missing
+            prefix (str, optional): segment file name prefix. Defaults to "events".
+            segment_bytes (int, optional): start a new segment past this size. Defaults to 64MB.
+            flush_interval (float, optional): seconds between writes. Defaults to 0.2.
+        """
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.session = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.events = 0  # written so far
+        self.dropped = 0  # records that failed to encode
+        self.segments = []
+        self._pending = deque()  # (ts_ns, event class, field values)
+        self._file = None
+        self._segment_size = 0
+        self._closed = False
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, event):
+        """Record one event, safe to call from any thread"""
+        self._pending.append((time.monotonic_ns(), type(event), event.to_tuple()))
+
+    def extend(self, events):
+        now = time.monotonic_ns()
+        self._pending.extend((now, type(e), e.to_tuple()) for e in events)
+
+    def flush(self):
+        """Wake the writer now instead of at the next flush_interval"""
+        self._wake.set()
+
+    def close(self):
+        """Write what is pending and close the current segment"""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        path = self.directory / f"{self.prefix}-{self.session}-{len(self.segments):05d}{SUFFIX}"
+        self._file = open(path, "ab", buffering=1024 * 1024)
+        header = _SEGMENT_HEADER.pack(MAGIC, time.time_ns(), time.monotonic_ns())
+        self._file.write(header)
+        self._segment_size = len(header)
+        self.segments.append(path)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._write_pending()
+            except Exception as e:
+                _logger.error(f"Event journal write failed: {e}")
+            if self._closed and not self._pending:
+                break
+        if self._file is not None:
+            self._file.close()
+
+    def _write_pending(self):
+        pending = self._pending
+        if not pending:
+            return
+        if self._file is None:
+            self._open_segment()
+        pack = _RECORD.pack
+        chunk = bytearray()
+        try:
+            while pending:
+                ts, cls, values = pending.popleft()
+                try:
+                    payload = cls.encode_tuple(values)
+                except Exception as e:
+                    # skip just this record, the rest of the batch is still written
+                    self.dropped += 1
+                    _logger.error(f"Event journal could not encode {cls.__name__}{values}: {e}")
+                    continue
+                chunk += pack(ts, len(payload))
+                chunk += payload
+                self.events += 1
+                if self._segment_size + len(chunk) >= self.segment_bytes:
+                    self._file.write(chunk)
+                    chunk = bytearray()
+                    self._open_segment()
+        finally:
+            if chunk:
+                self._file.write(chunk)
+                self._segment_size += len(chunk)
+            self._file.flush()
+
+
+def journal_segments(path, prefix: str = "events") -> list:
+    """Segment files of a journal directory in write order, or [path] for a single segment"""
+    path = pathlib.Path(path)
+    if path.is_file():
+        return [path]
+    return sorted(path.glob(f"{prefix}-*{SUFFIX}"))
+
+
+def read_journal(path, prefix: str = "events", wall_clock: bool = False):
+    """Yield (ts_ns, event) from a journal directory or segment file, in write order
+
+    ts_ns is time.monotonic_ns() when the event was appended, or with wall_clock
+    the time.time_ns() it corresponds to (from the segment header).
+    """
+    for segment in journal_segments(path, prefix):
+        with open(segment, "rb") as f:
+            data = f.read()
+        if data[:8] != MAGIC:
+            raise ValueError(f"{segment} is not an event journal segment")
+        _, wall_ns, monotonic_ns = _SEGMENT_HEADER.unpack_from(data, 0)
+        offset = wall_ns - monotonic_ns if wall_clock else 0
+        pos, end = _SEGMENT_HEADER.size, len(data)
+        unpack = _RECORD.unpack_from
+        while pos + _RECORD.size <= end:
+            ts, length = unpack(data, pos)
+            pos += _RECORD.size
+            if pos + length > end:
+                _logger.warning(f"{segment} ends with a partial record")
+                break
+            yield ts + offset, decode_event(data[pos : pos + length])
+            pos += length
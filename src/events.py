@@ -1,12 +1,13 @@
 """Events
 
-Implemented: Tick, Order, Fill, CheckOrderStatus
+Implemented: Tick, Trade, Order, Fill, CheckOrderStatus (all slotted, see Event)
 
 Other potential events: Position, Bar, WarmUp, EndOfDay, EndofAlgo,
 """
 from enum import Enum
+from operator import attrgetter
+import marshal
 import time
-import copy
 
 
 class Exchange(Enum):
@@ -20,6 +21,7 @@ class EventType(Enum):
     ORDER = 1
     FILL = 2
     CHECK_ORDER_STATUS = 3
+    TRADE = 4
 
 
 class OrderType(Enum):
@@ -42,7 +44,112 @@ class OrderStatus(Enum):
     COMPLETE = 2
 
 
-class TickEvent:
+class Event:
+    """Slotted event base.
+
+    Subclasses list their slots in `_fields`, which gives them a cheap
+    to_tuple/to_dict and a binary encode/decode: one byte EventType tag then
+    the field values (enums by value) in marshal format. Events are pickled
+    as that same tuple, so they are also cheap to send between processes.
+    `type` is a class attribute.
+    """
+
+    __slots__ = ()
+    type = None
+    _fields = ()
+    _enums = {}  # field -> Enum class, held by value in to_dict and encode
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if len(cls._fields) > 1:
+            cls._getter = attrgetter(*cls._fields)
+        elif cls._fields:
+            getter = attrgetter(cls._fields[0])
+            cls._getter = staticmethod(lambda event: (getter(event),))
+        else:
+            cls._getter = staticmethod(lambda event: ())
+        # enum member <-> value lookups, faster than .value / Enum(value)
+        cls._to_value = {m: m.value for e in cls._enums.values() for m in e}
+        cls._enum_index = tuple(
+            (cls._fields.index(f), e._value2member_map_) for f, e in cls._enums.items()
+        )
+        # slots outside _fields (e.g. trace) are not encoded, and start as None when decoded
+        cls._extra_slots = tuple(s for s in cls.__slots__ if s not in cls._fields)
+        if cls.type is not None:
+            cls._tag = bytes((cls.type.value,))
+            _EVENT_CLASSES[cls.type.value] = cls
+
+    def to_tuple(self) -> tuple:
+        """Field values in _fields order"""
+        return self._getter(self)
+
+    @classmethod
+    def from_tuple(cls, values):
+        event = cls.__new__(cls)
+        for field, value in zip(cls._fields, values):
+            setattr(event, field, value)
+        for slot in cls._extra_slots:
+            setattr(event, slot, None)
+        return event
+
+    def to_dict(self) -> dict:
+        """Field values by name, enums by value (e.g. to insert into mongo)"""
+        dic = dict(zip(self._fields, self._getter(self)))
+        to_value = self._to_value
+        for field in self._enums:
+            dic[field] = to_value.get(dic[field])
+        dic["type"] = self.type.value
+        return dic
+
+    _dict = to_dict
+
+    def encode(self) -> bytes:
+        return self.encode_tuple(self._getter(self))
+
+    @classmethod
+    def encode_tuple(cls, values: tuple) -> bytes:
+        """encode() from a to_tuple() taken earlier"""
+        if cls._enum_index:
+            values = list(values)
+            to_value = cls._to_value
+            for i, _ in cls._enum_index:
+                values[i] = to_value.get(values[i])
+            values = tuple(values)
+        return cls._tag + marshal.dumps(values, 4)
+
+    @classmethod
+    def decode(cls, data: bytes):
+        if cls.type is None:
+            return decode_event(data)
+        values = marshal.loads(memoryview(data)[1:])
+        if cls._enum_index:
+            values = list(values)
+            for i, members in cls._enum_index:
+                values[i] = members.get(values[i])
+        return cls.from_tuple(values)
+
+    def __reduce__(self):
+        return (_rebuild, (type(self), self._getter(self)))
+
+
+_EVENT_CLASSES = {}  # EventType value -> Event subclass
+
+
+def _rebuild(cls, values):
+    return cls.from_tuple(values)
+
+
+def decode_event(data: bytes) -> Event:
+    """Decode the output of any Event.encode()"""
+    return _EVENT_CLASSES[data[0]].decode(data)
+
+
+class TickEvent(Event):
+    _fields = ("sym", "exc", "code", "timestamp", "bid_p", "ask_p", "bid_v", "ask_v", "skipped")
+    __slots__ = _fields + ("trace",)
+    type = EventType.TICK
+    _enums = {"exc": Exchange}
+
     def __init__(
         self,
         sym: str,
@@ -57,18 +164,74 @@ class TickEvent:
         self.sym = sym  # ETHMYR
         self.exc = exchange  # Exchange.LUNO
         self.code = code  # ETHMYR.luno
-        self.type = EventType.TICK
         self.timestamp = timestamp
         self.bid_p = bid_p
         self.ask_p = ask_p
         self.bid_v = bid_v
         self.ask_v = ask_v
+        self.skipped = 0  # older ticks of this code replaced by this one while queued
+        self.trace = None  # [(stage, monotonic ns)] when tracing latency, see src/utils/latency.py
 
     def __str__(self):
         return f"TICK {self.sym}.{self.exc.value} - date: {self.timestamp}, bid: {self.bid_p}, ask: {self.ask_p}"
 
 
-class OrderEvent:
+class TradeEvent(Event):
+    """A public trade on the exchange tape"""
+
+    __slots__ = _fields = (
+        "sym", "exc", "code", "timestamp", "price", "volume", "side", "maker_oid", "taker_oid"
+    )
+    type = EventType.TRADE
+    _enums = {"exc": Exchange, "side": OrderDir}
+
+    def __init__(
+        self,
+        sym: str,
+        exchange: Exchange,
+        code: str,  # sym.exc e.g. ETHMYR.luno
+        timestamp,
+        price: float,
+        volume: float,
+        side: OrderDir,  # aggressor side, BID = taker bought
+        maker_oid=None,
+        taker_oid=None,
+    ):
+        self.sym = sym
+        self.exc = exchange
+        self.code = code
+        self.timestamp = timestamp
+        self.price = price
+        self.volume = volume
+        self.side = side
+        self.maker_oid = maker_oid
+        self.taker_oid = taker_oid
+
+    def __str__(self):
+        return f"TRADE {self.sym}.{self.exc.value} - date: {self.timestamp}, side: {self.side.value}, price: {self.price}, volume: {self.volume}"
+
+
+class OrderEvent(Event):
+    _fields = (
+        "oid",
+        "sid",
+        "sym",
+        "ordertype",
+        "direction",
+        "time_in_force",
+        "base_volume",
+        "counter_volume",
+        "price",
+        "stop",
+        "post_only",
+        "order_time",
+        "execution_price",
+        "luno_oid",
+    )
+    __slots__ = _fields + ("trace",)
+    type = EventType.ORDER
+    _enums = {"ordertype": OrderType, "direction": OrderDir}
+
     def __init__(
         self,
         sid,
@@ -84,7 +247,6 @@ class OrderEvent:
         self.oid = None  # generate client_oid
         self.sid = sid  # strategy id
         self.sym = sym
-        self.type = EventType.ORDER
         self.ordertype = ordertype  # MKT or LMT or STP LMT
         self.direction = direction
         self.time_in_force = time_in_force  # GTC, IOC, FOK
@@ -96,6 +258,7 @@ class OrderEvent:
         self.order_time = time.time_ns() / 1000  # in ms
         self.execution_price = None
         self.luno_oid = None  # luno oid
+        self.trace = None  # [(stage, monotonic ns)] when tracing latency, see src/utils/latency.py
 
         # NOTE!: By default, all orders need to provide base_volume
         # (i.e. trading BTCMYR, all units are determine in BTC. Base vol of 1 == 1 BTC).
@@ -106,14 +269,23 @@ class OrderEvent:
     def __str__(self):
         return f"ORDER {self.sym}.{self.sid} - ts: {self.order_time}, luno_oid: {self.luno_oid},client_oid: {self.oid}, type: {self.ordertype}, dir: {self.direction.value}, price: {self.price}, unit: {self.base_volume}"
 
-    def _dict(self):
-        dic = copy.deepcopy(self.__dict__)
-        dic['type'] = self.type.value
-        dic['ordertype'] = self.ordertype.value
-        dic['direction'] = self.direction.value
-        return dic
 
-class FillEvent:
+class FillEvent(Event):
+    __slots__ = _fields = (
+        "sid",
+        "oid",
+        "sym",
+        "dir",
+        "base_volume",
+        "counter_volume",
+        "fee_base",
+        "create_ts",
+        "complete_ts",
+        "exec_price",
+    )
+    type = EventType.FILL
+    _enums = {"dir": OrderDir}
+
     def __init__(
         self,
         sid: str,
@@ -129,7 +301,6 @@ class FillEvent:
         self.sid = sid
         self.oid = oid
         self.sym = sym
-        self.type = EventType.FILL
         self.dir = dir
         self.base_volume = float(base)
         self.counter_volume = float(counter)
@@ -141,12 +312,11 @@ class FillEvent:
     def __str__(self):
         return f"FILL {self.sym}.{self.sid} - ts: {self.complete_ts}, oid: {self.oid}, exec_price: {self.exec_price}, base_vol: {self.base_volume}, counter_vol: {self.counter_volume} "
 
-    def _dict(self):
-        dic = copy.deepcopy(self.__dict__)
-        dic['type'] = self.type.value
-        dic['dir'] = self.dir.value
-        return dic
 
-class CheckOrderStatusEvent:
-    def __init__(self):
-        self.type = EventType.CHECK_ORDER_STATUS
+class CheckOrderStatusEvent(Event):
+    _fields = ("force",)
+    __slots__ = _fields
+    type = EventType.CHECK_ORDER_STATUS
+
+    def __init__(self, force: bool = False):
+        self.force = force  # poll the exchange now, even inside order_status_interval
@@ -1,25 +1,225 @@
 from queue import Queue, Empty
+import asyncio
+import inspect
 import logging
-from threading import Thread
-from collections import defaultdict
+import itertools
+import time
+import weakref
+from threading import Thread, get_ident
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.events import EventType
+from src.utils import latency, metrics
 
 _logger = logging.getLogger("trading_system")
 
+# lane name -> event types, highest priority first
+DEFAULT_LANES = {
+    "orders": (EventType.FILL, EventType.ORDER),
+    "status": (EventType.CHECK_ORDER_STATUS,),
+    "market_data": (EventType.TICK, EventType.TRADE),
+}
+# max events per lane, 0 = unbounded
+DEFAULT_LANE_CAPACITY = {"orders": 0, "status": 100, "market_data": 10000}
+
+_engines = weakref.WeakSet()  # for the queue metrics, read on scrape
+_engine_ids = itertools.count(1)
+
+
+def _queue_depths() -> dict:
+    return {(e.name, lane): n for e in list(_engines) for lane, n in e.depths().items()}
+
+
+def _dropped() -> dict:
+    dropped = {}
+    for engine in list(_engines):
+        for lane, stats in getattr(engine._queue, "stats", {}).items():
+            dropped[(engine.name, lane)] = stats["dropped"]
+    return dropped
+
+
+metrics.gauge(
+    "cts_event_queue_depth", "Events waiting in an engine queue", ("engine", "lane"), function=_queue_depths
+)
+metrics.counter(
+    "cts_event_dropped_total", "Events dropped by full PriorityLaneQueue lanes", ("engine", "lane"), function=_dropped
+)
+DISPATCH_SECONDS = metrics.histogram(
+    "cts_event_dispatch_seconds", "Handler time per event, batches averaged", ("engine", "type")
+)
+
+
+class ConflatingBuffer:
+    """FIFO of events in which a queued TickEvent is replaced by newer ticks of the same code.
+
+    The delivered tick keeps the queue position of the first one and counts
+    the ticks it replaced in `skipped`, so at most one tick per code is held
+    however fast ticks arrive. Codes in `passthrough` are queued as is.
+    """
+
+    def __init__(self, passthrough=()):
+        self._order = deque()  # events, or the code of a queued tick
+        self._ticks = {}  # code -> latest TickEvent
+        self.passthrough = set(passthrough)
+        self.conflated = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def append(self, event):
+        if event.type != EventType.TICK or event.code in self.passthrough:
+            self._order.append(event)
+            return
+        queued = self._ticks.get(event.code)
+        self._ticks[event.code] = event
+        if queued is None:
+            self._order.append(event.code)
+        else:
+            event.skipped += queued.skipped + 1
+            self.conflated += 1
+
+    def set_passthrough(self, codes):
+        """Codes whose ticks are all delivered"""
+        self.passthrough = set(codes)
+
+    def popleft(self):
+        entry = self._order.popleft()
+        if type(entry) is str:
+            return self._ticks.pop(entry)
+        return entry
+
+
+class ConflatingQueue(Queue):
+    """Market data queue keeping only the latest TickEvent per code, see ConflatingBuffer"""
+
+    def __init__(self, passthrough=()):
+        self._passthrough = passthrough
+        super().__init__()
+
+    def _init(self, maxsize):
+        self.queue = ConflatingBuffer(self._passthrough)
+
+    def set_passthrough(self, codes):
+        """Codes whose ticks are all delivered"""
+        with self.mutex:
+            self.queue.set_passthrough(codes)
+
+    @property
+    def conflated(self) -> int:
+        return self.queue.conflated
+
+
+class PriorityLaneQueue(Queue):
+    """Queue with one FIFO lane per group of event types.
+
+    get() always takes from the highest priority non-empty lane, so fills and
+    orders drain before anything queued behind them in lower lanes. Event
+    types not in any lane go to the last one.
+
+    put() never blocks: when a bounded lane is full its oldest event is
+    dropped (and counted), which suits market data where only the latest
+    state matters. Order lanes should stay unbounded.
+
+    With conflate, the market_data lane keeps only the latest tick per code
+    (see ConflatingBuffer).
+    """
+
+    def __init__(self, lanes: dict = None, capacity: dict = None, conflate: bool = False):
+        self.lanes = dict(lanes or DEFAULT_LANES)
+        self.capacity = dict(DEFAULT_LANE_CAPACITY)
+        self.capacity.update(capacity or {})
+        self.conflate = conflate
+        super().__init__()
+
+    def _init(self, maxsize):
+        self._lanes = [
+            ConflatingBuffer() if self.conflate and name == "market_data" else deque()
+            for name in self.lanes
+        ]
+        self._lane_of = {t: i for i, types in enumerate(self.lanes.values()) for t in types}
+        self._maxlen = [self.capacity.get(name, 0) for name in self.lanes]
+        self._size = 0
+        self.stats = {name: {"put": 0, "dropped": 0, "max_depth": 0} for name in self.lanes}
+        self._lane_stats = list(self.stats.values())
+
+    def _qsize(self):
+        return self._size
+
+    def _put(self, event):
+        i = self._lane_of.get(event.type, len(self._lanes) - 1)
+        lane, stats = self._lanes[i], self._lane_stats[i]
+        depth = len(lane)
+        lane.append(event)
+        if self._maxlen[i] and len(lane) > self._maxlen[i]:
+            lane.popleft()
+            stats["dropped"] += 1
+        self._size += len(lane) - depth
+        stats["put"] += 1
+        if len(lane) > stats["max_depth"]:
+            stats["max_depth"] = len(lane)
+
+    def _get(self):
+        for lane in self._lanes:
+            if lane:
+                self._size -= 1
+                return lane.popleft()
+
+    def set_passthrough(self, codes):
+        """Codes whose ticks are all delivered when conflating"""
+        with self.mutex:
+            for lane in self._lanes:
+                if isinstance(lane, ConflatingBuffer):
+                    lane.set_passthrough(codes)
+
+    def depths(self) -> dict:
+        """Events currently waiting per lane"""
+        with self.mutex:
+            return {name: len(lane) for name, lane in zip(self.lanes, self._lanes)}
+
+
 class EventEngine:
-    def __init__(self):
+    def __init__(self, queue: Queue = None, batch_size: int = None, journal=None, name: str = None):
+        """
+        Args:
+            queue (Queue, optional): event queue, e.g. PriorityLaneQueue. Defaults to a FIFO Queue.
+            batch_size (int, optional): drain up to this many queued events per wakeup
+                under a single lock instead of one get() per event. Defaults to None.
+            journal (EventJournal, optional): records every event before it is dispatched.
+            name (str, optional): engine label of its metrics. Defaults to engine<n>.
+        """
+        self.name = name or f"engine{next(_engine_ids)}"
         self._active = False
-        self._queue = Queue()
-        self._thread = Thread(target=self._run)
+        self._queue = queue if queue is not None else Queue()
+        self._batch_size = batch_size
+        self._journal = journal
+        self._thread = Thread(target=self._run_batches if batch_size else self._run)
         self._handlers = defaultdict(list)
+        self._batch_handlers = defaultdict(list)
+        _engines.add(self)
 
     def _run(self):
         while self._active == True:
             try:
                 event = self._queue.get(block=True, timeout=1)
+                if self._journal is not None:
+                    self._journal.append(event)
+                traced = latency.tracer is not None
+                if traced:
+                    latency.handlers_started((event,))
+                timed = metrics.enabled
+                if timed:
+                    start = time.perf_counter()
                 # handle events if only handlers are registered.
                 # each event can possible be passed into multiple handlers e.g. orders -> order manager/ positions
-                if event.type in self._handlers:
-                    [handler(event) for handler in self._handlers[event.type]]
+                for handler in self._handlers.get(event.type, ()):
+                    handler(event)
+                for handler in self._batch_handlers.get(event.type, ()):
+                    handler([event])
+                if timed:
+                    DISPATCH_SECONDS.labels(self.name, event.type.name).observe(time.perf_counter() - start)
+                if traced:
+                    latency.handlers_done((event,))
             except Empty:
                 pass
             except Exception as e:
@@ -27,6 +227,64 @@ class EventEngine:
                 _logger.error(f"Event engine exception: {e}")
                 pass
 
+    def _get_batch(self, timeout=1):
+        """Wait for events, then take up to batch_size of them in one go"""
+        q = self._queue
+        with q.not_empty:
+            if not q._qsize():
+                end = time.monotonic() + timeout
+                while not q._qsize():
+                    remaining = end - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    q.not_empty.wait(remaining)
+            n = min(self._batch_size, q._qsize())
+            events = [q._get() for _ in range(n)]
+            q.not_full.notify(n)
+        return events
+
+    def _run_batches(self):
+        while self._active == True:
+            try:
+                events = self._get_batch()
+            except Empty:
+                continue
+            # dispatch runs of same type events, keeping the order between types
+            start, n = 0, len(events)
+            while start < n:
+                type_ = events[start].type
+                end = start + 1
+                while end < n and events[end].type is type_:
+                    end += 1
+                self._dispatch(type_, events[start:end] if end - start < n else events)
+                start = end
+
+    def _dispatch(self, type_, events: list):
+        if self._journal is not None:
+            self._journal.extend(events)
+        traced = latency.tracer is not None
+        if traced:
+            latency.handlers_started(events)
+        timed = metrics.enabled
+        if timed:
+            start = time.perf_counter()
+        for handler in self._handlers.get(type_, ()):
+            for event in events:
+                try:
+                    handler(event)
+                except Exception as e:
+                    _logger.error(f"Event engine exception: {e}")
+        for handler in self._batch_handlers.get(type_, ()):
+            try:
+                handler(events)
+            except Exception as e:
+                _logger.error(f"Event engine exception: {e}")
+        if timed:
+            n = len(events)
+            DISPATCH_SECONDS.labels(self.name, type_.name).observe((time.perf_counter() - start) / n, n)
+        if traced:
+            latency.handlers_done(events)
+
     def start(self, timer=True):
         self._active = True
         self._thread.start()
@@ -36,11 +294,180 @@ class EventEngine:
         self._thread.join()
 
     def put(self, event):
+        if latency.tracer is not None:
+            latency.put(event)
         self._queue.put(event)
 
+    def set_journal(self, journal):
+        """Record dispatched events in an EventJournal, None to stop"""
+        self._journal = journal
+
+    def depths(self) -> dict:
+        """Queued events, per lane with a PriorityLaneQueue"""
+        if hasattr(self._queue, "depths"):
+            return self._queue.depths()
+        return {"all": self._queue.qsize()}
+
+    def register_handler(self, type_, handler):
+        if handler not in self._handlers[type_]:
+            self._handlers[type_].append(handler)
+
+    def register_batch_handler(self, type_, handler):
+        """handler(events) gets a list of events of type_, every drained run of them in batch mode"""
+        if handler not in self._batch_handlers[type_]:
+            self._batch_handlers[type_].append(handler)
+
+    def unregister_handler(self, type_, handler):
+        pass
+
+
+class _BufferedQueue(asyncio.Queue):
+    """asyncio.Queue over a deque-like buffer, e.g. ConflatingBuffer"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        super().__init__()
+
+    def _init(self, maxsize):
+        self._queue = self._buffer
+
+
+def _call_each(handler, events: list):
+    """Run a plain handler on each event, on AsyncEventEngine's handler thread"""
+    for event in events:
+        try:
+            handler(event)
+        except Exception as e:
+            _logger.error(f"Event engine exception: {e}")
+
+
+class AsyncEventEngine:
+    """EventEngine running on the asyncio loop instead of a thread.
+
+    Same register_handler/put API. Handlers may be plain functions or
+    coroutine functions (awaited in order before the next event). By default
+    all of them run on the loop, so a blocking handler holds up the loop too.
+    With handler_thread, plain handlers run on one engine thread through
+    run_in_executor instead (still one at a time, in event order), so REST
+    calls in them leave the loop free for the streams; coroutine handlers
+    stay on the loop.
+
+    put() can be called from any thread; calls from outside the loop are
+    handed over with call_soon_threadsafe. start() needs a running loop.
+    """
+
+    def __init__(
+        self, buffer=None, batch_size: int = None, journal=None, name: str = None, handler_thread: bool = False
+    ):
+        """
+        Args:
+            buffer (optional): deque-like event buffer, e.g. ConflatingBuffer. Defaults to a FIFO.
+            batch_size (int, optional): handle up to this many queued events per wakeup.
+            journal (EventJournal, optional): records every event before it is dispatched.
+            name (str, optional): engine label of its metrics. Defaults to engine<n>.
+            handler_thread (bool, optional): run plain handlers off the loop. Defaults to False.
+        """
+        self.name = name or f"engine{next(_engine_ids)}"
+        self._queue = _BufferedQueue(buffer) if buffer is not None else asyncio.Queue()
+        self._batch_size = batch_size or 1
+        self._journal = journal
+        self._handlers = defaultdict(list)
+        self._batch_handlers = defaultdict(list)
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.name}-handlers") if handler_thread else None
+        )
+        _engines.add(self)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = get_ident()
+        self._task = self._loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def put(self, event):
+        if latency.tracer is not None:
+            latency.put(event)
+        if self._loop is None or get_ident() == self._loop_thread:
+            self._queue.put_nowait(event)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def set_journal(self, journal):
+        """Record dispatched events in an EventJournal, None to stop"""
+        self._journal = journal
+
+    def depths(self) -> dict:
+        return {"all": self._queue.qsize()}
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            events = [await queue.get()]
+            while len(events) < self._batch_size and not queue.empty():
+                events.append(queue.get_nowait())
+            # dispatch runs of same type events, keeping the order between types
+            start, n = 0, len(events)
+            while start < n:
+                type_ = events[start].type
+                end = start + 1
+                while end < n and events[end].type is type_:
+                    end += 1
+                await self._dispatch(type_, events[start:end] if end - start < n else events)
+                start = end
+
+    async def _dispatch(self, type_, events: list):
+        if self._journal is not None:
+            self._journal.extend(events)
+        traced = latency.tracer is not None
+        if traced:
+            latency.handlers_started(events)
+        timed = metrics.enabled
+        if timed:
+            start = time.perf_counter()
+        executor = self._executor
+        for handler in self._handlers.get(type_, ()):
+            if executor is not None and not inspect.iscoroutinefunction(handler):
+                await self._loop.run_in_executor(executor, _call_each, handler, events)
+                continue
+            for event in events:
+                try:
+                    result = handler(event)
+                    if result is not None and inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    _logger.error(f"Event engine exception: {e}")
+        for handler in self._batch_handlers.get(type_, ()):
+            try:
+                if executor is not None and not inspect.iscoroutinefunction(handler):
+                    await self._loop.run_in_executor(executor, handler, events)
+                    continue
+                result = handler(events)
+                if result is not None and inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                _logger.error(f"Event engine exception: {e}")
+        if timed:
+            n = len(events)
+            DISPATCH_SECONDS.labels(self.name, type_.name).observe((time.perf_counter() - start) / n, n)
+        if traced:
+            latency.handlers_done(events)
+
     def register_handler(self, type_, handler):
         if handler not in self._handlers[type_]:
             self._handlers[type_].append(handler)
 
+    def register_batch_handler(self, type_, handler):
+        if handler not in self._batch_handlers[type_]:
+            self._batch_handlers[type_].append(handler)
+
     def unregister_handler(self, type_, handler):
         pass
@@ -0,0 +1,157 @@
+"""
+Market data feed process
+
+Owns the market data connections for a set of codes and writes the latest
+L1/L2 of each one into a shared-memory market data bus (see shm_bus), which
+any number of TradingSystem(market_data_bus=...) processes on the host read
+instead of connecting themselves. Luno order books are streamed through a
+MarketDataGateway, Kraken tickers are polled (L1 only, concurrently) every heartbeat.
+
+Public trades are not carried on the bus.
+
+Usage (from the repo root):
+    python -m src.marketdata.feed [strategy_config.yaml] [bus_name]
+all instruments of the active strategies in the config are published.
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import yaml
+from dotenv import dotenv_values
+
+from src.brokerage.kraken.kraken import Kraken
+from src.brokerage.luno.luno import Luno
+from src.events import EventType, Exchange
+from src.marketdata.gateway import MarketDataGateway
+from src.marketdata.shm_bus import DEFAULT_DEPTH, DEFAULT_NAME, MarketDataBusWriter
+from src.marketdata.ticker_poller import TickerPoller
+from src.orderbook.orderbook import orderBook
+
+_logger = logging.getLogger("trading_system")
+
+
+class MarketDataFeed:
+    def __init__(
+        self,
+        auth_config: dict,
+        codes: list,
+        name: str = DEFAULT_NAME,
+        depth: int = DEFAULT_DEPTH,
+        heartbeat: float = 1,
+        markets_info: dict = None,
+        stream_url: str = None,
+    ):
+        """
+        Args:
+            auth_config (dict): .env config with exchange keys
+            codes (list): codes to publish, e.g. ["ETHMYR.luno", "ETHUSD.kraken"]
+            name (str, optional): shared memory segment name. Defaults to DEFAULT_NAME.
+            depth (int, optional): L2 levels published per side. Defaults to 10.
+            heartbeat (float, optional): seconds between ticker polls. Defaults to 1.
+            markets_info (dict, optional): Luno TradeClient.get_markets_info(), enables fixed-point books
+            stream_url (str, optional): stream url template, see MarketDataGateway
+        """
+        codes = sorted(set(codes))
+        sources = (Exchange.LUNO.value, Exchange.KRAKEN.value)
+        unsupported = [c for c in codes if c.split(".")[1] not in sources]
+        if unsupported:
+            raise ValueError(f"no market data source for {unsupported}")
+        self.heartbeat = heartbeat
+        self.writer = MarketDataBusWriter(codes, name=name, depth=depth)
+        self.gateway = MarketDataGateway(
+            auth_config=auth_config,
+            mkt_event_engine=self,
+            symbols=codes,
+            markets_info=markets_info,
+            stream_url=stream_url,
+        )
+        for book in self.gateway.books.values():
+            book.on_top_of_book = None
+            book.on_trades = None
+            book.on_depth = self.publish_book
+        self.polled = [c for c in codes if c not in self.gateway.books]
+        self.kraken_tc = None
+        self.poller = None
+        if self.polled:
+            self.kraken_tc = Kraken(
+                auth_config=auth_config, mkt_event_engine=self, action_event_engine=None
+            ).get_trade_client()
+            self.poller = TickerPoller({Exchange.KRAKEN.value: self.kraken_tc})
+
+    def publish_book(self, book: orderBook):
+        """Write L1 and the top levels of a streamed book"""
+        bid, ask = book.bid_levels.best(), book.ask_levels.best()
+        if bid is None or ask is None:
+            return
+        depth = self.writer.depth
+        bids = [[book.to_price(p), book.to_volume(v)] for p, v in book.top_bids(depth)]
+        asks = [[book.to_price(p), book.to_volume(v)] for p, v in book.top_asks(depth)]
+        self.writer.publish(
+            f"{book.pair}.{Exchange.LUNO.value}",
+            book.timestamp if book.timestamp is not None else time.time() * 1000,
+            bids[0][0],
+            asks[0][0],
+            bids[0][1],
+            asks[0][1],
+            bids,
+            asks,
+        )
+
+    def put(self, event):
+        """Polled TickEvents (the trade clients publish into the feed as their market engine)"""
+        if event.type == EventType.TICK:
+            self.writer.publish(
+                event.code, event.timestamp, event.bid_p, event.ask_p, event.bid_v, event.ask_v
+            )
+
+    async def run(self):
+        await asyncio.gather(self.gateway.run(), self._poll_tickers())
+
+    async def _poll_tickers(self):
+        while self.polled:
+            start = time.perf_counter()
+            await self.poller.poll(self.polled, timeout=self.heartbeat)
+            await asyncio.sleep(max(self.heartbeat - (time.perf_counter() - start), 0))
+
+    async def close(self):
+        await self.gateway.close()
+        if self.poller is not None:
+            self.poller.close()
+        self.writer.close()
+
+
+def active_instruments(path: str) -> list:
+    """Instruments of the active strategies in a strategy config"""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f)
+    return sorted(
+        {
+            code
+            for strategy in config["strategy"].values()
+            if strategy.get("active")
+            for code in strategy["instruments"]
+        }
+    )
+
+
+async def main(config_path: str, name: str):
+    auth_config = dotenv_values(".env")
+    codes = active_instruments(config_path)
+    markets_info = None
+    if any(c.split(".")[1] == Exchange.LUNO.value for c in codes):
+        luno_tc = Luno(auth_config, mkt_event_engine=None, action_event_engine=None).get_trade_client()
+        markets_info = luno_tc.get_markets_info()
+    feed = MarketDataFeed(auth_config, codes, name=name, markets_info=markets_info)
+    print(f"Publishing {codes} on market data bus {name}")
+    try:
+        await feed.run()
+    finally:
+        await feed.close()
+
+
+if __name__ == "__main__":
+    config_path = sys.argv[1] if len(sys.argv) > 1 else "./src/configs/global_strategy_config.yaml"
+    name = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_NAME
+    asyncio.run(main(config_path, name))
@@ -0,0 +1,164 @@
+"""
+Market data gateway
+
+Runs one Luno order book stream per active symbol on a single asyncio loop
+and publishes L1 TickEvents into the market event engine whenever the best
+bid/ask (price or volume) changes, and a TradeEvent for every trade on the
+tape. Replaces REST ticker polling for Luno.
+
+All streams share one ConnectionThrottle, so together they stay within the
+50 session limit and back off together when the exchange refuses connections.
+
+With a snapshot_dir, books are saved periodically and warm started from the
+last snapshot on startup (see orderBook.save_states/load_states).
+"""
+import asyncio
+import logging
+import pathlib
+
+from src.events import Exchange, OrderDir, TickEvent, TradeEvent
+from src.events_engine import EventEngine
+from src.orderbook.orderbook import orderBook, ConnectionThrottle
+from src.utils import latency
+
+_logger = logging.getLogger("trading_system")
+
+MAX_SESSIONS = 50
+
+
+class MarketDataGateway:
+    def __init__(
+        self,
+        auth_config: dict,
+        mkt_event_engine: EventEngine,
+        symbols: list,
+        markets_info: dict = None,
+        max_sessions: int = MAX_SESSIONS,
+        backoff: float = 10,
+        snapshot_dir: str = None,
+        snapshot_interval: float = 30,
+        snapshot_max_age: float = 300,
+        stream_url: str = None,
+    ):
+        """
+        Args:
+            auth_config (dict): .env config with luno keys
+            mkt_event_engine (EventEngine): engine TickEvents are published to
+            symbols (list): codes e.g. ["ETHMYR.luno"], non-luno codes are ignored
+            markets_info (dict, optional): TradeClient.get_markets_info(), enables fixed-point books
+            max_sessions (int, optional): stream session limit. Defaults to 50.
+            backoff (float, optional): seconds between connection attempts. Defaults to 10.
+            snapshot_dir (str, optional): where book snapshots are saved and warm started from.
+            snapshot_interval (float, optional): seconds between snapshots. Defaults to 30.
+            snapshot_max_age (float, optional): ignore older snapshots on startup. Defaults to 300.
+            stream_url (str, optional): stream url template with a {pair} field, e.g.
+                "ws://localhost:8765/api/1/stream/{pair}" for a replay server. Defaults to Luno.
+        """
+        self._mkt_queue = mkt_event_engine
+        self.snapshot_dir = pathlib.Path(snapshot_dir) if snapshot_dir is not None else None
+        self.snapshot_interval = snapshot_interval
+        self.throttle = ConnectionThrottle(max_sessions=max_sessions, backoff=backoff)
+        self.books = {}
+
+        codes = sorted({c for c in symbols if c.split(".")[1] == Exchange.LUNO.value})
+        if len(codes) > max_sessions:
+            raise ValueError(
+                f"{len(codes)} streams requested, Luno allows {max_sessions} sessions at one time"
+            )
+        for code in codes:
+            sym = code.split(".")[0]
+            url = stream_url.format(pair=sym.upper()) if stream_url is not None else None
+            if markets_info is not None and sym in markets_info:
+                book = orderBook.from_markets_info(auth_config, sym, markets_info, url=url)
+            else:
+                book = orderBook(auth_config, sym, url=url)
+            book.throttle = self.throttle
+            book.on_top_of_book = self.publish_tick
+            book.on_trades = self.publish_trades
+            self.books[code] = book
+            if self.snapshot_dir is not None and book.load_states(
+                self.snapshot_path(book), max_age=snapshot_max_age
+            ):
+                _logger.info(f"Warm started {code} at sequence {book.sequence}")
+
+    def snapshot_path(self, book: orderBook):
+        return self.snapshot_dir / f"{book.pair}.bin"
+
+    def save_snapshots(self):
+        for book in self.books.values():
+            if book.synced and book.sequence is not None:
+                book.save_states(self.snapshot_path(book))
+
+    def publish_tick(self, book: orderBook):
+        """Publish L1 of a book as a TickEvent"""
+        bid, ask = book.bid_levels.best(), book.ask_levels.best()
+        if bid is None or ask is None:
+            return
+        tick_event = TickEvent(
+            sym=book.pair,
+            exchange=Exchange.LUNO,
+            code=f"{book.pair}.{Exchange.LUNO.value}",
+            timestamp=book.timestamp,
+            bid_p=book.to_price(bid[0]),
+            ask_p=book.to_price(ask[0]),
+            bid_v=book.to_volume(bid[1]),
+            ask_v=book.to_volume(ask[1]),
+        )
+        latency.start_trace(tick_event, "book_update")
+        self._mkt_queue.put(tick_event)
+
+    def publish_trades(self, book: orderBook, trades: list):
+        """Publish the trades of one stream update (see orderBook.handle_trade) as TradeEvents"""
+        code = f"{book.pair}.{Exchange.LUNO.value}"
+        for trade in trades:
+            if trade["price"] is None:
+                continue
+            self._mkt_queue.put(
+                TradeEvent(
+                    sym=book.pair,
+                    exchange=Exchange.LUNO,
+                    code=code,
+                    timestamp=book.timestamp,
+                    price=trade["price"],
+                    volume=float(trade["base"]),
+                    side=OrderDir.BID if trade["type"] == "buy" else OrderDir.ASK,
+                    maker_oid=trade["maker_order_id"],
+                    taker_oid=trade["taker_order_id"],
+                )
+            )
+
+    def stats(self) -> dict:
+        """Sequence gap / resync counters per stream"""
+        return {code: dict(book.stats, synced=book.synced) for code, book in self.books.items()}
+
+    async def run(self):
+        tasks = [self._run_book(code, book) for code, book in self.books.items()]
+        if self.snapshot_dir is not None:
+            tasks.append(self._snapshot_loop())
+        await asyncio.gather(*tasks)
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                self.save_snapshots()
+            except Exception as e:
+                _logger.error(f"Order book snapshot failed: {e}")
+
+    async def _run_book(self, code: str, book: orderBook):
+        """Keep a single stream alive, reconnecting (with shared backoff) on errors"""
+        while True:
+            try:
+                await book.run()
+            except asyncio.CancelledError:
+                await book.close()
+                raise
+            except Exception as e:
+                _logger.error(f"Stream {code} dropped: {e}")
+                self.throttle.penalise()
+
+    async def close(self):
+        if self.snapshot_dir is not None:
+            self.save_snapshots()
+        for book in self.books.values():
+            await book.close()
@@ -0,0 +1,85 @@
+"""
+Luno stream recorder
+
+Captures raw stream frames, starting with the initial order book snapshot,
+into a gzip file with one `<receive time ns>\\t<frame>` line per frame.
+Recordings are replayed by src/marketdata/replay_server.py and the
+benchmarks.
+
+Usage (from the repo root):
+    python -m src.marketdata.recorder ETHMYR 600 ./recordings/ETHMYR.gz
+"""
+import asyncio
+import gzip
+import json
+import logging
+import sys
+import time
+
+import websockets
+from dotenv import dotenv_values
+
+_logger = logging.getLogger("trading_system")
+
+
+def read_recording(path):
+    """Yield (receive time ns, raw frame) from a recording"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            ts, _, frame = line.rstrip("\n").partition("\t")
+            yield int(ts), frame
+
+
+def write_recording(path, records):
+    """Write (receive time ns, raw frame) pairs, e.g. a synthetic stream"""
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for ts, frame in records:
+            f.write(f"{ts}\t{frame}\n")
+
+
+def read_frames(path):
+    """Raw frames of a recording, or of a plain file with one frame per line"""
+    if str(path).endswith(".gz"):
+        return [frame for _, frame in read_recording(path)]
+    with open(path) as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+class StreamRecorder:
+    def __init__(self, auth_config: dict, pair: str, path, url: str = None):
+        self.pair = pair.upper()
+        self.path = path
+        self.url = url or f"wss://ws.luno.com/api/1/stream/{self.pair}"
+        self.auth = {
+            "api_key_id": auth_config["luno_key_id"],
+            "api_key_secret": auth_config["luno_key_secret"],
+        }
+        self.frames = 0
+
+    async def record(self, duration: float = None):
+        """Record until the stream closes or `duration` seconds have passed"""
+        deadline = None if duration is None else time.monotonic() + duration
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            async with websockets.connect(self.url) as ws:
+                await ws.send(json.dumps(self.auth))
+                while deadline is None or time.monotonic() < deadline:
+                    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                    try:
+                        frame = await asyncio.wait_for(ws.recv(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    except websockets.ConnectionClosed:
+                        _logger.warning(f"{self.pair} stream closed while recording")
+                        break
+                    if isinstance(frame, bytes):
+                        frame = frame.decode("utf-8")
+                    f.write(f"{time.time_ns()}\t{frame}\n")
+                    self.frames += 1
+        return self.frames
+
+
+if __name__ == "__main__":
+    pair, duration, path = sys.argv[1], float(sys.argv[2]), sys.argv[3]
+    recorder = StreamRecorder(dotenv_values(".env"), pair, path)
+    n = asyncio.run(recorder.record(duration))
+    print(f"Recorded {n} frames of {pair} to {path}")
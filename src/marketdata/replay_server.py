@@ -0,0 +1,279 @@
+"""
+Local stand-in for the Luno stream
+
+Serves recordings made by src/marketdata/recorder.py over a local websocket,
+so orderBook and MarketDataGateway can be run and benchmarked without
+network access. Point them at it with
+`MarketDataGateway(..., stream_url="ws://localhost:8765/api/1/stream/{pair}")`.
+
+Each pair is one timeline: the recording plays at `speed` times real time
+(None plays as fast as the slowest client reads) while at least one client
+is connected, and pauses otherwise. A client joining mid-way gets a snapshot
+of the book at the current position, like a fresh Luno session, followed by
+the live updates.
+
+Faults can be injected per client to exercise gap recovery and reconnects:
+    drop_rate          share of update frames silently dropped (sequence gaps)
+    reorder_rate       share of update frames delivered after the next one
+    disconnect_every   close the session after this many updates
+
+Usage (from the repo root):
+    python -m src.marketdata.replay_server ETHMYR=./recordings/ETHMYR.gz [speed]
+"""
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from decimal import Decimal
+
+import websockets
+
+from src.marketdata.recorder import read_recording
+
+_logger = logging.getLogger("trading_system")
+
+_CLOSE = object()
+
+
+class _Client:
+    def __init__(self, ws, rng: random.Random, queue_size: int):
+        self.ws = ws
+        self.rng = rng
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.sent = 0
+        self.held = None  # frame delayed by reorder injection
+        self.closed = False
+
+
+class _Feed:
+    """Timeline and current book state of one recorded pair"""
+
+    def __init__(self, pair: str, frames: list):
+        self.pair = pair
+        self.frames = frames  # [(receive time ns, raw frame)], snapshot first
+        snapshot = json.loads(frames[0][1])
+        self.sequence = int(snapshot["sequence"])
+        self.timestamp = snapshot.get("timestamp")
+        self.orders = {}  # order_id -> [type, price, volume]
+        for side, key in (("BID", "bids"), ("ASK", "asks")):
+            for o in snapshot[key]:
+                self.orders[o["id"]] = [side, o["price"], Decimal(o["volume"])]
+        self.position = 1  # next frame to play
+        self._applied = 1  # next frame to apply to the book state, see snapshot()
+        self.clients = set()
+        self.has_clients = asyncio.Event()
+        self.done = asyncio.Event()
+
+    def snapshot(self) -> str:
+        """Book at the current position, the state is only advanced when asked for"""
+        for _, raw in self.frames[self._applied : self.position]:
+            self.apply(raw)
+        self._applied = self.position
+        bids, asks = [], []
+        for order_id, (side, price, volume) in self.orders.items():
+            (bids if side == "BID" else asks).append(
+                {"id": order_id, "price": price, "volume": str(volume)}
+            )
+        return json.dumps(
+            {
+                "sequence": str(self.sequence),
+                "asks": asks,
+                "bids": bids,
+                "status": "ACTIVE",
+                "timestamp": self.timestamp,
+            }
+        )
+
+    def apply(self, raw: str):
+        data = json.loads(raw)
+        if not isinstance(data, dict) or "sequence" not in data:
+            return
+        self.sequence = int(data["sequence"])
+        self.timestamp = data.get("timestamp", self.timestamp)
+        create = data.get("create_update")
+        if create:
+            self.orders[create["order_id"]] = [
+                create["type"],
+                create["price"],
+                Decimal(create["volume"]),
+            ]
+        delete = data.get("delete_update")
+        if delete:
+            self.orders.pop(delete["order_id"], None)
+        for trade in data.get("trade_updates") or ():
+            order = self.orders.get(trade["maker_order_id"])
+            if order is None:
+                continue
+            order[2] -= Decimal(trade["base"])
+            if order[2] <= 0:
+                del self.orders[trade["maker_order_id"]]
+
+
+class ReplayServer:
+    def __init__(
+        self,
+        recordings: dict,
+        host: str = "localhost",
+        port: int = 8765,
+        speed: float = 1.0,
+        drop_rate: float = 0.0,
+        reorder_rate: float = 0.0,
+        disconnect_every: int = None,
+        seed: int = None,
+        queue_size: int = 1000,
+    ):
+        """
+        Args:
+            recordings (dict): pair -> recording path, e.g. {"ETHMYR": "ETHMYR.gz"}
+            host (str, optional): Defaults to "localhost".
+            port (int, optional): 0 picks a free port. Defaults to 8765.
+            speed (float, optional): multiple of real time, None for as fast as possible. Defaults to 1.0.
+            drop_rate (float, optional): share of updates dropped per client. Defaults to 0.0.
+            reorder_rate (float, optional): share of updates swapped with the next one. Defaults to 0.0.
+            disconnect_every (int, optional): close sessions after this many updates. Defaults to None.
+            seed (int, optional): seed for the fault injection.
+            queue_size (int, optional): frames buffered per client before the timeline waits.
+        """
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.drop_rate = drop_rate
+        self.reorder_rate = reorder_rate
+        self.disconnect_every = disconnect_every
+        self.queue_size = queue_size
+        self._rng = random.Random(seed)
+        self.feeds = {
+            pair.upper(): _Feed(pair.upper(), list(read_recording(path)))
+            for pair, path in recordings.items()
+        }
+        self._server = None
+        self._tasks = []
+        self.stats = {"sessions": 0, "dropped": 0, "reordered": 0, "disconnects": 0}
+
+    @property
+    def url(self) -> str:
+        """Stream url template for orderBook / MarketDataGateway"""
+        return f"ws://{self.host}:{self.port}/api/1/stream/{{pair}}"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        if not self.port:  # port 0 picks a free port
+            self.port = next(iter(self._server.sockets)).getsockname()[1]
+        self._tasks = [asyncio.ensure_future(self._play(feed)) for feed in self.feeds.values()]
+
+    async def wait_done(self):
+        """Wait until every recording has been played to the end"""
+        await asyncio.gather(*(feed.done.wait() for feed in self.feeds.values()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.close()
+
+    async def _handle(self, ws, *args):
+        # websockets < 10.1 passes the request path as a second argument
+        path = args[0] if args else getattr(ws, "path", None) or ws.request.path
+        feed = self.feeds.get(path.rstrip("/").split("/")[-1].upper())
+        if feed is None:
+            await ws.close(code=1008, reason="unknown pair")
+            return
+        try:
+            await ws.recv()  # api key message, not checked
+        except websockets.ConnectionClosed:
+            return
+
+        client = _Client(ws, random.Random(self._rng.random()), self.queue_size)
+        client.queue.put_nowait(feed.snapshot())
+        feed.clients.add(client)
+        feed.has_clients.set()
+        self.stats["sessions"] += 1
+        # wake the sender up if the client goes away while the timeline is idle
+        closed = asyncio.ensure_future(ws.wait_closed())
+        closed.add_done_callback(lambda _: self._drop_client(feed, client))
+        try:
+            while True:
+                frame = await client.queue.get()
+                if frame is _CLOSE:
+                    break
+                await ws.send(frame)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._drop_client(feed, client)
+            await ws.close()
+            closed.cancel()
+
+    def _drop_client(self, feed: _Feed, client: _Client):
+        client.closed = True
+        feed.clients.discard(client)
+        if not feed.clients:
+            feed.has_clients.clear()
+        while not client.queue.empty():  # unblock a timeline waiting on this client
+            client.queue.get_nowait()
+        client.queue.put_nowait(_CLOSE)
+
+    async def _play(self, feed: _Feed):
+        frames = feed.frames
+        anchor = None  # (wall clock, recording clock) pacing reference
+        while feed.position < len(frames):
+            if not feed.clients:
+                await feed.has_clients.wait()
+                anchor = None
+            ts, raw = frames[feed.position]
+            if self.speed:
+                if anchor is None:
+                    anchor = (time.monotonic(), ts)
+                delay = anchor[0] + (ts - anchor[1]) / 1e9 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            is_update = raw != '""'  # keep alives are never dropped or reordered
+            feed.position += 1
+            for client in list(feed.clients):
+                await self._deliver(client, raw, is_update)
+            if not self.speed:
+                await asyncio.sleep(0)
+        feed.done.set()
+        _logger.info(f"Replay of {feed.pair} finished")
+
+    async def _deliver(self, client: _Client, raw: str, is_update: bool):
+        if client.closed:
+            return
+        if is_update:
+            rng = client.rng
+            if self.drop_rate and rng.random() < self.drop_rate:
+                self.stats["dropped"] += 1
+                return
+            if self.reorder_rate and client.held is None and rng.random() < self.reorder_rate:
+                client.held = raw
+                self.stats["reordered"] += 1
+                return
+        await client.queue.put(raw)
+        if client.held is not None:
+            await client.queue.put(client.held)
+            client.held = None
+        if is_update:
+            client.sent += 1
+            if self.disconnect_every and client.sent >= self.disconnect_every:
+                client.closed = True
+                self.stats["disconnects"] += 1
+                await client.queue.put(_CLOSE)
+
+
+if __name__ == "__main__":
+    recordings = dict(arg.split("=", 1) for arg in sys.argv[1:] if "=" in arg)
+    speeds = [arg for arg in sys.argv[1:] if "=" not in arg]
+    speed = float(speeds[0]) if speeds else 1.0
+    server = ReplayServer(recordings, speed=speed or None)
+    print(f"Replaying {list(recordings)} on {server.url}")
+    asyncio.run(server.serve_forever())
@@ -0,0 +1,402 @@
+"""
+Shared-memory market data bus
+
+One feed process (see src.marketdata.feed) owns the exchange connections and
+writes the latest L1 and top `depth` L2 levels of each symbol into that
+symbol's slot of a shared memory segment. TradingSystem processes on the same
+host attach to the segment and read the slots in place, instead of each one
+opening its own streams and polling its own tickers.
+
+Segment layout (little endian, prices and volumes as doubles):
+    header     magic, version, state, depth, n_slots, slot_size, writer pid (32 bytes)
+    directory  n_slots codes, 32 bytes each, e.g. b"ETHMYR.luno"
+    slots      n_slots slots of slot_size bytes:
+                   seq, timestamp, bid_p, ask_p, bid_v, ask_v, n_bids, n_asks,
+                   bids [price, volume] * depth, asks [price, volume] * depth
+
+Each slot is a seqlock: the writer makes seq odd, writes the slot and makes
+seq even again. A reader reads seq, the slot, then seq again and retries if
+seq was odd or moved, so readers never block the writer and never see a half
+written book. There must be a single writer per segment: a second writer only
+takes over a segment that is closed or whose writer process is gone. Missing
+volumes are stored as NaN and read back as None.
+"""
+import logging
+import math
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from multiprocessing import resource_tracker, shared_memory
+
+from src.events import Exchange, TickEvent
+from src.utils import latency
+
+_logger = logging.getLogger("trading_system")
+
+DEFAULT_NAME = "cts_market_data"
+DEFAULT_DEPTH = 10
+
+MAGIC = b"CTSMDBUS"
+VERSION = 1
+_LIVE = 1
+_CLOSED = 2
+
+_HEADER = struct.Struct("<8sHHHxxII")  # magic, version, state, depth, n_slots, slot_size
+_HEADER_SIZE = 32
+_STATE_OFFSET = 10
+_STATE = struct.Struct("<H")
+_OWNER_OFFSET = 24
+_OWNER = struct.Struct("<I")  # pid of the writer
+_CODE_SIZE = 32
+_SEQ = struct.Struct("<Q")
+_SLOT = struct.Struct("<QdddddHH4x")  # seq, timestamp, bid_p, ask_p, bid_v, ask_v, n_bids, n_asks
+
+BookSlot = namedtuple("BookSlot", "seq timestamp bid_p ask_p bid_v ask_v bids asks")
+
+
+def _nan(value):
+    return math.nan if value is None else value
+
+
+def _none(value):
+    return None if value != value else value  # NaN -> None
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without handing it to this process' resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # python 3.13+
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # otherwise the tracker unlinks the feed's segment when this process exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _check_stale(buf, name: str):
+    """Raise FileExistsError unless the segment is closed or its writer process is gone"""
+    if len(buf) < _HEADER_SIZE or bytes(buf[:8]) != MAGIC:
+        raise FileExistsError(f"shared memory {name} exists and is not a market data bus")
+    if _STATE.unpack_from(buf, _STATE_OFFSET)[0] == _CLOSED:
+        return
+    pid = _OWNER.unpack_from(buf, _OWNER_OFFSET)[0]
+    if pid:
+        try:
+            os.kill(pid, 0)
+            alive = True
+        except ProcessLookupError:
+            alive = False
+        except PermissionError:
+            alive = True  # another user's process
+        if not alive:
+            return
+    raise FileExistsError(
+        f"market data bus {name} is live (writer pid {pid or 'unknown'}), stop that feed or use another name"
+    )
+
+
+class MarketDataBusWriter:
+    """Creates the segment and writes the slots. One writer per segment."""
+
+    def __init__(self, codes: list, name: str = DEFAULT_NAME, depth: int = DEFAULT_DEPTH):
+        """
+        Args:
+            codes (list): codes with a slot, e.g. ["ETHMYR.luno", "ETHUSD.kraken"]
+            name (str, optional): shared memory segment name. Defaults to DEFAULT_NAME.
+            depth (int, optional): L2 levels kept per side. Defaults to 10.
+        """
+        self.codes = list(dict.fromkeys(codes))
+        self.name = name
+        self.depth = depth
+        n = len(self.codes)
+        slot_size = _SLOT.size + 32 * depth
+        self._shm = self._create(name, _HEADER_SIZE + (_CODE_SIZE + slot_size) * n)
+        self._buf = self._shm.buf
+        self._offsets = {}
+        self._seq = {}
+        slots = _HEADER_SIZE + _CODE_SIZE * n
+        for i, code in enumerate(self.codes):
+            raw = code.encode()
+            if len(raw) > _CODE_SIZE:
+                raise ValueError(f"code {code} longer than {_CODE_SIZE} bytes")
+            self._buf[_HEADER_SIZE + _CODE_SIZE * i : _HEADER_SIZE + _CODE_SIZE * i + len(raw)] = raw
+            self._offsets[code] = slots + slot_size * i
+            self._seq[code] = 0
+        self._sides = {}  # levels -> Struct
+        self._asks_offset = _SLOT.size + 16 * depth
+        _HEADER.pack_into(self._buf, 0, MAGIC, VERSION, _LIVE, depth, n, slot_size)
+        _OWNER.pack_into(self._buf, _OWNER_OFFSET, os.getpid())
+
+    @staticmethod
+    def _create(name, size):
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            existing = _attach(name)
+            try:
+                _check_stale(existing.buf, name)
+                # left behind by a feed that did not shut down, readers still on it see it closed
+                _STATE.pack_into(existing.buf, _STATE_OFFSET, _CLOSED)
+            finally:
+                existing.close()
+            stale = shared_memory.SharedMemory(name=name)  # tracked, so unlink also unregisters it
+            stale.close()
+            stale.unlink()
+            _logger.warning(f"Replaced stale market data bus {name}")
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def _side(self, n):
+        side = self._sides.get(n)
+        if side is None:
+            side = self._sides[n] = struct.Struct(f"<{2 * n}d")
+        return side
+
+    def publish(
+        self, code: str, timestamp, bid_p, ask_p, bid_v=None, ask_v=None, bids=(), asks=()
+    ):
+        """Write the state of one code
+
+        Args:
+            code (str): e.g. "ETHMYR.luno"
+            timestamp: exchange timestamp in ms
+            bid_p, ask_p, bid_v, ask_v: L1 as in TickEvent
+            bids, asks (list, optional): [price, volume] levels, best first, beyond depth are ignored.
+        """
+        buf, off = self._buf, self._offsets[code]
+        bids, asks = bids[: self.depth], asks[: self.depth]
+        seq = self._seq[code] + 1
+        _SEQ.pack_into(buf, off, seq)  # odd: write in progress
+        _SLOT.pack_into(
+            buf, off, seq, timestamp, bid_p, ask_p, _nan(bid_v), _nan(ask_v), len(bids), len(asks)
+        )
+        if bids:
+            self._side(len(bids)).pack_into(buf, off + _SLOT.size, *chain.from_iterable(bids))
+        if asks:
+            self._side(len(asks)).pack_into(buf, off + self._asks_offset, *chain.from_iterable(asks))
+        self._seq[code] = seq + 1
+        _SEQ.pack_into(buf, off, seq + 1)
+
+    def close(self):
+        """Mark the bus closed for readers and remove the segment"""
+        _STATE.pack_into(self._buf, _STATE_OFFSET, _CLOSED)
+        self._buf = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+class MarketDataBus:
+    """Read side of a segment created by MarketDataBusWriter"""
+
+    def __init__(self, name: str = DEFAULT_NAME, retries: int = 1000):
+        """
+        Args:
+            name (str, optional): shared memory segment name. Defaults to DEFAULT_NAME.
+            retries (int, optional): read attempts while a slot is being written.
+        """
+        self.name = name
+        self.retries = retries
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, version, _, self.depth, n, slot_size = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not a version {VERSION} market data bus")
+        self.codes = []
+        self._offsets = {}
+        slots = _HEADER_SIZE + _CODE_SIZE * n
+        for i in range(n):
+            start = _HEADER_SIZE + _CODE_SIZE * i
+            code = bytes(self._buf[start : start + _CODE_SIZE]).rstrip(b"\0").decode()
+            self.codes.append(code)
+            self._offsets[code] = slots + slot_size * i
+        # typed views over the segment, slots are 8 byte aligned so values are read in place
+        self._u64 = self._buf.cast("Q")
+        self._f64 = self._buf.cast("d")
+
+    @property
+    def closed(self) -> bool:
+        """Set once the feed has shut down, reattach to pick up a restarted feed"""
+        return _STATE.unpack_from(self._buf, _STATE_OFFSET)[0] != _LIVE
+
+    def seq(self, code: str) -> int:
+        """Slot sequence, changes on every write (odd while one is in progress)"""
+        return self._u64[self._offsets[code] >> 3]
+
+    def read(self, code: str, levels: bool = True) -> BookSlot:
+        """Consistent copy of a slot, None if it was never written
+
+        Args:
+            code (str): e.g. "ETHMYR.luno"
+            levels (bool, optional): also read the L2 levels. Defaults to True.
+        """
+        buf, off = self._buf, self._offsets[code]
+        u64, f64 = self._u64, self._f64
+        seq_index = off >> 3
+        bids_index = (off + _SLOT.size) >> 3
+        asks_index = bids_index + 2 * self.depth
+        bids = asks = None
+        for _ in range(self.retries):
+            seq = u64[seq_index]
+            if not seq & 1:
+                fields = _SLOT.unpack_from(buf, off)
+                if levels:
+                    # only the levels in use, straight from the segment
+                    bid_values = f64[bids_index : bids_index + 2 * fields[6]].tolist()
+                    ask_values = f64[asks_index : asks_index + 2 * fields[7]].tolist()
+                if u64[seq_index] == seq:
+                    break
+            time.sleep(0)  # the writer is mid-update, let it finish
+        else:
+            raise TimeoutError(f"{code} slot kept changing while reading")
+        if seq == 0:
+            return None
+        _, timestamp, bid_p, ask_p, bid_v, ask_v, _, _ = fields
+        if levels:
+            bids = [bid_values[i : i + 2] for i in range(0, len(bid_values), 2)]
+            asks = [ask_values[i : i + 2] for i in range(0, len(ask_values), 2)]
+        return BookSlot(seq, timestamp, bid_p, ask_p, _none(bid_v), _none(ask_v), bids, asks)
+
+    def close(self):
+        self._u64.release()  # views must go before the mapping does
+        self._f64.release()
+        self._buf = None
+        self._shm.close()
+
+
+class MarketDataBusSubscriber:
+    """Publishes a TickEvent into the market event engine whenever the L1 of a subscribed code changes on the bus
+
+    start() polls the slots on a thread of its own ("md-bus"), off the asyncio
+    loop the websocket handlers run on.
+    """
+
+    def __init__(
+        self,
+        mkt_event_engine,
+        codes: list = (),
+        name: str = DEFAULT_NAME,
+        poll_interval: float = 0.0005,
+    ):
+        """
+        Args:
+            mkt_event_engine (EventEngine): engine TickEvents are published to
+            codes (list, optional): codes to subscribe to, e.g. ["ETHMYR.luno"], see subscribe.
+            name (str, optional): shared memory segment name. Defaults to DEFAULT_NAME.
+            poll_interval (float, optional): seconds between slot checks. Defaults to 0.0005.
+        """
+        self._mkt_queue = mkt_event_engine
+        self.name = name
+        self.poll_interval = poll_interval
+        self.bus = MarketDataBus(name)
+        self.codes = []
+        self._targets = {}
+        self._last_seq = {}
+        self._last_l1 = {}
+        self._thread = None
+        self._stop = threading.Event()
+        missing = self.subscribe(codes)
+        if missing:
+            raise ValueError(f"{missing} not published on market data bus {name}")
+
+    def subscribe(self, codes: list) -> list:
+        """Subscribe to the codes the bus publishes, returns the ones it does not"""
+        missing = []
+        for code in codes:
+            if code not in self.bus.codes:
+                missing.append(code)
+            elif code not in self._targets:
+                sym, exc = code.split(".")
+                self.codes.append(code)
+                self._targets[code] = (sym, Exchange(exc))
+                self._last_seq[code] = 0
+        return missing
+
+    def poll(self) -> int:
+        """Check every subscribed slot once, returns the number of ticks published"""
+        n = 0
+        bus = self.bus
+        for code in self.codes:
+            seq = bus.seq(code)
+            if seq == self._last_seq[code]:
+                continue
+            slot = bus.read(code, levels=False)
+            if slot is None:
+                continue
+            self._last_seq[code] = slot.seq
+            l1 = (slot.bid_p, slot.ask_p, slot.bid_v, slot.ask_v)
+            if l1 == self._last_l1.get(code):
+                continue  # only deeper levels moved
+            self._last_l1[code] = l1
+            sym, exchange = self._targets[code]
+            tick_event = TickEvent(
+                sym=sym,
+                exchange=exchange,
+                code=code,
+                timestamp=slot.timestamp,
+                bid_p=slot.bid_p,
+                ask_p=slot.ask_p,
+                bid_v=slot.bid_v,
+                ask_v=slot.ask_v,
+            )
+            latency.start_trace(tick_event, "bus_read")
+            self._mkt_queue.put(tick_event)
+            n += 1
+        return n
+
+    def levels(self, code: str):
+        """Current (bids, asks) of a code, [price, volume] best first"""
+        slot = self.bus.read(code)
+        return (slot.bids, slot.asks) if slot is not None else ([], [])
+
+    def reattach(self) -> bool:
+        """Attach to a restarted feed's segment, False if it is not up (yet)"""
+        try:
+            bus = MarketDataBus(self.name)
+        except (FileNotFoundError, ValueError):
+            return False
+        if bus.closed:
+            bus.close()
+            return False
+        missing = set(self.codes) - set(bus.codes)
+        if missing:
+            _logger.warning(f"Market data bus {self.name} no longer publishes {sorted(missing)}")
+            self.codes = [c for c in self.codes if c not in missing]
+        self.bus.close()
+        self.bus = bus
+        self._last_seq = dict.fromkeys(self.codes, 0)
+        _logger.info(f"Reattached to market data bus {self.name}")
+        return True
+
+    def start(self):
+        """Start polling on the md-bus thread, if not running already"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="md-bus", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Poll until stop(), reattaching when the feed restarts"""
+        while not self._stop.is_set():
+            if self.bus.closed:
+                if not self.reattach():
+                    self._stop.wait(1)
+                    continue
+            try:
+                self.poll()
+            except Exception as e:
+                _logger.error(f"Market data bus poll failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.bus.close()
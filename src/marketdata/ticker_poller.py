@@ -0,0 +1,84 @@
+"""
+Concurrent ticker polling
+
+The trade clients' get_ticker() calls blocking REST clients, so awaiting
+them one code at a time stalls the loop for the sum of their latencies.
+TickerPoller runs the blocking fetch_ticker() of every code in a thread pool
+instead, with at most `concurrency[exchange]` requests in flight per
+exchange, so a poll takes about the slowest request. Each TickEvent is put
+on the market engine by fetch_ticker() as its response lands.
+
+A request still running when poll() times out keeps going in the background
+and its code is skipped by later polls until it returns, so a slow exchange
+never piles up requests.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_logger = logging.getLogger("trading_system")
+
+# requests in flight per exchange, keep within the exchanges' rate limits
+DEFAULT_CONCURRENCY = {"luno": 8, "kraken": 2}
+
+
+class TickerPoller:
+    def __init__(self, clients: dict, concurrency: dict = None, default_concurrency: int = 4):
+        """
+        Args:
+            clients (dict): exchange -> TradeClient with fetch_ticker(pair)
+            concurrency (dict, optional): exchange -> max requests in flight,
+                over DEFAULT_CONCURRENCY
+            default_concurrency (int, optional): for other exchanges. Defaults to 4.
+        """
+        self.clients = dict(clients)
+        self.concurrency = dict(DEFAULT_CONCURRENCY)
+        self.concurrency.update(concurrency or {})
+        self.default_concurrency = default_concurrency
+        limits = [self.concurrency.get(e, default_concurrency) for e in self.clients]
+        self._pool = ThreadPoolExecutor(max_workers=max(sum(limits), 1), thread_name_prefix="ticker-poll")
+        self._limits = {}  # exchange -> asyncio.Semaphore, made on the polling loop
+        self._in_flight = set()  # codes
+
+    def _limit(self, exchange: str) -> asyncio.Semaphore:
+        limit = self._limits.get(exchange)
+        if limit is None:
+            limit = self._limits[exchange] = asyncio.Semaphore(
+                self.concurrency.get(exchange, self.default_concurrency)
+            )
+        return limit
+
+    async def _fetch(self, code: str):
+        pair, exchange = code.split(".")
+        try:
+            async with self._limit(exchange):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._pool, self.clients[exchange].fetch_ticker, pair)
+        except Exception as e:
+            _logger.error(f"Ticker poll {code} failed: {e}")
+        finally:
+            self._in_flight.discard(code)
+
+    async def poll(self, codes, timeout: float = None) -> int:
+        """Request the ticker of each code not still in flight, wait for up to timeout
+
+        Args:
+            codes (iterable): e.g. ["ETHMYR.luno", "ETHUSD.kraken"], exchanges without a client are skipped
+            timeout (float, optional): seconds to wait for the responses, all of them by default.
+
+        Returns:
+            int: requests that finished (or failed) within timeout
+        """
+        tasks = []
+        for code in codes:
+            if code in self._in_flight or code.split(".")[1] not in self.clients:
+                continue
+            self._in_flight.add(code)
+            tasks.append(asyncio.create_task(self._fetch(code)))
+        if not tasks:
+            return 0
+        done, _ = await asyncio.wait(tasks, timeout=timeout)
+        return len(done)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
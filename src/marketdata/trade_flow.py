@@ -0,0 +1,121 @@
+"""
+Rolling trade-flow statistics
+
+TradeFlow aggregates the trade tape of one symbol into fixed time buckets
+held in a ring buffer, and keeps running totals for each rolling window, so
+adding a trade and reading signed volume / VWAP / counts are O(1) (plus one
+step per bucket that expires).
+"""
+import math
+import time
+
+from src.events import OrderDir, TradeEvent
+
+# per bucket / window totals
+_VOLUME = 0
+_SIGNED = 1  # buy aggressor volume minus sell aggressor volume
+_NOTIONAL = 2  # sum of price * volume
+_COUNT = 3
+_BUY_COUNT = 4
+_FIELDS = 5
+
+
+class TradeFlow:
+    def __init__(self, windows=(10, 60, 300), bucket: float = 1.0):
+        """
+        Args:
+            windows (tuple, optional): rolling windows in seconds. Defaults to (10, 60, 300).
+            bucket (float, optional): bucket length in seconds, windows are rounded up to it.
+        """
+        self.bucket = bucket
+        self.windows = {w: max(1, math.ceil(w / bucket)) for w in windows}  # seconds -> buckets
+        self._size = max(self.windows.values())
+        self._ring = [[0.0] * _FIELDS for _ in range(self._size)]
+        self._totals = {w: [0.0] * _FIELDS for w in self.windows}
+        self._current = None  # index of the newest bucket
+        self.last_price = None
+        self.last_timestamp = None
+
+    def reset(self):
+        for b in self._ring:
+            b[:] = [0.0] * _FIELDS
+        for t in self._totals.values():
+            t[:] = [0.0] * _FIELDS
+        self._current = None
+
+    def _advance(self, idx: int):
+        """Move the newest bucket to idx, expiring buckets that leave each window"""
+        if self._current is None:
+            self._current = idx
+            return
+        if idx <= self._current:
+            return
+        if idx - self._current >= self._size:
+            self.reset()
+            self._current = idx
+            return
+        ring, size = self._ring, self._size
+        for i in range(self._current + 1, idx + 1):
+            for w, n in self.windows.items():
+                leaving = ring[(i - n) % size]
+                total = self._totals[w]
+                for f in range(_FIELDS):
+                    total[f] -= leaving[f]
+                if total[_COUNT] == 0:
+                    total[:] = [0.0] * _FIELDS  # drop float residue
+            ring[i % size][:] = [0.0] * _FIELDS
+        self._current = idx
+
+    def add(self, timestamp: float, price: float, volume: float, is_buy: bool):
+        """Add a trade, timestamp in seconds, is_buy if the aggressor bought"""
+        idx = int(timestamp // self.bucket)
+        self._advance(idx)
+        if idx < self._current - self._size + 1:
+            return  # older than every window
+        signed = volume if is_buy else -volume
+        values = (volume, signed, price * volume, 1, 1 if is_buy else 0)
+        bucket = self._ring[idx % self._size]
+        for f in range(_FIELDS):
+            bucket[f] += values[f]
+        for w, n in self.windows.items():
+            if idx > self._current - n:
+                total = self._totals[w]
+                for f in range(_FIELDS):
+                    total[f] += values[f]
+        self.last_price = price
+        self.last_timestamp = timestamp
+
+    def on_trade(self, event: TradeEvent):
+        """Add a TradeEvent, its timestamp is in ms"""
+        ts = event.timestamp / 1000 if event.timestamp is not None else time.time()
+        self.add(ts, event.price, event.volume, event.side == OrderDir.BID)
+
+    def _window(self, window, now):
+        if window not in self._totals:
+            raise ValueError(f"window {window} not tracked, choose from {list(self.windows)}")
+        if now is not None:
+            self._advance(int(now // self.bucket))
+        return self._totals[window]
+
+    def volume(self, window, now: float = None) -> float:
+        return self._window(window, now)[_VOLUME]
+
+    def signed_volume(self, window, now: float = None) -> float:
+        """Buy minus sell aggressor volume"""
+        return self._window(window, now)[_SIGNED]
+
+    def count(self, window, now: float = None) -> int:
+        return int(self._window(window, now)[_COUNT])
+
+    def buy_count(self, window, now: float = None) -> int:
+        return int(self._window(window, now)[_BUY_COUNT])
+
+    def vwap(self, window, now: float = None):
+        """Volume weighted average price, None without trades in the window"""
+        total = self._window(window, now)
+        return total[_NOTIONAL] / total[_VOLUME] if total[_VOLUME] > 0 else None
+
+    def imbalance(self, window, now: float = None) -> float:
+        """Signed volume over volume, in [-1, 1], 0 without trades"""
+        total = self._window(window, now)
+        return total[_SIGNED] / total[_VOLUME] if total[_VOLUME] > 0 else 0.0
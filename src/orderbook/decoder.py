@@ -0,0 +1,177 @@
+"""
+Decoders for Luno stream frames
+
+Every update frame is decoded into a StreamUpdate message struct:
+
+    StreamUpdate(sequence, timestamp, create_update, delete_update, trade_updates)
+
+With msgspec installed the frame is decoded straight into msgspec Structs.
+Otherwise it is parsed with orjson (or the stdlib json module) and wrapped
+in equivalent __slots__ classes, so handlers always use attribute access.
+
+Snapshots (first message of a session) are plain dicts, see Decoder.loads.
+"""
+import json
+from typing import Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if msgspec is not None:
+
+    class CreateUpdate(msgspec.Struct):
+        order_id: str
+        type: str
+        price: str
+        volume: str
+
+    class DeleteUpdate(msgspec.Struct):
+        order_id: str
+
+    class TradeUpdate(msgspec.Struct):
+        base: str
+        counter: str
+        maker_order_id: str
+        taker_order_id: Optional[str] = None
+
+    class StreamUpdate(msgspec.Struct):
+        sequence: str
+        timestamp: Optional[int] = None
+        create_update: Optional[CreateUpdate] = None
+        delete_update: Optional[DeleteUpdate] = None
+        trade_updates: Optional[list[TradeUpdate]] = None
+
+else:
+
+    class CreateUpdate:
+        __slots__ = ("order_id", "type", "price", "volume")
+
+        def __init__(self, order_id, type, price, volume):
+            self.order_id = order_id
+            self.type = type
+            self.price = price
+            self.volume = volume
+
+    class DeleteUpdate:
+        __slots__ = ("order_id",)
+
+        def __init__(self, order_id):
+            self.order_id = order_id
+
+    class TradeUpdate:
+        __slots__ = ("base", "counter", "maker_order_id", "taker_order_id")
+
+        def __init__(self, base, counter, maker_order_id, taker_order_id=None):
+            self.base = base
+            self.counter = counter
+            self.maker_order_id = maker_order_id
+            self.taker_order_id = taker_order_id
+
+    class StreamUpdate:
+        __slots__ = ("sequence", "timestamp", "create_update", "delete_update", "trade_updates")
+
+        def __init__(
+            self,
+            sequence,
+            timestamp=None,
+            create_update=None,
+            delete_update=None,
+            trade_updates=None,
+        ):
+            self.sequence = sequence
+            self.timestamp = timestamp
+            self.create_update = create_update
+            self.delete_update = delete_update
+            self.trade_updates = trade_updates
+
+
+def update_from_dict(data: dict) -> StreamUpdate:
+    """Wrap an already parsed update frame into a StreamUpdate"""
+    create = data.get("create_update")
+    delete = data.get("delete_update")
+    trades = data.get("trade_updates")
+    return StreamUpdate(
+        sequence=data["sequence"],
+        timestamp=data.get("timestamp"),
+        create_update=CreateUpdate(
+            order_id=create["order_id"],
+            type=create["type"],
+            price=create["price"],
+            volume=create["volume"],
+        )
+        if create
+        else None,
+        delete_update=DeleteUpdate(order_id=delete["order_id"]) if delete else None,
+        trade_updates=[
+            TradeUpdate(
+                base=t["base"],
+                counter=t["counter"],
+                maker_order_id=t["maker_order_id"],
+                taker_order_id=t.get("taker_order_id"),
+            )
+            for t in trades
+        ]
+        if trades
+        else None,
+    )
+
+
+class Decoder:
+    """stdlib json decoder"""
+
+    name = "json"
+
+    def loads(self, raw) -> dict:
+        return json.loads(raw)
+
+    def decode_update(self, raw) -> StreamUpdate:
+        return update_from_dict(json.loads(raw))
+
+
+class OrjsonDecoder(Decoder):
+    name = "orjson"
+
+    def loads(self, raw) -> dict:
+        return orjson.loads(raw)
+
+    def decode_update(self, raw) -> StreamUpdate:
+        return update_from_dict(orjson.loads(raw))
+
+
+class MsgspecDecoder(Decoder):
+    name = "msgspec"
+
+    def __init__(self):
+        self._update_decoder = msgspec.json.Decoder(StreamUpdate)
+
+    def loads(self, raw) -> dict:
+        return msgspec.json.decode(raw)
+
+    def decode_update(self, raw) -> StreamUpdate:
+        return self._update_decoder.decode(raw)
+
+
+DECODERS = {"json": Decoder}
+if orjson is not None:
+    DECODERS["orjson"] = OrjsonDecoder
+if msgspec is not None:
+    DECODERS["msgspec"] = MsgspecDecoder
+
+
+def get_decoder(name: str = None) -> Decoder:
+    """Fastest available decoder, or a specific one by name ("msgspec", "orjson", "json")"""
+    if name is None:
+        for name in ("msgspec", "orjson", "json"):
+            if name in DECODERS:
+                break
+    if name not in DECODERS:
+        raise ValueError(f"Decoder {name} not available, choose from {list(DECODERS)}")
+    return DECODERS[name]()
@@ -0,0 +1,111 @@
+"""
+Order book features maintained incrementally from price level changes.
+
+For every configured depth N, BookFeatures keeps the running top-N sums
+sum(p*q) and sum(q) for each side. A level change only adjusts those sums
+when it lands inside the top N, plus at most one level crossing the N-th
+boundary, so VAMP / imbalance never need a pass over the book.
+
+All values are in book units (Decimal or scaled int, see orderBook).
+"""
+from src.orderbook.price_levels import PriceLevels, LEVEL_NEW, LEVEL_REMOVED
+
+
+class BookFeatures:
+    def __init__(self, bid_levels: PriceLevels, ask_levels: PriceLevels, depths=(1, 5, 10)):
+        self.bid_levels = bid_levels
+        self.ask_levels = ask_levels
+        self.depths = sorted(set(depths))
+        self.max_depth = self.depths[-1]
+        self._depth_index = {d: i for i, d in enumerate(self.depths)}
+        # [sum(p*q), sum(q)] per depth, per side
+        self._bid_sums = [[0, 0] for _ in self.depths]
+        self._ask_sums = [[0, 0] for _ in self.depths]
+        self.reset()
+
+    def reset(self):
+        """Full recompute, e.g. after loading a snapshot"""
+        for levels, sums in ((self.bid_levels, self._bid_sums), (self.ask_levels, self._ask_sums)):
+            for i, depth in enumerate(self.depths):
+                sums[i] = self._sum_levels(levels, depth)
+
+    @staticmethod
+    def _sum_levels(levels: PriceLevels, depth: int):
+        pq, q = 0, 0
+        for price, volume in levels.top(depth):
+            pq += price * volume
+            q += volume
+        return [pq, q]
+
+    def on_level_change(self, levels: PriceLevels, rank: int, kind: int, price, delta) -> bool:
+        """Update running sums after PriceLevels.apply.
+
+        Returns:
+            bool: True if the change touched the top max_depth levels.
+        """
+        if rank >= self.max_depth:
+            return False
+        sums = self._bid_sums if levels.is_bid else self._ask_sums
+        for i, depth in enumerate(self.depths):
+            if rank >= depth:
+                continue
+            s = sums[i]
+            s[0] += price * delta
+            s[1] += delta
+            if kind == LEVEL_NEW:
+                # previous N-th level got pushed out of the window
+                pushed = levels.level(depth)
+                if pushed is not None:
+                    s[0] -= pushed[0] * pushed[1]
+                    s[1] -= pushed[1]
+            elif kind == LEVEL_REMOVED:
+                # next level moved up into the window
+                pulled = levels.level(depth - 1)
+                if pulled is not None:
+                    s[0] += pulled[0] * pulled[1]
+                    s[1] += pulled[1]
+        return True
+
+    def _sums(self, levels: PriceLevels, depth: int):
+        idx = self._depth_index.get(depth)
+        if idx is None:
+            # untracked depth, fall back to a pass over the top levels
+            return self._sum_levels(levels, depth)
+        return (self._bid_sums if levels.is_bid else self._ask_sums)[idx]
+
+    def vwap(self, is_bid: bool, depth: int):
+        pq, q = self._sums(self.bid_levels if is_bid else self.ask_levels, depth)
+        if not q:
+            return None
+        return pq / q
+
+    def vamp(self, depth: int = 10):
+        """Volume adjusted mid price: mean of bid and ask VWAP over the top `depth` levels"""
+        vwap_b = self.vwap(True, depth)
+        vwap_a = self.vwap(False, depth)
+        if vwap_b is None or vwap_a is None:
+            return None
+        return (vwap_b + vwap_a) / 2
+
+    def mid_price(self):
+        bid, ask = self.bid_levels.best(), self.ask_levels.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def microprice(self):
+        """L1 size weighted mid price
+        (P_b * Q_a + P_a * Q_b) / (Q_a + Q_b)
+        """
+        bid, ask = self.bid_levels.best(), self.ask_levels.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] * ask[1] + ask[0] * bid[1]) / (bid[1] + ask[1])
+
+    def imbalance(self, depth: int = 10):
+        """Q_b / (Q_a + Q_b) over the top `depth` levels"""
+        q_b = self._sums(self.bid_levels, depth)[1]
+        q_a = self._sums(self.ask_levels, depth)[1]
+        if not (q_a + q_b):
+            return None
+        return q_b / (q_a + q_b)
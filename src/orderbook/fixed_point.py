@@ -0,0 +1,37 @@
+"""
+Scaled-integer (fixed-point) helpers for order book prices and volumes.
+
+Luno quotes every market with a price_scale and volume_scale (number of
+decimal places). Inside the book prices and volumes are held as plain ints
+in those units and only converted back at the edges.
+"""
+from decimal import Decimal
+
+
+def to_scaled_int(value: str, scale: int) -> int:
+    """Parse a decimal string into an int in units of 10**-scale.
+    e.g. to_scaled_int("1234.5", 2) -> 123450. Digits beyond the scale are truncated.
+    """
+    whole, _, frac = value.partition(".")
+    if len(frac) < scale:
+        frac += "0" * (scale - len(frac))
+    return int(whole + frac[:scale])
+
+
+def scaled_parser(scale: int):
+    """Return a str -> int parser for a fixed scale"""
+    padding = "0" * scale
+
+    def parse(value: str) -> int:
+        whole, _, frac = value.partition(".")
+        return int(whole + (frac + padding)[:scale])
+
+    return parse
+
+
+def from_scaled_int(value: int, scale: int) -> float:
+    return value / 10**scale
+
+
+def from_scaled_int_decimal(value: int, scale: int) -> Decimal:
+    return Decimal(value).scaleb(-scale)
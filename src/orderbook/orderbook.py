@@ -12,213 +12,617 @@ import websockets
 import asyncio
 import json
 import time
+import logging
+import os
+import pathlib
 from decimal import Decimal
-from collections import defaultdict
 import pandas as pd
+from src.orderbook.price_levels import PriceLevels
+from src.orderbook.features import BookFeatures
+from src.orderbook.fixed_point import scaled_parser, from_scaled_int_decimal
+from src.orderbook.snapshot import save_snapshot, load_snapshot
+from src.orderbook.decoder import get_decoder
+
+_logger = logging.getLogger("trading_system")
 
 
 class BackOffException(Exception):
     ...
 
 
+class ConnectionThrottle:
+    """Connection limits shared by every stream on the same API key.
+
+    Luno allows 50 stream sessions at one time. Each stream waits `backoff`
+    seconds between its own connection attempts, and a failed attempt on any
+    stream pauses new attempts on all of them for `backoff` seconds.
+    """
+
+    def __init__(self, max_sessions: int = 50, backoff: float = 10):
+        self.max_sessions = max_sessions
+        self.backoff = backoff
+        self.blocked_until = 0
+        self._sessions = asyncio.Semaphore(max_sessions)
+
+    def penalise(self):
+        self.blocked_until = time.time() + self.backoff
+
+    async def acquire(self):
+        await self._sessions.acquire()
+
+    def release(self):
+        self._sessions.release()
+
+
 class orderBook:
-    def __init__(self, auth: dict, pair: str):
+    """Luno L3 order book built from the streaming API.
+
+    By default prices and volumes are held as Decimal. When price_scale and
+    volume_scale are given (see TradeClient.get_markets_info), the book runs in
+    fixed-point mode: every price/volume is parsed straight into an int in units
+    of 10**-scale, and only converted back in to_price/to_volume.
+
+    Book features (VAMP, mid, microprice, imbalance) are maintained by
+    BookFeatures at `feature_depths` and refreshed only when an update touches
+    the top of the book.
+
+    Sequence gaps: updates that arrive ahead of sequence are held in a reorder
+    window of `reorder_window` messages. If the gap does not fill within the
+    window (or `gap_timeout` seconds) the book resyncs in the background from a
+    fresh snapshot while live updates keep being buffered, then replays the
+    buffered updates on top of it. If that fails run() reconnects the socket.
+
+    Warm restart: save_states/load_states write and read a binary snapshot of
+    the book. After load_states the book is usable straight away (flagged as
+    not synced); on connect it catches up from the stream if the sequence
+    still connects, and falls back to the stream's full snapshot otherwise.
+
+    Frames are decoded by `decoder` (see src/orderbook/decoder.py), by default
+    the fastest one installed. Per-update logging only happens at DEBUG level.
+    """
+
+    def __init__(
+        self,
+        auth: dict,
+        pair: str,
+        price_scale: int = None,
+        volume_scale: int = None,
+        feature_depths=(1, 5, 10),
+        throttle: ConnectionThrottle = None,
+        reorder_window: int = 32,
+        gap_timeout: float = 2,
+        decoder: str = None,
+        url: str = None,
+    ):
 
         self.pair = pair.upper()
         self.auth = {
-            "api_key_id": auth_config["luno_key_id"],
-            "api_key_secret": auth_config["luno_key_secret"],
+            "api_key_id": auth["luno_key_id"],
+            "api_key_secret": auth["luno_key_secret"],
         }
         self.ws = None
+        self.decoder = get_decoder(decoder)
+        self._debug = _logger.isEnabledFor(logging.DEBUG)
+        self.throttle = throttle if throttle is not None else ConnectionThrottle()
+        self._holds_session = False
+        self.timestamp = None  # exchange timestamp (ms) of the last message
+        self.on_top_of_book = None  # callback(book) when best bid/ask price or volume changes
+        self.on_trades = None  # callback(book, trades) with the trades of each update, see handle_trade
+        self.on_depth = None  # callback(book) when the top max(feature_depths) levels may have changed
+        self._l1 = None
         self.sequence = None
-        self.bids = {}
+        self.bids = {}  # order_id -> [price, volume]
         self.asks = {}
-        self.url = f"wss://ws.luno.com/api/1/stream/{self.pair}"
+        self._order_index = {}  # order_id -> (side, price)
+        self.bid_levels = PriceLevels(is_bid=True)
+        self.ask_levels = PriceLevels(is_bid=False)
+        # url can point at a local stand-in, see src/marketdata/replay_server.py
+        self.url = url or f"wss://ws.luno.com/api/1/stream/{self.pair}"
         self.time_last_connection_attempt = None
-        self.bid_sorted = None
-        self.ask_sorted = None
+        self.features = BookFeatures(self.bid_levels, self.ask_levels, depths=feature_depths)
+        self.top_changed = False  # set when an update touches the top max(feature_depths) levels
         self.vamp = None
         self.mid_price = None
+        self.microprice = None
         self.order_imbalance = None
 
+        # sequence gap recovery
+        self.reorder_window = reorder_window
+        self.gap_timeout = gap_timeout
+        self._pending = {}  # sequence -> update received ahead of sequence
+        self._resync_task = None
+        self._needs_reconnect = False  # set by a failed resync, run() reconnects
+        self._unsynced_since = None
+        self._gap_since = None
+        self.stats = {
+            "gaps": 0,
+            "resyncs": 0,
+            "reconnects": 0,
+            "unsynced_seconds": 0.0,
+            "warm_catchups": 0,
+        }
+
+        self.price_scale = price_scale
+        self.volume_scale = volume_scale
+        self.fixed_point = price_scale is not None and volume_scale is not None
+        if self.fixed_point:
+            self._parse_price = scaled_parser(price_scale)
+            self._parse_volume = scaled_parser(volume_scale)
+            self._price_factor = 10**price_scale
+            self._volume_factor = 10**volume_scale
+        else:
+            self._parse_price = Decimal
+            self._parse_volume = Decimal
+
+    @classmethod
+    def from_markets_info(cls, auth: dict, pair: str, markets_info: dict, **kwargs):
+        """Build a fixed-point book using the scales from TradeClient.get_markets_info()"""
+        info = markets_info[pair.upper()]
+        return cls(
+            auth,
+            pair,
+            price_scale=int(info["price_scale"]),
+            volume_scale=int(info["volume_scale"]),
+            **kwargs,
+        )
+
+    def to_price(self, price, as_decimal=False):
+        """Convert a price in book units back to float (or Decimal)"""
+        if not self.fixed_point:
+            return price if as_decimal else float(price)
+        if as_decimal:
+            return from_scaled_int_decimal(price, self.price_scale)
+        return price / self._price_factor
+
+    def to_volume(self, volume, as_decimal=False):
+        """Convert a volume in book units back to float (or Decimal)"""
+        if not self.fixed_point:
+            return volume if as_decimal else float(volume)
+        if as_decimal:
+            return from_scaled_int_decimal(volume, self.volume_scale)
+        return volume / self._volume_factor
+
     def check_backoff(self):
-        """avoid rate limiting"""
+        """avoid rate limiting, raises BackOffException(seconds to wait)"""
+        now = time.time()
+        if self.throttle.blocked_until > now:
+            raise BackOffException(self.throttle.blocked_until - now)
         if self.time_last_connection_attempt is not None:
-            delta = time.time() - self.time_last_connection_attempt
-            if delta < 10:
-                raise BackOffException()
+            delta = now - self.time_last_connection_attempt
+            if delta < self.throttle.backoff:
+                raise BackOffException(self.throttle.backoff - delta)
+
+    @property
+    def synced(self):
+        return self._unsynced_since is None
 
     async def connect(self):
-        if self.ws is not None:
-            await self.ws.close()
+        await self.close()
+        self._cancel_resync()
+        self._pending = {}
+        self._needs_reconnect = False
+        if self.time_last_connection_attempt is not None:
+            self.stats["reconnects"] += 1
         try:
             self.check_backoff()
-        except BackOffException:
-            await asyncio.sleep(10)
+        except BackOffException as e:
+            await asyncio.sleep(e.args[0])
         self.time_last_connection_attempt = time.time()
+        self._debug = _logger.isEnabledFor(logging.DEBUG)
 
-        self.ws = await websockets.connect(self.url)
-        await self.ws.send(json.dumps(self.auth))
+        await self.throttle.acquire()
+        self._holds_session = True
+        try:
+            self.ws = await websockets.connect(self.url)
+            await self.ws.send(json.dumps(self.auth))
+            msg = await self.ws.recv()
+        except Exception:
+            self.throttle.penalise()
+            await self.close()
+            raise
+
+        data = self.decoder.loads(msg)
+        sequence = int(data["sequence"])
+        if self.sequence is not None and "asks" not in data and sequence == self.sequence + 1:
+            # stream resumed right after the sequence we hold, catch up from the deltas
+            self.apply_update(sequence, self.decoder.decode_update(msg))
+            self.stats["warm_catchups"] += 1
+        elif self.sequence is not None and "asks" in data and sequence == self.sequence:
+            # book we hold (e.g. loaded by load_states) is already at this sequence
+            self.stats["warm_catchups"] += 1
+        else:
+            self.load_snapshot(data)
+        self._mark_synced()
+        self.update_features()
+        self.check_top_of_book()
 
-        msg = await self.ws.recv()
-        initial_msg_data = json.loads(msg)
+        _logger.info(f"{self.pair} order book received at sequence {self.sequence}")
+
+    def load_snapshot(self, initial_msg_data: dict):
+        """Replace the whole book with a stream snapshot (first message of a session)"""
         self.sequence = int(initial_msg_data["sequence"])
+        self.timestamp = initial_msg_data.get("timestamp")
 
         ## CREATE BID ASK TREES HERE
+        parse_price, parse_volume = self._parse_price, self._parse_volume
         self.asks = {
-            x["id"]: [Decimal(x["price"]), Decimal(x["volume"])]
+            x["id"]: [parse_price(x["price"]), parse_volume(x["volume"])]
             for x in initial_msg_data["asks"]
         }
         self.bids = {
-            x["id"]: [Decimal(x["price"]), Decimal(x["volume"])]
+            x["id"]: [parse_price(x["price"]), parse_volume(x["volume"])]
             for x in initial_msg_data["bids"]
         }
+        self.rebuild_levels()
 
-        print("Orderbook received")
+    async def fetch_snapshot(self) -> dict:
+        """Fetch a full snapshot on a short-lived second session.
+
+        Luno's REST order book (get_full_L2) is aggregated by price and carries
+        no order ids or sequence, so stream deltas cannot be replayed on top of
+        it. A new stream session starts with a sequenced per-order snapshot.
+        """
+        await self.throttle.acquire()
+        ws = None
+        try:
+            ws = await websockets.connect(self.url)
+            await ws.send(json.dumps(self.auth))
+            return self.decoder.loads(await ws.recv())
+        finally:
+            if ws is not None:
+                await ws.close()
+            self.throttle.release()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+        if self._holds_session:
+            self.throttle.release()
+            self._holds_session = False
 
     async def run(self):
         """first msg is always a full order book"""
         await self.connect()
-        async for msg in self.ws:
-            if msg == '""':
-                continue
-            await self.handle_message(msg)
-            #print(self.print_aggregated_lob())
-            self.bid_sorted = self.consolidate(self.bids.values(), reverse=True)
-            self.ask_sorted = self.consolidate(self.asks.values())
-            
-            # calculate prices
-            self.calc_vamp(level = 10)
-            self.calc_midprice()
-            self.calc_order_imbalance(level = 10)
+        while True:
+            async for msg in self.ws:
+                await self.process_frame(msg)
+                if self._needs_reconnect:
+                    break
+            # stream closed by the server, or a failed resync asked for a new session
+            await self.connect()
+
+    async def process_frame(self, msg):
+        """Handle one raw stream frame"""
+        if msg == '""':
+            return  # keep alive
+        await self.handle_message(msg)
+        #print(self.print_aggregated_lob())
+
+        # calculate prices, only if the top of the book moved
+        if self.top_changed:
+            self.update_features()
+            self.check_top_of_book()
+
+    def check_top_of_book(self):
+        """Fire on_depth, and on_top_of_book if best bid/ask price or volume changed"""
+        if self.on_depth is not None:
+            self.on_depth(self)
+        bid, ask = self.bid_levels.best(), self.ask_levels.best()
+        l1 = (bid and tuple(bid), ask and tuple(ask))
+        if l1 != self._l1:
+            self._l1 = l1
+            if self.on_top_of_book is not None:
+                self.on_top_of_book(self)
+
+    def update_features(self, levels=10):
+        self.calc_vamp(levels=levels)
+        self.calc_midprice()
+        self.calc_microprice()
+        self.calc_order_imbalance(levels=levels)
+        self.top_changed = False
 
     async def handle_message(self, msg):
         """Call individual handlers depending on order type"""
-        data = json.loads(msg)
-        new_sequence = int(data["sequence"])
-        if new_sequence != self.sequence + 1:
-            return await self.connect()
+        data = self.decoder.decode_update(msg)
+        new_sequence = int(data.sequence)
+        if new_sequence <= self.sequence and self._resync_task is None:
+            return  # already applied
+        if self._resync_task is not None or new_sequence != self.sequence + 1:
+            return self.handle_gap(new_sequence, data)
 
-        self.sequence = new_sequence
+        self.apply_update(new_sequence, data)
+        if self._pending:
+            self.drain_pending()
+
+    def apply_update(self, sequence, data):
+        self.sequence = sequence
+        if data.timestamp is not None:
+            self.timestamp = data.timestamp
         self.process_message(data)
 
+    def handle_gap(self, sequence, data):
+        """Buffer an update that arrived ahead of sequence (or during a resync)"""
+        self._pending[sequence] = data
+        if self._resync_task is not None or self._needs_reconnect:
+            return
+        if self._unsynced_since is None:
+            self._unsynced_since = self._gap_since = time.monotonic()
+            self.stats["gaps"] += 1
+            _logger.warning(f"{self.pair} sequence gap: expected {self.sequence + 1}, got {sequence}")
+        if (
+            len(self._pending) > self.reorder_window
+            or time.monotonic() - self._gap_since > self.gap_timeout
+        ):
+            self.start_resync()
+
+    def drain_pending(self):
+        """Apply buffered updates that are now in sequence"""
+        pending = self._pending
+        for seq in [s for s in pending if s <= self.sequence]:
+            del pending[seq]
+        while self.sequence + 1 in pending:
+            seq = self.sequence + 1
+            self.apply_update(seq, pending.pop(seq))
+        if not pending and self._resync_task is None:
+            self._mark_synced()
+
+    def _mark_synced(self):
+        if self._unsynced_since is not None:
+            self.stats["unsynced_seconds"] += time.monotonic() - self._unsynced_since
+            self._unsynced_since = None
+
+    def start_resync(self):
+        self.stats["resyncs"] += 1
+        _logger.warning(f"{self.pair} resyncing from snapshot at sequence {self.sequence}")
+        self._resync_task = asyncio.create_task(self._resync())
+
+    def _cancel_resync(self):
+        if self._resync_task is not None and self._resync_task is not asyncio.current_task():
+            self._resync_task.cancel()
+        self._resync_task = None
+
+    async def _resync(self):
+        """Load a fresh snapshot, then replay the updates buffered meanwhile"""
+        try:
+            snapshot = await self.fetch_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # only run() reconnects, closing the socket ends its current session
+            _logger.error(f"{self.pair} resync failed ({e}), reconnecting")
+            self._resync_task = None
+            self._needs_reconnect = True
+            if self.ws is not None:
+                await self.ws.close()
+            return
+        self._resync_task = None
+        self.load_snapshot(snapshot)
+        self.drain_pending()
+        if self._pending:
+            # still not contiguous after the snapshot, give the reorder window another go
+            self._gap_since = time.monotonic()
+        self.update_features()
+        self.check_top_of_book()
+
     def process_message(self, data):
-        if data["delete_update"]:
+        if data.delete_update:
             self.handle_delete(data)
-        if data["create_update"]:
+        if data.create_update:
             self.handle_create(data)
-        if data["trade_updates"]:
-            self.handle_trade(data)
+        if data.trade_updates:
+            trades = self.handle_trade(data)
+            if trades and self.on_trades is not None:
+                self.on_trades(self, trades)
 
     def handle_create(self, data):
-        print(f"CREATE {data['create_update']}")
-        order = data["create_update"]
-        price = Decimal(order["price"])
-        volume = Decimal(order["volume"])
-        key = order["order_id"]
-        book = self.bids if order["type"] == "BID" else self.asks
+        order = data.create_update
+        if self._debug:
+            _logger.debug(f"CREATE {order}")
+        price = self._parse_price(order.price)
+        volume = self._parse_volume(order.volume)
+        key = order.order_id
+        side = order.type
+        book, levels = self._side(side)
         book[key] = [price, volume]
+        self._order_index[key] = (side, price)
+        self._apply_level(levels, price, volume)
 
     def handle_delete(self, data):
-        """delete_update only has an order id key, so still have to traverse entire dict on both side to find"""
-        print(f"DELETE {data['delete_update']}")
-        order_id = data["delete_update"]["order_id"]
-        try:
-            del self.bids[order_id]
-        except KeyError:
-            pass
-        try:
-            del self.asks[order_id]
-        except KeyError:
-            pass
-        return
+        """delete_update only has an order id key, the order index tells us which side and level it sits on"""
+        if self._debug:
+            _logger.debug(f"DELETE {data.delete_update}")
+        order_id = data.delete_update.order_id
+        entry = self._order_index.pop(order_id, None)
+        if entry is None:
+            return
+        book, levels = self._side(entry[0])
+        price, volume = book.pop(order_id)
+        self._apply_level(levels, price, -volume)
 
     def handle_trade(self, data):
         """
-        list[dict]
-        keys: ["base", "counter"," maker_order_id","taker_order_id","order_id"]
+        list[TradeUpdate]
+        fields: base, counter, maker_order_id, taker_order_id
+
+        Returns a list of dict with the update fields plus "price" (float, in
+        either mode, None if the maker order is unknown) and the aggressor
+        "type" (buy/sell). In fixed-point mode the trade price is the maker
+        order's price, which avoids a Decimal division per trade.
         """
         trades = []
-        print(f"TRADES {data['trade_updates']}")
-        for update in data["trade_updates"]:
-            update["price"] = Decimal(update["counter"]) / Decimal(update["base"])
-            maker_order_id = update["maker_order_id"]
+        if self._debug:
+            _logger.debug(f"TRADES {data.trade_updates}")
+        for update in data.trade_updates:
+            maker_order_id = update.maker_order_id
+            if self.fixed_point:
+                entry = self._order_index.get(maker_order_id)
+                price = entry[1] / self._price_factor if entry is not None else None
+            else:
+                price = float(Decimal(update.counter) / Decimal(update.base))
             if maker_order_id in self.bids:
                 self.update_existing_order(key="bids", update=update)
-                trades.append({**update, "type": "sell"})
+                aggressor = "sell"
             elif maker_order_id in self.asks:
                 self.update_existing_order(key="asks", update=update)
-                trades.append({**update, "type": "buy"})
+                aggressor = "buy"
+            else:
+                continue
+            trades.append(
+                {
+                    "base": update.base,
+                    "counter": update.counter,
+                    "maker_order_id": maker_order_id,
+                    "taker_order_id": update.taker_order_id,
+                    "price": price,
+                    "type": aggressor,
+                }
+            )
         return trades
 
     def update_existing_order(self, key, update):
         book = getattr(self, key)
-        order_id = update["maker_order_id"]
+        levels = self.bid_levels if key == "bids" else self.ask_levels
+        order_id = update.maker_order_id
         existing_order = book[order_id]
-        existing_volume = existing_order[1]
-        new_volume = existing_volume - Decimal(update["base"])
-        if new_volume == Decimal("0"):
+        traded = self._parse_volume(update.base)
+        new_volume = existing_order[1] - traded
+        if new_volume <= 0:
             del book[order_id]
+            del self._order_index[order_id]
+            self._apply_level(levels, existing_order[0], -existing_order[1])
         else:
-            existing_order[1] -= Decimal(update["base"])
+            existing_order[1] = new_volume
+            self._apply_level(levels, existing_order[0], -traded)
 
-    def save_states(self):
-        """save current orderbook"""
-        ...
-        
-    @staticmethod
-    def consolidate(orders, reverse=False):
-            price_map = defaultdict(Decimal)
-            for order in orders:
-                price_map[order[0]] += order[1]
-            rounded_list = map(
-                lambda x: [round(x[0], ndigits=4), round(x[1], ndigits=4)],
-                price_map.items(),
-            )
+    def _apply_level(self, levels, price, delta):
+        rank, kind, applied = levels.apply(price, delta)
+        if kind is not None and self.features.on_level_change(levels, rank, kind, price, applied):
+            self.top_changed = True
+
+    def _side(self, side):
+        """(orders, levels) for the BID or ASK side"""
+        if side == "BID":
+            return self.bids, self.bid_levels
+        return self.asks, self.ask_levels
+
+    def rebuild_levels(self):
+        """Rebuild order index and price levels from the per-order books (after a snapshot)"""
+        self._rebuild_index()
+        self.bid_levels.load(self.bids.values())
+        self.ask_levels.load(self.asks.values())
+        self.features.reset()
+        self.top_changed = True
+
+    def _rebuild_index(self):
+        self._order_index = {k: ("BID", v[0]) for k, v in self.bids.items()}
+        self._order_index.update({k: ("ASK", v[0]) for k, v in self.asks.items()})
+
+    @property
+    def bid_sorted(self):
+        """all bid levels [price, volume], best first"""
+        return self.bid_levels.top()
+
+    @property
+    def ask_sorted(self):
+        """all ask levels [price, volume], best first"""
+        return self.ask_levels.top()
+
+    def top_bids(self, levels=10):
+        return self.bid_levels.top(levels)
+
+    def top_asks(self, levels=10):
+        return self.ask_levels.top(levels)
+
+    def default_state_path(self):
+        return pathlib.Path("./src/orderbook/snapshots/") / f"{self.pair}.bin"
+
+    def save_states(self, path=None):
+        """save current orderbook (levels and orders) to a binary snapshot"""
+        path = pathlib.Path(path or self.default_state_path())
+        if not os.path.exists(path.parent):
+            os.makedirs(path.parent)
+        save_snapshot(
+            path,
+            pair=self.pair,
+            sequence=self.sequence,
+            timestamp=self.timestamp,
+            bid_levels=self.bid_levels.top(),
+            ask_levels=self.ask_levels.top(),
+            bids=self.bids,
+            asks=self.asks,
+            price_scale=self.price_scale if self.fixed_point else None,
+            volume_scale=self.volume_scale if self.fixed_point else None,
+        )
+
+    def load_states(self, path=None, max_age: float = None) -> bool:
+        """Warm start from a snapshot written by save_states.
+        Returns False (and leaves the book untouched) if there is no usable snapshot.
+        """
+        path = pathlib.Path(path or self.default_state_path())
+        if not os.path.exists(path):
+            return False
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            return False
+        try:
+            data = load_snapshot(path)
+        except (ValueError, OSError) as e:
+            _logger.warning(f"Unable to load order book snapshot {path}: {e}")
+            return False
+        if data["pair"] != self.pair or data["price_scale"] != (self.price_scale if self.fixed_point else None):
+            return False
+        if data["volume_scale"] != (self.volume_scale if self.fixed_point else None):
+            return False
+
+        self.sequence = data["sequence"]
+        self.timestamp = data["timestamp"]
+        self.bids = data["bids"]
+        self.asks = data["asks"]
+        self._rebuild_index()
+        self.bid_levels.load_levels(data["bid_levels"])
+        self.ask_levels.load_levels(data["ask_levels"])
+        self.features.reset()
+        self.update_features()
+        # usable, but not confirmed by the stream yet
+        self._unsynced_since = time.monotonic()
+        return True
 
-            return sorted(rounded_list, key=lambda a: a[0], reverse=reverse)
 
     def print_aggregated_lob(self,levels = 10):
         
         return pd.DataFrame(
             {
-                "bids": self.bid_sorted[:levels],
-                "asks": self.ask_sorted[:levels],
+                "bids": [[self.to_price(p), self.to_volume(v)] for p, v in self.top_bids(levels)],
+                "asks": [[self.to_price(p), self.to_volume(v)] for p, v in self.top_asks(levels)],
             }
         )
     
-    def calc_vamp(self, levels= 10):
-        # BIDS
-        bid_orders = self.bid_sorted[:levels]
-        vwap_b = sum([order[0] * order[1] for order in bid_orders])/sum([order[1] for order in bid_orders])
-            
-        # ASKS
-        ask_orders = self.ask_sorted[:levels]
-        vwap_a = sum([order[0] * order[1] for order in ask_orders])/sum([order[1] for order in ask_orders])
-           
-        self.vamp = (vwap_b + vwap_a)/2
-    
+    def _edge_price(self, value):
+        if value is None:
+            return None
+        return self.to_price(value, as_decimal=not self.fixed_point)
+
+    def calc_vamp(self, levels=10):
+        """Volume adjusted mid price over the top `levels` levels on each side"""
+        self.vamp = self._edge_price(self.features.vamp(levels))
+
     def calc_midprice(self):
-        self.mid_price = (self.bid_sorted[0][0] + self.ask_sorted[0][0])/2
+        self.mid_price = self._edge_price(self.features.mid_price())
 
-        
     def calc_microprice(self):
-        ...
-    
-    def calc_order_imbalance(self, levels = 10):
+        """L1 size weighted mid price"""
+        self.microprice = self._edge_price(self.features.microprice())
+
+    def calc_order_imbalance(self, levels=10):
         """Order imbalance
         Q_b/ (Q_a + Q_b)
         1 -> more likely to buy
         0 -> more likely to sell
 
         Args:
-            levels (int, optional): _description_. Defaults to 10.
+            levels (int, optional): number of levels on each side. Defaults to 10.
         """
-        bid_orders = self.bid_sorted[:levels]
-        ask_orders = self.ask_sorted[:levels]
-        q_b = sum([order[1] for order in bid_orders])
-        q_a = sum([order[1] for order in ask_orders])
-        self.order_imbalance = q_b/(q_a + q_b)
+        self.order_imbalance = self.features.imbalance(levels)
 
 
 if __name__ == "__main__":
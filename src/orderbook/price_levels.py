@@ -0,0 +1,116 @@
+"""
+Price-level aggregation for one side of an order book.
+
+Levels are kept sorted as they change, so the best N levels can be read
+without re-aggregating every resting order.
+"""
+from bisect import bisect_left
+
+# kinds of level change returned by PriceLevels.apply
+LEVEL_NEW = 0
+LEVEL_UPDATE = 1
+LEVEL_REMOVED = 2
+
+
+class PriceLevels:
+    """Aggregated volume per price for one side of the book.
+
+    Prices are stored as sort keys with the best level at the end of the list
+    (bids keyed by price, asks by -price). Most updates happen near the top of
+    the book, so inserts and deletes only shift a handful of elements.
+
+    Rank 0 is the best level (highest bid / lowest ask).
+    """
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._keys = []  # ascending, best level last
+        self._volumes = {}  # price -> aggregate volume
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, price):
+        return price in self._volumes
+
+    def _key(self, price):
+        return price if self.is_bid else -price
+
+    def _price(self, key):
+        return key if self.is_bid else -key
+
+    def clear(self):
+        self._keys = []
+        self._volumes = {}
+
+    def load(self, orders):
+        """Rebuild all levels from an iterable of [price, volume]"""
+        volumes = {}
+        for price, volume in orders:
+            volumes[price] = volumes.get(price, 0) + volume
+        self._volumes = {p: v for p, v in volumes.items() if v > 0}
+        self._keys = sorted(self._key(p) for p in self._volumes)
+
+    def load_levels(self, levels):
+        """Rebuild from already aggregated [price, volume] levels, best first"""
+        self._volumes = {p: v for p, v in levels}
+        self._keys = [self._key(p) for p, _ in reversed(levels)]
+
+    def rank(self, price) -> int:
+        """Rank of an existing level, 0 being the best price"""
+        idx = bisect_left(self._keys, self._key(price))
+        return len(self._keys) - 1 - idx
+
+    def apply(self, price, delta):
+        """Add (or remove, if negative) volume at a price level.
+
+        Returns:
+            tuple: (rank, kind, delta) where rank is the level's rank before a
+            removal or after an insert/update, kind is one of LEVEL_NEW,
+            LEVEL_UPDATE, LEVEL_REMOVED and delta is the volume change actually
+            applied to the level.
+        """
+        existing = self._volumes.get(price)
+        if existing is None:
+            if delta <= 0:
+                return None, None, 0
+            key = self._key(price)
+            idx = bisect_left(self._keys, key)
+            self._keys.insert(idx, key)
+            self._volumes[price] = delta
+            return len(self._keys) - 1 - idx, LEVEL_NEW, delta
+
+        volume = existing + delta
+        key = self._key(price)
+        idx = bisect_left(self._keys, key)
+        rank = len(self._keys) - 1 - idx
+        if volume <= 0:
+            del self._keys[idx]
+            del self._volumes[price]
+            return rank, LEVEL_REMOVED, -existing
+        self._volumes[price] = volume
+        return rank, LEVEL_UPDATE, delta
+
+    def best(self):
+        """Best [price, volume] or None if side is empty"""
+        if not self._keys:
+            return None
+        price = self._price(self._keys[-1])
+        return [price, self._volumes[price]]
+
+    def level(self, rank: int):
+        """[price, volume] at a given rank, or None if the book is not that deep"""
+        if rank >= len(self._keys):
+            return None
+        price = self._price(self._keys[-1 - rank])
+        return [price, self._volumes[price]]
+
+    def top(self, n: int = None):
+        """Best n levels as a list of [price, volume], best first"""
+        keys = self._keys if n is None else self._keys[-n:] if n > 0 else []
+        volumes = self._volumes
+        levels = []
+        for key in reversed(keys):
+            price = self._price(key)
+            levels.append([price, volumes[price]])
+        return levels
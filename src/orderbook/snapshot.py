@@ -0,0 +1,187 @@
+"""
+Compact binary order book snapshots
+
+Layout (little endian):
+    header   magic(8s) version(H) fixed_point(B) price_scale(b) volume_scale(b)
+             value_width(B) pad(2x) sequence(Q) timestamp(q) n_bid_levels(I) n_ask_levels(I)
+             n_orders(I) pair(16s)
+    levels   bids then asks, best first: price, volume
+    orders   id_len(B) id side(B: 0 bid, 1 ask) price volume
+
+Prices/volumes are int32 (or int64 if any value needs it, see value_width)
+in fixed-point books, and length-prefixed ascii strings (len(B) + bytes) in
+Decimal books.
+
+Files are written through mmap to a temporary file and moved into place, so a
+reader never sees a half written snapshot.
+"""
+import mmap
+import os
+import struct
+from decimal import Decimal
+
+MAGIC = b"CTSOB\x00\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sHBbbB2xQqIII16s")
+FIXED_VALUES = {4: struct.Struct("<ii"), 8: struct.Struct("<qq")}
+INT32_MAX = 2**31 - 1
+U8 = struct.Struct("<B")
+
+
+def _encode_value(value) -> bytes:
+    raw = str(value).encode("ascii")
+    return U8.pack(len(raw)) + raw
+
+
+def save_snapshot(
+    path,
+    pair: str,
+    sequence: int,
+    timestamp: int,
+    bid_levels: list,
+    ask_levels: list,
+    bids: dict,
+    asks: dict,
+    price_scale: int = None,
+    volume_scale: int = None,
+):
+    """Write levels ([price, volume], best first) and orders (id -> [price, volume])"""
+    fixed_point = price_scale is not None and volume_scale is not None
+    orders = [(k.encode("ascii"), 0, v) for k, v in bids.items()]
+    orders += [(k.encode("ascii"), 1, v) for k, v in asks.items()]
+
+    if fixed_point:
+        largest = max((abs(x) for level in bid_levels + ask_levels for x in level), default=0)
+        fixed_value = FIXED_VALUES[4 if largest <= INT32_MAX else 8]
+    else:
+        fixed_value = None
+        bid_levels = [[_encode_value(p), _encode_value(v)] for p, v in bid_levels]
+        ask_levels = [[_encode_value(p), _encode_value(v)] for p, v in ask_levels]
+        orders = [(k, side, [_encode_value(p), _encode_value(v)]) for k, side, (p, v) in orders]
+
+    def value_size(p, v):
+        return fixed_value.size if fixed_point else len(p) + len(v)
+
+    size = HEADER.size
+    size += sum(value_size(p, v) for p, v in bid_levels)
+    size += sum(value_size(p, v) for p, v in ask_levels)
+    size += sum(2 + len(k) + value_size(*pv) for k, _, pv in orders)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb+") as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as buf:
+            HEADER.pack_into(
+                buf,
+                0,
+                MAGIC,
+                VERSION,
+                int(fixed_point),
+                price_scale or 0,
+                volume_scale or 0,
+                fixed_value.size // 2 if fixed_point else 0,
+                sequence,
+                timestamp or 0,
+                len(bid_levels),
+                len(ask_levels),
+                len(orders),
+                pair.encode("ascii"),
+            )
+            offset = HEADER.size
+
+            def write_value(p, v):
+                nonlocal offset
+                if fixed_point:
+                    fixed_value.pack_into(buf, offset, p, v)
+                    offset += fixed_value.size
+                else:
+                    buf[offset : offset + len(p)] = p
+                    offset += len(p)
+                    buf[offset : offset + len(v)] = v
+                    offset += len(v)
+
+            for p, v in bid_levels:
+                write_value(p, v)
+            for p, v in ask_levels:
+                write_value(p, v)
+            for k, side, (p, v) in orders:
+                buf[offset] = len(k)
+                buf[offset + 1 : offset + 1 + len(k)] = k
+                offset += 1 + len(k)
+                buf[offset] = side
+                offset += 1
+                write_value(p, v)
+            buf.flush()
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path) -> dict:
+    """Read a snapshot written by save_snapshot.
+
+    Raises ValueError if the file is not a snapshot or is cut short.
+
+    Returns:
+        dict: pair, sequence, timestamp, price_scale, volume_scale,
+        bid_levels, ask_levels (best first), bids, asks (id -> [price, volume])
+    """
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if len(buf) < HEADER.size:
+                raise ValueError(f"{path} is not a version {VERSION} order book snapshot")
+            (
+                magic,
+                version,
+                fixed_point,
+                price_scale,
+                volume_scale,
+                value_width,
+                sequence,
+                timestamp,
+                n_bid_levels,
+                n_ask_levels,
+                n_orders,
+                pair,
+            ) = HEADER.unpack_from(buf, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} order book snapshot")
+            offset = HEADER.size
+            fixed_value = FIXED_VALUES.get(value_width)
+
+            def read_value():
+                nonlocal offset
+                if fixed_point:
+                    p, v = fixed_value.unpack_from(buf, offset)
+                    offset += fixed_value.size
+                    return [p, v]
+                values = []
+                for _ in range(2):
+                    n = buf[offset]
+                    values.append(Decimal(buf[offset + 1 : offset + 1 + n].decode("ascii")))
+                    offset += 1 + n
+                return values
+
+            try:
+                bid_levels = [read_value() for _ in range(n_bid_levels)]
+                ask_levels = [read_value() for _ in range(n_ask_levels)]
+                bids, asks = {}, {}
+                for _ in range(n_orders):
+                    n = buf[offset]
+                    order_id = buf[offset + 1 : offset + 1 + n].decode("ascii")
+                    offset += 1 + n
+                    side = buf[offset]
+                    offset += 1
+                    (asks if side else bids)[order_id] = read_value()
+            except (struct.error, IndexError, ArithmeticError, UnicodeDecodeError) as e:
+                raise ValueError(f"{path} is cut short or corrupt: {e}")
+
+    return {
+        "pair": pair.rstrip(b"\x00").decode("ascii"),
+        "sequence": sequence,
+        "timestamp": timestamp,
+        "price_scale": price_scale if fixed_point else None,
+        "volume_scale": volume_scale if fixed_point else None,
+        "bid_levels": bid_levels,
+        "ask_levels": ask_levels,
+        "bids": bids,
+        "asks": asks,
+    }
@@ -6,25 +6,36 @@ class OrderManager:
         self.name = name
         self.standing_order_set = set()
         self.canceled_order_set = set()
+        self.standing_orders = {}  # oid -> standing order, in placement order
 
     def on_new_order(self, event: OrderEvent):
         self.standing_order_set.add(event)
+        self.standing_orders[event.oid] = event
 
     def on_order_status(self):
         ...
 
     def on_cancel(self, order: OrderEvent):
         self.standing_order_set.remove(order)
+        self.standing_orders.pop(order.oid, None)
         self.canceled_order_set.add(order)
 
+    def on_cancels(self, orders: list):
+        """Orders cancelled together, e.g. by StrategyBase.cancel_orders"""
+        for order in orders:
+            self.standing_order_set.discard(order)
+            self.standing_orders.pop(order.oid, None)
+        self.canceled_order_set.update(orders)
+
     def on_fill(self, fillevent: FillEvent):
         # once filled, remove from standing order set and order_dict
-        for order in list(self.standing_order_set):
-            if order.oid == fillevent.oid:
-                self.standing_order_set.remove(order)
+        order = self.standing_orders.pop(fillevent.oid, None)
+        if order is not None:
+            self.standing_order_set.discard(order)
 
     def get_order(self, oid):
-        return
+        """Standing order by client order id, None if it is not standing"""
+        return self.standing_orders.get(oid)
 
     def get_standing_order(self):
         return self.standing_order_set
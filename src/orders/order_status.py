@@ -0,0 +1,115 @@
+"""
+Batched order status reconciliation
+
+Instead of one get_order call per standing order (StrategyBase.on_order_status),
+OrderStatusReconciler lists the recently closed orders of each pair that has
+standing orders, one list_closed_orders call per pair (more pages only when
+more orders closed since the oldest standing one than fit in a page), and
+diffs them against the strategies' OrderManager.standing_orders. Standing
+orders found COMPLETE get a FillEvent, so REST calls per heartbeat grow with
+the number of pairs, not orders. Orders COMPLETE without any fill (cancelled,
+e.g. a post-only order that would have crossed) are moved to the order
+manager's cancelled orders instead.
+
+Orders the listing does not reach (max_pages exhausted) fall back to get_order.
+"""
+import logging
+
+from src.events import FillEvent
+
+_logger = logging.getLogger("trading_system")
+
+CLOCK_SKEW_MS = 5000  # order_time is stamped locally, creation_timestamp by the exchange
+
+
+class OrderStatusReconciler:
+    def __init__(self, broker, event_engine, page_limit: int = 100, max_pages: int = 3, on_unfilled=None):
+        """
+        Args:
+            broker (TradeClient): with list_closed_orders(pair, created_before, limit) and get_order
+            event_engine (EventEngine): FillEvents are put here
+            page_limit (int, optional): orders per listing call. Defaults to 100.
+            max_pages (int, optional): listing calls per pair before falling back to get_order. Defaults to 3.
+            on_unfilled (callable, optional): called with the client oids of orders closed without a fill.
+        """
+        self._broker = broker
+        self._event_engine = event_engine
+        self._on_unfilled = on_unfilled
+        self.page_limit = page_limit
+        self.max_pages = max_pages
+        self._reported = set()  # client oids already filled, until they leave the standing sets
+        self.calls = 0  # REST calls made
+
+    def _closed_orders(self, pair: str, since_ms: float):
+        """({client oid or order id: order}, covered) of the orders closed since since_ms"""
+        closed = {}
+        created_before = None
+        for _ in range(self.max_pages):
+            page = self._broker.list_closed_orders(pair, created_before=created_before, limit=self.page_limit)
+            self.calls += 1
+            for info in page:
+                closed[info["order_id"]] = info
+                if info.get("client_order_id"):
+                    closed[info["client_order_id"]] = info
+            if len(page) < self.page_limit:
+                return closed, True
+            oldest = min(int(info["creation_timestamp"]) for info in page)
+            if oldest < since_ms:
+                return closed, True
+            created_before = oldest
+        return closed, False
+
+    def reconcile(self, strategies) -> int:
+        """Check the standing orders of these strategies, returns the FillEvents put"""
+        by_pair = {}
+        standing_oids = set()
+        order_managers = {}  # client oid -> OrderManager
+        for strategy in strategies:
+            for order in list(strategy.order_manager.standing_orders.values()):
+                standing_oids.add(order.oid)
+                order_managers[order.oid] = strategy.order_manager
+                if order.oid not in self._reported:
+                    by_pair.setdefault(order.sym, []).append(order)
+        self._reported &= standing_oids
+        fills = 0
+        for pair, orders in by_pair.items():
+            since = min(order.order_time or 0 for order in orders) - CLOCK_SKEW_MS
+            try:
+                closed, covered = self._closed_orders(pair, since)
+            except Exception as e:
+                _logger.error(f"Listing closed {pair} orders failed: {e}")
+                continue
+            for order in orders:
+                info = closed.get(order.oid) or closed.get(order.luno_oid)
+                if info is None and not covered:
+                    try:
+                        info = self._broker.get_order(order.oid)
+                        self.calls += 1
+                    except Exception as e:
+                        _logger.error(f"Order status of {order.oid} failed: {e}")
+                        continue
+                if info is None or info["status"] != "COMPLETE":
+                    continue
+                if float(info["base"]) == 0:
+                    # closed without a fill, nothing to report
+                    _logger.info(f"Order closed unfilled: {order}")
+                    order_managers[order.oid].on_cancels([order])
+                    if self._on_unfilled is not None:
+                        self._on_unfilled([order.oid])
+                    continue
+                fill_event = FillEvent(
+                    sid=order.sid,
+                    oid=order.oid,
+                    sym=order.sym,
+                    dir=order.direction,
+                    base=info["base"],
+                    counter=info["counter"],
+                    fee_base=info["fee_base"],
+                    create_ts=info["creation_timestamp"],
+                    complete_ts=info["completed_timestamp"],
+                )
+                _logger.info(f"Order filled: {fill_event}")
+                self._reported.add(order.oid)
+                self._event_engine.put(fill_event)
+                fills += 1
+        return fills
@@ -0,0 +1,327 @@
+"""
+Journal replay
+
+Feeds a recorded event journal (src/event_journal.py) back through a
+StrategyManager as fast as possible, to reproduce a session or to regression
+test strategy changes against it:
+
+    ticks and trades      -> StrategyManager.on_tick / on_trade
+    order status checks   -> StrategyManager.on_order_status
+
+Orders and fills the strategies produce during the replay go through a
+ReplayBroker, and are handled (on_new_order / on_fill) right after the
+journal event that caused them, as the action engine would.
+
+Recorded orders and fills are not replayed as such. ReplayBroker matches each
+order a strategy places to the next recorded order with the same symbol, type,
+side, price and volume, and completes it when that order's recorded fill
+comes up, so an unchanged strategy sees the original fills at the original
+point of the session. Unmatched orders (e.g. from a changed strategy) fill
+when a replayed tick crosses them, at their limit price or at the touch for
+market orders, without fees.
+
+Replays are deterministic: the StrategyManager clock (order times, and
+StrategyBase.now_ms() in strategies) reads the wall clock time each journal
+event was recorded at, and client order ids are numbered ("replay-1", ...),
+so the same journal and strategies always give the same orders.
+
+Usage (from the repo root):
+    python -m src.strategies.journal_replay journal_dir [strategy_config.yaml]
+"""
+import sys
+import time
+from collections import deque
+
+import yaml
+
+from src.event_journal import read_journal
+from src.events import EventType, FillEvent, OrderDir, OrderEvent, OrderType, TickEvent
+from src.strategies.strategy_loader import load_strategies
+from src.strategies.strategy_manager import StrategyManager
+
+
+def order_key(ordertype: str, pair: str, side: str, price, volume) -> tuple:
+    """What a replayed order must share with a recorded one to be matched to it"""
+    if ordertype == OrderType.MKT.name:
+        price = None  # market orders are sized by volume only
+    return (ordertype, pair, side, price, volume)
+
+
+class ReplayBroker:
+    """TradeClient stand-in for replays, see the module docstring"""
+
+    def __init__(self, fill_on_cross: bool = True):
+        """
+        Args:
+            fill_on_cross (bool, optional): fill unmatched orders when a tick crosses them.
+        """
+        self.fill_on_cross = fill_on_cross
+        self.orders = {}  # client oid -> order, in get_order format
+        self.matched = 0
+        self._recorded = {}  # order_key -> deque of recorded client oids
+        self._by_recorded = {}  # recorded client oid -> replayed client oid
+        self._by_luno = {}  # order_id -> client oid
+        self._unmatched = []  # open orders filled on cross
+        self._last_ts = 0
+        self._next_id = 0
+
+    def record_order(self, event: OrderEvent):
+        """A recorded OrderEvent the strategies' orders are matched against"""
+        if event.ordertype == OrderType.MKT and event.direction == OrderDir.BID:
+            volume = event.counter_volume
+        else:
+            volume = event.base_volume
+        key = order_key(event.ordertype.name, event.sym, event.direction.value, event.price, volume)
+        self._recorded.setdefault(key, deque()).append(event.oid)
+
+    def _place(self, ordertype, pair, side, price, volume, client_order_id, counter=False):
+        self._next_id += 1
+        order = {
+            "order_id": f"REPLAY{self._next_id}",
+            "client_order_id": client_order_id,
+            "pair": pair,
+            "type": side,
+            "ordertype": ordertype,
+            "limit_price": price,
+            "limit_volume": volume,
+            "counter_sized": counter,
+            "status": "PENDING",
+            "base": "0",
+            "counter": "0",
+            "fee_base": "0",
+            "creation_timestamp": self._last_ts,
+            "completed_timestamp": 0,
+        }
+        self.orders[client_order_id] = order
+        self._by_luno[order["order_id"]] = client_order_id
+        recorded = self._recorded.get(order_key(ordertype, pair, side, price, volume))
+        if recorded:
+            self._by_recorded[recorded.popleft()] = client_order_id
+            self.matched += 1
+        else:
+            self._unmatched.append(order)
+        return {"order_id": order["order_id"]}
+
+    def place_limit_order(self, pair, price, type, volume, client_order_id=None, post_only=True, **kwargs):
+        return self._place(OrderType.LMT.name, pair, type, price, volume, client_order_id)
+
+    def place_market_order(self, pair, type, client_order_id=None, counter_volume=None, base_volume=None, **kwargs):
+        if counter_volume is not None:
+            return self._place(OrderType.MKT.name, pair, type, None, counter_volume, client_order_id, True)
+        return self._place(OrderType.MKT.name, pair, type, None, base_volume, client_order_id)
+
+    def get_order(self, client_order_id):
+        return self.orders[client_order_id]
+
+    def list_closed_orders(self, pair, created_before=None, limit=100):
+        closed = [
+            o
+            for o in self.orders.values()
+            if o["pair"] == pair
+            and o["status"] != "PENDING"
+            and (created_before is None or o["creation_timestamp"] < created_before)
+        ]
+        return sorted(closed, key=lambda o: o["creation_timestamp"], reverse=True)[:limit]
+
+    def cancel_order(self, order_id):
+        order = self.orders.get(self._by_luno.get(order_id))
+        if order is not None and order["status"] != "COMPLETE":
+            order["status"] = "CANCELLED"
+            if order in self._unmatched:
+                self._unmatched.remove(order)
+        return {"success": order is not None}
+
+    def _complete(self, order, base, counter, fee_base, create_ts, complete_ts):
+        order.update(
+            status="COMPLETE",
+            base=str(base),
+            counter=str(counter),
+            fee_base=str(fee_base),
+            creation_timestamp=create_ts,
+            completed_timestamp=complete_ts,
+        )
+
+    def on_recorded_fill(self, event: FillEvent):
+        """Complete the replayed order matched to the recorded order of this fill"""
+        oid = self._by_recorded.pop(event.oid, None)
+        if oid is not None and self.orders[oid]["status"] == "PENDING":
+            self._complete(
+                self.orders[oid],
+                event.base_volume,
+                event.counter_volume,
+                event.fee_base,
+                event.create_ts,
+                event.complete_ts,
+            )
+
+    def on_tick(self, event: TickEvent):
+        """Fill unmatched orders the tick crosses"""
+        self._last_ts = event.timestamp
+        if not self.fill_on_cross or not self._unmatched:
+            return
+        for order in list(self._unmatched):
+            if order["pair"] != event.sym:
+                continue
+            buy = order["type"] == OrderDir.BID.value
+            touch = event.ask_p if buy else event.bid_p
+            if order["ordertype"] == OrderType.LMT.name:
+                if (touch > order["limit_price"]) if buy else (touch < order["limit_price"]):
+                    continue
+                price = order["limit_price"]
+            else:
+                price = touch
+            if order["counter_sized"]:
+                counter = order["limit_volume"]
+                base = counter / price
+            else:
+                base = order["limit_volume"]
+                counter = base * price
+            self._complete(order, base, counter, 0, order["creation_timestamp"], event.timestamp)
+            self._unmatched.remove(order)
+
+
+class ReplayClock:
+    """StrategyManager clock set to the recording time of the event being replayed"""
+
+    def __init__(self):
+        self.now_ms = 0.0
+
+    def __call__(self) -> float:
+        return self.now_ms
+
+
+class ReplayOids:
+    """Numbered client order ids, the same on every replay"""
+
+    def __init__(self, prefix: str = "replay"):
+        self.prefix = prefix
+        self.issued = 0
+
+    def __call__(self) -> str:
+        self.issued += 1
+        return f"{self.prefix}-{self.issued}"
+
+
+class _ReplayEngine:
+    """Action engine stand-in, events are handled after the journal event that produced them"""
+
+    def __init__(self):
+        self.queue = deque()
+
+    def put(self, event):
+        self.queue.append(event)
+
+
+class _NullAlerts:
+    def send_telegram_message(self, message):
+        pass
+
+
+class _NullCollection:
+    def insert_one(self, document):
+        pass
+
+
+class _NullDatabase:
+    def __getitem__(self, name):
+        return _NullCollection()
+
+
+class JournalReplay:
+    def __init__(
+        self,
+        journal,
+        strat_config: dict,
+        strat_dict: dict,
+        instrument_list: dict,
+        fill_on_cross: bool = True,
+        order_status_interval: float = 0,
+    ):
+        """
+        Args:
+            journal (str): journal directory or segment file
+            strat_config (dict): strategy config, as global_strategy_config.yaml
+            strat_dict (dict): strategy name -> new strategy instance, see load_strategies
+            instrument_list (dict): strategy name -> instruments
+            fill_on_cross (bool, optional): see ReplayBroker. Defaults to True.
+            order_status_interval (float, optional): as the recorded run's, see StrategyManager. Defaults to 0.
+        """
+        self.journal = journal
+        self.broker = ReplayBroker(fill_on_cross=fill_on_cross)
+        self.engine = _ReplayEngine()
+        self.clock = ReplayClock()
+        self.strategy_manager = StrategyManager(
+            event_engine=self.engine,
+            primary_broker=self.broker,
+            strat_config=strat_config,
+            instrument_list=instrument_list,
+            alerts_system=_NullAlerts(),
+            database=_NullDatabase(),
+            clock=self.clock,
+            new_oid=ReplayOids(),
+            order_status_interval=order_status_interval,
+        )
+        self.strategy_manager.load_strategy(strat_dict=strat_dict)
+        self.orders = []  # OrderEvents placed during the replay
+        self.fills = []  # FillEvents of the replay
+
+    def run(self) -> dict:
+        """Replay the whole journal, returns counts and events per second"""
+        for _, event in read_journal(self.journal):
+            if event.type == EventType.ORDER:
+                self.broker.record_order(event)
+        manager = self.strategy_manager
+        n = 0
+        start = time.perf_counter()
+        for ts, event in read_journal(self.journal, wall_clock=True):
+            self.clock.now_ms = ts / 1e6
+            type_ = event.type
+            if type_ == EventType.TICK:
+                self.broker.on_tick(event)
+                manager.on_tick(event)
+            elif type_ == EventType.TRADE:
+                manager.on_trade(event)
+            elif type_ == EventType.CHECK_ORDER_STATUS:
+                manager.on_order_status(event.force)
+            elif type_ == EventType.FILL:
+                self.broker.on_recorded_fill(event)
+            n += 1
+            self._drain()
+        elapsed = time.perf_counter() - start
+        return {
+            "events": n,
+            "seconds": elapsed,
+            "events_per_s": n / elapsed if elapsed > 0 else None,
+            "orders": len(self.orders),
+            "matched_orders": self.broker.matched,
+            "fills": len(self.fills),
+        }
+
+    def _drain(self):
+        queue, manager = self.engine.queue, self.strategy_manager
+        while queue:
+            event = queue.popleft()
+            if event.type == EventType.ORDER:
+                self.orders.append(event)
+                manager.on_new_order(event)
+            elif event.type == EventType.FILL:
+                self.fills.append(event)
+                manager.on_fill(event)
+            elif event.type == EventType.CHECK_ORDER_STATUS:
+                manager.on_order_status(event.force)
+
+
+if __name__ == "__main__":
+    journal = sys.argv[1]
+    config_path = sys.argv[2] if len(sys.argv) > 2 else "./src/configs/global_strategy_config.yaml"
+    with open(config_path, "r") as f:
+        strat_config = yaml.safe_load(f)
+    strat_dict, instrument_list = load_strategies(strat_config)
+    replay = JournalReplay(journal, strat_config, strat_dict, instrument_list)
+    stats = replay.run()
+    for order in replay.orders:
+        print(order)
+    print(
+        f"{stats['events']} events in {stats['seconds']:.2f}s ({stats['events_per_s'] or 0:,.0f}/s), "
+        f"{stats['orders']} orders ({stats['matched_orders']} matched to recorded ones), {stats['fills']} fills"
+    )
@@ -6,7 +6,6 @@ Reference:
 https://docs.hummingbot.org/strategies/pure-market-making/#architecture
 """
 
-import time
 import logging
 
 # from termcolor import cprint, colored
@@ -51,6 +50,11 @@ class marketMaking(StrategyBase):
 
         self.filled_order_delay = 0
         self.ping_pong_enabled = False
+
+        # trade flow regime filter (streamed market data only)
+        self.flow_window = 60  # seconds, one of TradeFlow windows
+        self.max_flow_imbalance = None  # stop quoting if |signed / total volume| is above this
+        self.min_flow_trades = 5  # trades needed in the window before the filter applies
         # PARAMS (initialized from the start)
         self.min_tick_size = None
         self.base_init_inventory = None # base asset inventory level
@@ -77,7 +81,7 @@ class marketMaking(StrategyBase):
         # LOGIC STARTS HERE
         
         # do not quote is regime unsuitable
-        if not self.regime_suitable():
+        if not self.regime_suitable(event):
             self.cancel_all()
             return 
 
@@ -109,12 +113,22 @@ class marketMaking(StrategyBase):
             if self.ask_counter == self.order_levels:
                 return True
 
-    def regime_suitable(self):
-        """Not implemented yet"""
+    def regime_suitable(self, event: TickEvent):
+        """Only one-sided trade flow is checked so far"""
         # if volatility spikes/breakout - not placing order. check if orders are in place, cancel them if necessary. set waiting time
         # condition to place order or not lies on volatility
         # precheck - market condition ok to market make?
         # news/ volatility spikes/ using lead-lag signal etc.
+        flow = self.trade_flow(event.code)
+        if flow is not None and self.max_flow_imbalance is not None:
+            now = self.now_ms() / 1000  # expire the window without waiting for the next trade
+            if flow.count(self.flow_window, now) >= self.min_flow_trades:
+                imbalance = flow.imbalance(self.flow_window, now)
+                if abs(imbalance) > self.max_flow_imbalance:
+                    _logger.info(
+                        f"{event.code} trade flow imbalance {imbalance:.2f} over {self.flow_window}s, not quoting"
+                    )
+                    return False
         return True
 
     def cal_optimal_bid_ask(self):
@@ -153,28 +167,32 @@ class marketMaking(StrategyBase):
             order_ids.append(order.luno_oid)
         return order_ids
 
-    def cancel_bids(self, orders: list):
-        for order in orders:
-            self.cancel_order(order)
-            self.bid_counter -= 1
+    def cancel_bids(self, order_ids: list):
+        self.bid_counter -= len(self.cancel_orders(self._standing(order_ids)))
 
-    def cancel_asks(self, orders: list):
-        for order in orders:
-            self.cancel_order(order)
-            self.ask_counter -= 1
+    def cancel_asks(self, order_ids: list):
+        self.ask_counter -= len(self.cancel_orders(self._standing(order_ids)))
+
+    def _standing(self, order_ids: list) -> list:
+        """Standing orders of these oids, ones already filled or cancelled are skipped"""
+        orders = (self.order_manager.get_order(oid) for oid in order_ids)
+        return [order for order in orders if order is not None]
 
     def on_order_status(self):
         super().on_order_status()
         # if time since placement exceeds order refresh time, cancel order
-        current_time = time.time_ns() / 1000
-        for order in self.order_manager.standing_order_set:
+        current_time = self.now_ms()  # order_time is in ms too, order_refresh_time in seconds
+        stale = [
+            order
+            for order in self.order_manager.standing_orders.values()
+            if (current_time - order.order_time) / 1000 > self.order_refresh_time
+        ]
+        for order in self.cancel_orders(stale):
             order: OrderEvent
-            if current_time - order.order_time > self.order_refresh_time:
-                self.cancel_order(order.oid)
-                if order.direction == OrderDir.BID:
-                    self.bid_counter -= 1
-                elif order.direction == OrderDir.ASK:
-                    self.ask_counter -= 1
+            if order.direction == OrderDir.BID:
+                self.bid_counter -= 1
+            elif order.direction == OrderDir.ASK:
+                self.ask_counter -= 1
 
     def kill_switch(self):
         """if pnl down significantly, or some shit happens. EXIT trading strategy."""
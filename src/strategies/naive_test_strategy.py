@@ -34,7 +34,7 @@ class naiveTest(StrategyBase):
         #print(f"{event}, spread_pct = {self.spread_pct *100}%, {self.counter}")
 
         super().on_tick(event)
-        self.current_time = time.time()
+        self.current_time = self.now_ms() / 1000
         self.prev_time = self.current_time
         if self.counter == 5:
 
@@ -2,7 +2,7 @@ from abc import ABC, abstractmethod
 from src.strategies.strategy_manager import StrategyManager
 from src.orders.order_manager import OrderManager
 from src.positions.position_manager import PositionManager
-from src.events import TickEvent, OrderEvent, CheckOrderStatusEvent, FillEvent
+from src.events import TickEvent, TradeEvent, OrderEvent, CheckOrderStatusEvent, FillEvent
 import copy
 import logging
 
@@ -18,6 +18,7 @@ class StrategyBase(ABC):
         self.position_manager: PositionManager = PositionManager(self.name)
         self.active: bool = False
         self.initialized: bool = False
+        self.conflate_ticks: bool = True  # False to receive every tick, even when behind
 
     def set_capital(self, initial_capital):
         self.capital = initial_capital
@@ -52,18 +53,37 @@ class StrategyBase(ABC):
         # update portfolio positions P&L
         self.position_manager.mark_to_market(event)
 
+    def on_trade(self, event: TradeEvent):
+        """Public trade on a subscribed symbol, see trade_flow for rolling stats"""
+
+    def now_ms(self) -> float:
+        """Current time in ms from the strategy manager's clock, the journal's during replays"""
+        return self.strategy_manager.clock()
+
+    def trade_flow(self, code: str):
+        """Rolling TradeFlow of a symbol e.g. "ETHMYR.luno", None before its first trade"""
+        return self.strategy_manager.trade_flows.get(code)
+
     def on_new_order(self, orderevent: OrderEvent):
         """New order comes in"""
         self.order_manager.on_new_order(orderevent)
 
     def on_order_status(self):
-        for order in list(self.order_manager.standing_order_set):
+        if getattr(self.strategy_manager, "order_status_reconciler", None) is not None:
+            return  # already checked in one sweep of all strategies, see OrderStatusReconciler
+        if not getattr(self.strategy_manager, "poll_order_status", True):
+            return  # inside order_status_interval, see StrategyManager.on_order_status
+        for order in list(self.order_manager.standing_orders.values()):
 
             order_info = self.strategy_manager._broker.get_order(order.oid)
             order: OrderEvent
             # if order filled, put fillevent into event_engine,
             # remove from order dict and standing order set
-            if order_info["status"] == "COMPLETE":
+            if order_info["status"] == "COMPLETE" and float(order_info["base"]) == 0:
+                # closed without a fill (cancelled), see OrderStatusReconciler
+                self.order_manager.on_cancels([order])
+                self.strategy_manager.untrack([order.oid])
+            elif order_info["status"] == "COMPLETE":
                 # add to filled order
                 fill_event = FillEvent(
                     sid=order.sid,
@@ -76,7 +96,7 @@ class StrategyBase(ABC):
                     create_ts=order_info["creation_timestamp"],
                     complete_ts=order_info["completed_timestamp"],
                 )
-                print(f"Order Filled: {fill_event}")
+                _logger.info(f"Order filled: {fill_event}")
                 self.strategy_manager._event_engine.put(fill_event)
 
     def on_fill(self, fillevent):
@@ -89,17 +109,66 @@ class StrategyBase(ABC):
             self.strategy_manager.place_order(orderevent)
 
     def cancel_order(self, oid):
+        order = self.order_manager.get_order(oid)
+        if order is not None:
+            self.cancel_orders([order])
 
-        for order in list(self.order_manager.standing_order_set):
-            if order.oid == oid:
-                self.strategy_manager._broker.cancel_order(order.luno_oid)
-                self.order_manager.on_cancel(order)
-                self.strategy_manager._alerts.send_telegram_message(f"Canceling order: {order}")
-                _logger.info(f'Order cancelled: {order}')
     def cancel_all(self):
-
-        for order in list(self.order_manager.standing_order_set):  # use a copy
-            self.strategy_manager._broker.cancel_order(order.luno_oid)
-            self.order_manager.on_cancel(order)
-            self.strategy_manager._alerts.send_telegram_message(f"Canceling order: {order}")
-            _logger.info(f'Order cancelled: {order}')
+        self.cancel_orders(list(self.order_manager.standing_orders.values()))  # use a copy, in placement order
+
+    def cancel_orders(self, orders: list) -> list:
+        """Cancel standing orders concurrently, returns the ones cancelled
+
+        The order manager gets the cancelled orders as one batch and the alert
+        goes out once every cancel has returned. Orders whose cancel failed stay
+        standing (they may have filled, the next order status check tells).
+        """
+        if not orders:
+            return []
+        errors = self.strategy_manager.cancel_orders(orders)
+        cancelled = [order for order, error in zip(orders, errors) if error is None]
+        self.order_manager.on_cancels(cancelled)
+        self._report_cancels(orders, errors)
+        return cancelled
+
+    def replace_order(self, oid, orderevent: OrderEvent) -> bool:
+        """Cancel standing order oid and place orderevent in its place, True if both went through"""
+        order = self.order_manager.get_order(oid)
+        if order is None:
+            return False
+        return self.replace_orders([(order, orderevent)])[0]
+
+    def replace_orders(self, replacements: list) -> list:
+        """Cancel-replace [(standing order, new OrderEvent)], see StrategyManager.replace_orders
+
+        Returns whether each pair was replaced. New orders reach the order manager
+        through on_new_order as usual.
+        """
+        if not replacements:
+            return []
+        if not self.active:
+            # inactive strategies place nothing, only pull the orders
+            self.cancel_orders([old for old, _ in replacements])
+            return [False] * len(replacements)
+        results = self.strategy_manager.replace_orders(replacements)
+        olds = [old for old, _ in replacements]
+        cancel_errors = [cancel_error for cancel_error, _ in results]
+        self.order_manager.on_cancels([old for old, error in zip(olds, cancel_errors) if error is None])
+        self._report_cancels(olds, cancel_errors)
+        for (_, new), (cancel_error, place_error) in zip(replacements, results):
+            if cancel_error is None and place_error is not None:
+                _logger.error(f"Replacement order not placed: {new}: {place_error}")
+                self.strategy_manager._alerts.send_telegram_message(f"Replacement order not placed: {new}")
+        return [cancel_error is None and place_error is None for cancel_error, place_error in results]
+
+    def _report_cancels(self, orders: list, errors: list):
+        """Log each cancel and send one alert for the batch"""
+        lines = []
+        for order, error in zip(orders, errors):
+            if error is None:
+                _logger.info(f"Order cancelled: {order}")
+                lines.append(f"Canceling order: {order}")
+            else:
+                _logger.error(f"Order not cancelled: {order}: {error}")
+                lines.append(f"Cancel failed: {order}: {error}")
+        self.strategy_manager._alerts.send_telegram_message("\n".join(lines))
@@ -0,0 +1,36 @@
+import importlib
+import os
+
+
+def load_strategies(strat_config: dict):
+    """(strat_dict, instrument_list) of the strategies configured in strat_config
+
+    Every src/strategies/*strategy.py module is searched for classes named
+    after a strategy in strat_config["strategy"], and one instance is made per
+    strategy. Used by TradingSystem and JournalReplay.
+    """
+    strat_dict = {}
+    instrument_list = {}
+
+    for _, _, files in os.walk(os.path.abspath("./src/strategies/")):
+        for file in files:
+            if file.endswith("strategy.py"):
+                s = file.replace(".py", "")
+
+                try:
+                    module = importlib.import_module(f"src.strategies.{s}")
+                    for k in dir(module):
+
+                        if k in strat_config["strategy"].keys():
+                            v = module.__getattribute__(k)
+                            _strategy = v()  # strategy class
+
+                            _strategy.set_name(k)
+
+                            strat_dict[k] = _strategy
+
+                            instrument_list[k] = strat_config["strategy"][k]["instruments"]
+
+                except Exception as e:
+                    print(f"Unable to load strategy {s}: {e}")
+    return strat_dict, instrument_list
@@ -1,13 +1,21 @@
+import asyncio
 import datetime
 import logging
+import threading
+import time
 from src.brokerage.luno.TradeClient import TradeClient
 from src.orders.order_manager import OrderManager
+from src.orders.order_status import OrderStatusReconciler
 from src.positions.position_manager import PositionManager
 from src.events_engine import EventEngine
 from src.utils.alerts import Alerts
 from src.utils.db_service import DBService
+from src.marketdata.trade_flow import TradeFlow
+from src.strategies.strategy_worker import StrategyWorkerPool
+from src.utils import latency, metrics
 from src.events import (
     TickEvent,
+    TradeEvent,
     OrderEvent,
     OrderType,
     OrderDir,
@@ -15,9 +23,27 @@ from src.events import (
     CheckOrderStatusEvent,
 )
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 _logger = logging.getLogger("trading_system")
 
+MAX_FILLED_OIDS = 10000  # recent fills remembered to drop duplicate FillEvents
+# cancels / replacements in flight per exchange, keep within the exchanges' rate limits
+ORDER_CONCURRENCY = {"luno": 8, "kraken": 2}
+
+def wall_clock_ms() -> float:
+    return datetime.datetime.now().timestamp() * 1000
+
+
+def new_client_oid() -> str:
+    return str(uuid.uuid4())
+
+
+ON_TICK_SECONDS = metrics.histogram(
+    "cts_strategy_on_tick_seconds", "Strategy on_tick time, the hand-off only for worker strategies", ("strategy",)
+)
+
 
 class StrategyManager:
     def __init__(
@@ -27,14 +53,39 @@ class StrategyManager:
         strat_config: dict,
         instrument_list: dict,
         alerts_system: Alerts,
-        database
+        database,
+        workers: int = 0,
+        shard_by: str = "strategy",
+        batch_order_status: bool = False,
+        order_concurrency: int = None,
+        clock=None,
+        new_oid=None,
+        async_broker=None,
+        order_status_interval: float = 0,
     ):
+        """
+        workers > 0 runs the strategies in that many worker processes, placed by
+        strategy id or by symbol (shard_by), see src/strategies/strategy_worker.py.
+        batch_order_status checks standing orders with one closed orders listing
+        per pair instead of a get_order per order, see src/orders/order_status.py.
+        order_concurrency caps the cancel_orders / replace_orders requests in flight
+        on the primary broker (Luno), ORDER_CONCURRENCY["luno"] by default.
+        clock (ms since epoch) and new_oid (client order ids) default to the
+        wall clock and uuid4, replays drive them from the journal instead.
+        async_broker (AsyncTradeClient over the primary broker's connection pool)
+        runs cancel_orders / replace_orders as coroutines instead of threads.
+        order_status_interval (seconds) spaces out the exchange calls of
+        on_order_status, 0 polls on every check.
+        """
         self._event_engine = event_engine
         self._broker = primary_broker
+        self._async_broker = async_broker
         self.strat_config = strat_config
         self.symbols_dict = instrument_list  # {exc: [sym]}
         self._alerts = alerts_system
         self._database = database
+        self.clock = clock or wall_clock_ms
+        self.new_oid = new_oid or new_client_oid
 
         self.strat_dict = {}
         self.sym_strategy_dict = {}  # symbol to strategy
@@ -42,6 +93,24 @@ class StrategyManager:
         self.strat_sym_dict = {}
         self.active_symbols = []
         self._sid_oid_dict = {0: []}  # others note in
+        self.trade_flows = {}  # code -> TradeFlow, fed by on_trade
+        self.order_status_reconciler = (
+            OrderStatusReconciler(primary_broker, event_engine, on_unfilled=self.untrack)
+            if batch_order_status
+            else None
+        )
+        self.order_status_interval = order_status_interval
+        self.poll_order_status = True  # whether the current order status check calls the exchange
+        self._last_status_poll = None  # clock() ms
+        self.user_stream = None  # LunoUserStream, placed orders are tracked for pushed fills
+        self._filled = set()  # oids already filled, the stream and polling can both report one
+        self._filled_order = deque()
+        self._resolver = None  # thread looking up exchange order ids placements did not return
+        self.order_concurrency = order_concurrency or ORDER_CONCURRENCY["luno"]
+        self._order_pool = None  # threads running bulk cancels and replacements
+        self._pool = StrategyWorkerPool(self, workers, shard_by) if workers else None
+        # tick being handled on this thread, orders placed from it continue its latency trace
+        self._handling = threading.local()
 
     def load_strategy(self, strat_dict: dict):
         sid = 1
@@ -50,16 +119,23 @@ class StrategyManager:
             v.name = k
             sid += 1
 
+            params = None
             if k in self.strat_config["strategy"].keys():
+                params = self.strat_config["strategy"][k]['params']
                 v.active = self.strat_config["strategy"][k]["active"]
                 v.set_capital(self.strat_config["strategy"][k]["capital"])
                 v.set_symbols(self.symbols_dict[k])  # list
-                v.set_params(self.strat_config["strategy"][k]['params'])
+                v.set_params(params)
                 if v.active:
                     for sym in v.symbols:
                         self.active_symbols.append(sym)
+            if self._pool is not None:
+                # runs in a worker, events reach it through the proxy
+                v = self._pool.add(v, params)
             self.strat_dict[v.id] = v
             self._sid_oid_dict[v.id] = []  # order id dict
+            if latency.tracer is not None:
+                latency.tracer.strategy_names[v.id] = k
 
             # subscribe each strategy to the symbols:
             for sym in v.symbols:
@@ -68,15 +144,49 @@ class StrategyManager:
                 else:
                     self.sym_strategy_dict[sym] = [v.id]
 
-            v.on_init(self)
+            if self._pool is None:
+                v.on_init(self)
+        if self._pool is not None:
+            self._pool.start()
+
+    def stop_workers(self):
+        if self._pool is not None:
+            self._pool.stop()
 
     def on_tick(self, event: TickEvent):
         """pass market data to each strategy that needs this"""
         if event.code in self.sym_strategy_dict.keys():
             strats = self.sym_strategy_dict[event.code]
-            for sid in strats:
-                if self.strat_dict[sid].active:
-                    self.strat_dict[sid].on_tick(event)
+            self._handling.tick = event
+            try:
+                if metrics.enabled:
+                    self._timed_on_tick(strats, event)
+                else:
+                    for sid in strats:
+                        if self.strat_dict[sid].active:
+                            self.strat_dict[sid].on_tick(event)
+            finally:
+                self._handling.tick = None
+
+    def _timed_on_tick(self, strats, event: TickEvent):
+        for sid in strats:
+            strategy = self.strat_dict[sid]
+            if strategy.active:
+                start = time.perf_counter()
+                strategy.on_tick(event)
+                ON_TICK_SECONDS.labels(strategy.name).observe(time.perf_counter() - start)
+
+    def on_trade(self, event: TradeEvent):
+        """update rolling trade flow, then pass the trade to each strategy that needs this"""
+        if event.code not in self.sym_strategy_dict.keys():
+            return
+        flow = self.trade_flows.get(event.code)
+        if flow is None:
+            flow = self.trade_flows[event.code] = TradeFlow()
+        flow.on_trade(event)
+        for sid in self.sym_strategy_dict[event.code]:
+            if self.strat_dict[sid].active:
+                self.strat_dict[sid].on_trade(event)
 
     def place_order(self, event: OrderEvent, check_risk=False):
 
@@ -87,12 +197,26 @@ class StrategyManager:
         #     if not order_checked:
         #         return
 
+        self._stamp_order(event)
+        # actual place order
+        response = self._send_order(self._broker, event)
+        self._order_placed(event, response)
+
+    def _stamp_order(self, event: OrderEvent):
         # generate unique client order id
-        oid = str(uuid.uuid4())
+        oid = self.new_oid()
         event.oid = oid
-        event.order_time = datetime.datetime.now().timestamp() * 1000
+        event.order_time = self.clock()
+        event.luno_oid = None
         self._sid_oid_dict[event.sid].append(oid)
-        # actual place order
+        if latency.tracer is not None:
+            tick = getattr(self._handling, "tick", None)
+            event.trace = list(tick.trace) if tick is not None and tick.trace else []
+            latency.stamp(event, "place_order")
+
+    @staticmethod
+    def _send_order(broker, event: OrderEvent):
+        """Post event on broker, the response (a coroutine on an AsyncTradeClient)"""
         if event.ordertype == OrderType.MKT:
             params = {
                 "pair": event.sym,
@@ -104,11 +228,11 @@ class StrategyManager:
             elif event.direction == OrderDir.ASK:
                 params["base_volume"] = event.base_volume
 
-            self._broker.place_market_order(**params)
+            return broker.place_market_order(**params)
 
         elif event.ordertype == OrderType.LMT:
 
-            self._broker.place_limit_order(
+            return broker.place_limit_order(
                 pair=event.sym,
                 price=event.price,
                 type=event.direction.value,
@@ -116,11 +240,143 @@ class StrategyManager:
                 client_order_id=event.oid,
                 post_only=event.post_only,
             )
-        
-        new_order = self._broker.get_order(event.oid)
-        event.luno_oid = new_order["order_id"]
+        raise ValueError(f"unsupported order type {event.ordertype}")
+
+    def _order_placed(self, event: OrderEvent, response):
+        latency.stamp(event, "broker_ack")
+        # the post response carries the exchange order id
+        luno_oid = response.get("order_id") if isinstance(response, dict) else None
+        if luno_oid is None:
+            # look it up off the order path, luno_oid() waits for it if needed first
+            if self._resolver is None:
+                self._resolver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="luno-oid")
+            self._resolver.submit(self.luno_oid, event)
+        else:
+            self._set_luno_oid(event, luno_oid)
         self._event_engine.put(event)
 
+    def _set_luno_oid(self, order: OrderEvent, luno_oid: str):
+        if order.luno_oid is None:
+            order.luno_oid = luno_oid
+            if self.user_stream is not None:
+                self.user_stream.track(order)
+
+    def luno_oid(self, order: OrderEvent) -> str:
+        """Exchange order id of a placed order, fetched with get_order if the placement did not return it"""
+        if order.luno_oid is None:
+            try:
+                luno_oid = self._broker.get_order(order.oid)["order_id"]
+            except Exception as e:
+                _logger.error(f"Exchange order id of {order.oid} failed: {e}")
+                return None
+            self._set_luno_oid(order, luno_oid)
+        return order.luno_oid
+
+    def _order_executor(self) -> ThreadPoolExecutor:
+        if self._order_pool is None:
+            self._order_pool = ThreadPoolExecutor(
+                max_workers=self.order_concurrency, thread_name_prefix="luno-orders"
+            )
+        return self._order_pool
+
+    def _cancel(self, order: OrderEvent):
+        """Error of cancelling order on the broker, None if cancelled"""
+        try:
+            luno_oid = self.luno_oid(order)
+            if luno_oid is None:
+                raise ValueError(f"no exchange order id for {order.oid}")
+            self._broker.cancel_order(luno_oid)
+        except Exception as e:
+            return e
+        return None
+
+    def _replace(self, replacement: tuple) -> tuple:
+        """(cancel error, placement error), the new order is only placed once the old one is cancelled"""
+        old, new = replacement
+        error = self._cancel(old)
+        if error is not None:
+            return error, None
+        try:
+            self.place_order(new)
+        except Exception as e:
+            return None, e
+        return None, None
+
+    async def _cancel_async(self, order: OrderEvent, limit):
+        async with limit:
+            try:
+                if order.luno_oid is None:
+                    self._set_luno_oid(order, (await self._async_broker.get_order(order.oid))["order_id"])
+                await self._async_broker.cancel_order(order.luno_oid)
+            except Exception as e:
+                return e
+            return None
+
+    async def _replace_async(self, replacement: tuple, limit) -> tuple:
+        old, new = replacement
+        error = await self._cancel_async(old, limit)
+        if error is not None:
+            return error, None
+        async with limit:
+            try:
+                self._stamp_order(new)
+                self._order_placed(new, await self._send_order(self._async_broker, new))
+            except Exception as e:
+                return None, e
+            return None, None
+
+    async def _gather_cancels(self, orders: list) -> list:
+        limit = asyncio.Semaphore(self.order_concurrency)
+        return list(await asyncio.gather(*(self._cancel_async(order, limit) for order in orders)))
+
+    async def _gather_replacements(self, replacements: list) -> list:
+        limit = asyncio.Semaphore(self.order_concurrency)
+        return list(await asyncio.gather(*(self._replace_async(pair, limit) for pair in replacements)))
+
+    def cancel_orders(self, orders: list) -> list:
+        """Cancel orders on the broker, order_concurrency at a time
+
+        Runs as coroutines on the async broker's loop when there is one, on a
+        thread pool otherwise. Returns the error of each order (None if
+        cancelled), in order. Order managers and alerts are left to the caller,
+        see StrategyBase.cancel_orders.
+        """
+        if not orders:
+            return []
+        if self._async_broker is not None:
+            errors = self._async_broker.submit(self._gather_cancels(orders)).result()
+        elif len(orders) == 1:
+            errors = [self._cancel(orders[0])]
+        else:
+            errors = list(self._order_executor().map(self._cancel, orders))
+        self.untrack([order.oid for order, error in zip(orders, errors) if error is None])
+        return errors
+
+    def replace_orders(self, replacements: list) -> list:
+        """Cancel-replace [(standing order, new OrderEvent)]
+
+        Luno has no amend, so each pair is a cancel followed by the new order,
+        placed only once its old one is cancelled so the two never stand together
+        (a failed cancel, e.g. the order just filled, places nothing). Pairs run
+        concurrently as in cancel_orders.
+        Returns (cancel error, placement error) of each pair, None where it succeeded.
+        """
+        if not replacements:
+            return []
+        if self._async_broker is not None:
+            results = self._async_broker.submit(self._gather_replacements(replacements)).result()
+        elif len(replacements) == 1:
+            results = [self._replace(replacements[0])]
+        else:
+            results = list(self._order_executor().map(self._replace, replacements))
+        self.untrack([old.oid for (old, _), (error, _) in zip(replacements, results) if error is None])
+        return results
+
+    def untrack(self, oids: list):
+        """Orders closed other than through the user stream (cancels, polled fills), it stops watching them"""
+        if self.user_stream is not None and oids:
+            self.user_stream.untrack(oids)
+
     def on_new_order(self, event: OrderEvent):
         if event.sid in self.strat_dict.keys():
             self.strat_dict[event.sid].on_new_order(event)
@@ -129,13 +385,35 @@ class StrategyManager:
         else:
             print("strategy ID doesn't exist. ")
 
-    def on_order_status(self):
-        """Check all standing orders"""
+    def on_order_status(self, force: bool = False):
+        """Check all standing orders
+        Strategies get on_order_status on every check, the exchange is only polled
+        for their standing orders every order_status_interval (or when forced).
+        """
+        now = self.clock()
+        self.poll_order_status = (
+            force
+            or self._last_status_poll is None
+            or now - self._last_status_poll >= self.order_status_interval * 1000
+        )
+        if self.poll_order_status:
+            self._last_status_poll = now
+        if self.order_status_reconciler is not None and self.poll_order_status:
+            # worker strategies are reconciled in their worker
+            local = [s for s in self.strat_dict.values() if s.active and hasattr(s, "order_manager")]
+            self.order_status_reconciler.reconcile(local)
         for strat_id in self.strat_dict.keys():
             if self.strat_dict[strat_id].active == True:
                 self.strat_dict[strat_id].on_order_status()
 
     def on_fill(self, event: FillEvent):
+        if event.oid in self._filled:
+            return  # already reported by the user stream or the order status check
+        self._filled.add(event.oid)
+        self.untrack([event.oid])
+        self._filled_order.append(event.oid)
+        if len(self._filled_order) > MAX_FILLED_OIDS:
+            self._filled.discard(self._filled_order.popleft())
         if event.sid in self.strat_dict.keys():
             self.strat_dict[event.sid].on_fill(event)
             _logger.info(f"Order filled: {event}")
@@ -0,0 +1,380 @@
+"""
+Strategy worker processes
+
+StrategyWorkerPool runs strategies in worker processes so a CPU heavy
+strategy only stalls its own shard. Strategies are placed on a worker by
+strategy id or by (first) symbol.
+
+Parent process:
+    StrategyManager keeps a RemoteStrategy proxy per strategy in strat_dict,
+    so event routing is unchanged. The proxies forward ticks, trades, new
+    orders, fills and order status checks to their worker over a
+    multiprocessing Queue per worker (puts never block the event engines,
+    and a tick goes to each worker once however many of its strategies
+    trade the symbol). One service thread per worker handles what that
+    worker sends back, so a slow broker call only holds up its own shard.
+
+Worker process:
+    The strategies are rebuilt from their config and get a
+    WorkerStrategyManager, which stands in for StrategyManager: place_order,
+    cancel_orders / replace_orders (run concurrently by the parent) and
+    broker calls (get_order, cancel_order...) are forwarded to the parent
+    and wait for its reply, events (e.g. FillEvent) are put into the parent's
+    action engine, alerts and log records are sent to the parent. Only the
+    parent talks to brokers.
+"""
+import importlib
+import logging
+import multiprocessing
+import time
+from logging.handlers import QueueHandler
+from threading import Thread
+
+from src.marketdata.trade_flow import TradeFlow
+from src.orders.order_status import OrderStatusReconciler
+
+_logger = logging.getLogger("trading_system")
+
+SHARD_BY = ("strategy", "symbol")
+
+
+class RemoteStrategy:
+    """Parent-side stand-in for a strategy running in a worker"""
+
+    def __init__(self, pool, worker: int, strategy):
+        self._pool = pool
+        self.worker = worker
+        self.id = strategy.id
+        self.name = strategy.name
+        self.symbols = strategy.symbols
+        self.active = strategy.active
+        self.conflate_ticks = strategy.conflate_ticks
+
+    def on_tick(self, event):
+        self._pool.send_market(self.worker, "tick", event)
+
+    def on_trade(self, event):
+        self._pool.send_market(self.worker, "trade", event)
+
+    def on_new_order(self, event):
+        self._pool.send(self.worker, ("new_order", self.id, event))
+
+    def on_fill(self, event):
+        self._pool.send(self.worker, ("fill", self.id, event))
+
+    def on_order_status(self):
+        self._pool.send(self.worker, ("order_status", self.id, self._pool._manager.poll_order_status))
+
+
+class _Rpc:
+    """Blocking calls from a worker into the parent, answered in order"""
+
+    def __init__(self, worker: int, outbound, replies):
+        self.worker = worker
+        self._outbound = outbound
+        self._replies = replies
+        self._next_id = 0
+
+    def call(self, target: str, method: str, *args, **kwargs):
+        self._next_id += 1
+        self._outbound.put(("call", self.worker, self._next_id, target, method, args, kwargs))
+        call_id, result, error = self._replies.recv()
+        if error is not None:
+            raise error
+        return result
+
+
+class _BrokerProxy:
+    def __init__(self, rpc: _Rpc):
+        self._rpc = rpc
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            return self._rpc.call("broker", method, *args, **kwargs)
+
+        return call
+
+
+class _EventEngineProxy:
+    def __init__(self, outbound):
+        self._outbound = outbound
+
+    def put(self, event):
+        self._outbound.put(("event", event))
+
+
+class _AlertsProxy:
+    def __init__(self, outbound):
+        self._outbound = outbound
+
+    def send_telegram_message(self, message):
+        self._outbound.put(("alert", message))
+
+
+class _LogForwarder(QueueHandler):
+    def enqueue(self, record):
+        self.queue.put(("log", record))
+
+
+class WorkerStrategyManager:
+    """StrategyManager stand-in inside a worker process"""
+
+    def __init__(self, worker: int, outbound, replies, sym_tick_size_dict: dict, batch_order_status: bool = False):
+        self._rpc = _Rpc(worker, outbound, replies)
+        self._outbound = outbound
+        self._broker = _BrokerProxy(self._rpc)
+        self._event_engine = _EventEngineProxy(outbound)
+        self.order_status_reconciler = (
+            OrderStatusReconciler(self._broker, self._event_engine, on_unfilled=self.untrack)
+            if batch_order_status
+            else None
+        )
+        self._alerts = _AlertsProxy(outbound)
+        self.sym_tick_size_dict = sym_tick_size_dict
+        self.strat_dict = {}
+        self.sym_strategy_dict = {}
+        self.trade_flows = {}
+        self.poll_order_status = True  # set by the parent with every order status check
+
+    def load(self, specs: list):
+        for module, cls_name, sid, name, active, capital, symbols, params in specs:
+            strategy = getattr(importlib.import_module(module), cls_name)()
+            strategy.set_name(name)
+            strategy.id = sid
+            strategy.name = name
+            strategy.active = active
+            strategy.set_capital(capital)
+            strategy.set_symbols(symbols)
+            strategy.set_params(params)
+            self.strat_dict[sid] = strategy
+            for sym in symbols:
+                self.sym_strategy_dict.setdefault(sym, []).append(sid)
+            strategy.on_init(self)
+
+    def place_order(self, event, check_risk=False):
+        placed = self._rpc.call("pool", "place_order", event, check_risk)
+        for field, value in zip(event._fields, placed.to_tuple()):
+            setattr(event, field, value)
+
+    def cancel_orders(self, orders: list) -> list:
+        errors, luno_oids = self._rpc.call("pool", "cancel_orders", orders)
+        for order, luno_oid in zip(orders, luno_oids):
+            order.luno_oid = luno_oid
+        return errors
+
+    def replace_orders(self, replacements: list) -> list:
+        results, placed = self._rpc.call("pool", "replace_orders", replacements)
+        for (_, new), event in zip(replacements, placed):
+            for field, value in zip(new._fields, event.to_tuple()):
+                setattr(new, field, value)
+        return results
+
+    def clock(self) -> float:
+        return time.time() * 1000  # ms, as StrategyManager.clock
+
+    def untrack(self, oids: list):
+        self._outbound.put(("untrack", oids))
+
+    def luno_oid(self, order) -> str:
+        if order.luno_oid is None:
+            order.luno_oid = self._broker.get_order(order.oid)["order_id"]
+        return order.luno_oid
+
+    def on_tick(self, event):
+        for sid in self.sym_strategy_dict.get(event.code, ()):
+            if self.strat_dict[sid].active:
+                self.strat_dict[sid].on_tick(event)
+
+    def on_trade(self, event):
+        flow = self.trade_flows.get(event.code)
+        if flow is None:
+            flow = self.trade_flows[event.code] = TradeFlow()
+        flow.on_trade(event)
+        for sid in self.sym_strategy_dict.get(event.code, ()):
+            if self.strat_dict[sid].active:
+                self.strat_dict[sid].on_trade(event)
+
+    def handle(self, msg):
+        kind = msg[0]
+        if kind == "tick":
+            self.on_tick(msg[1])
+        elif kind == "trade":
+            self.on_trade(msg[1])
+        elif kind == "new_order":
+            self.strat_dict[msg[1]].on_new_order(msg[2])
+        elif kind == "fill":
+            self.strat_dict[msg[1]].on_fill(msg[2])
+        elif kind == "order_status":
+            strategy = self.strat_dict[msg[1]]
+            if strategy.active:
+                self.poll_order_status = msg[2]
+                if self.order_status_reconciler is not None and self.poll_order_status:
+                    self.order_status_reconciler.reconcile([strategy])
+                strategy.on_order_status()
+
+
+def _worker_main(
+    worker: int, specs: list, inbound, outbound, replies, sym_tick_size_dict: dict, batch_order_status: bool
+):
+    logger = logging.getLogger("trading_system")
+    logger.handlers = [_LogForwarder(outbound)]  # the parent's handlers write them out
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    manager = WorkerStrategyManager(worker, outbound, replies, sym_tick_size_dict, batch_order_status)
+    manager.load(specs)
+    while True:
+        msg = inbound.get()
+        if msg is None:
+            break
+        try:
+            manager.handle(msg)
+        except Exception as e:
+            _logger.error(f"Strategy worker {worker} exception on {msg[0]}: {e}")
+
+
+class StrategyWorkerPool:
+    def __init__(self, strategy_manager, n_workers: int, shard_by: str = "strategy"):
+        """
+        Args:
+            strategy_manager (StrategyManager): parent manager, owns the broker and engines
+            n_workers (int): worker processes
+            shard_by (str, optional): "strategy" (by id) or "symbol" (by first symbol).
+        """
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"shard_by must be one of {SHARD_BY}")
+        self._manager = strategy_manager
+        self.n_workers = n_workers
+        self.shard_by = shard_by
+        self._ctx = multiprocessing.get_context("spawn")  # engine threads are running, do not fork
+        self._specs = [[] for _ in range(n_workers)]
+        self._inbound = [self._ctx.Queue() for _ in range(n_workers)]
+        self._outbound = [self._ctx.Queue() for _ in range(n_workers)]
+        self._replies = [self._ctx.Pipe(duplex=False) for _ in range(n_workers)]  # (recv, send)
+        self._last_market = [None] * n_workers
+        self._symbol_worker = {}  # symbol -> worker, round robin in order of appearance
+        self._processes = []
+        self._threads = []
+
+    def shard(self, strategy) -> int:
+        if self.shard_by == "symbol" and strategy.symbols:
+            sym = strategy.symbols[0]
+            if sym not in self._symbol_worker:
+                self._symbol_worker[sym] = len(self._symbol_worker) % self.n_workers
+            return self._symbol_worker[sym]
+        return (strategy.id - 1) % self.n_workers
+
+    def add(self, strategy, params: dict = None) -> RemoteStrategy:
+        """Schedule a configured strategy on a worker, returns its parent-side proxy"""
+        worker = self.shard(strategy)
+        cls = type(strategy)
+        self._specs[worker].append(
+            (
+                cls.__module__,
+                cls.__name__,
+                strategy.id,
+                strategy.name,
+                strategy.active,
+                getattr(strategy, "capital", 0),
+                strategy.symbols,
+                params,
+            )
+        )
+        return RemoteStrategy(self, worker, strategy)
+
+    def start(self):
+        for worker, specs in enumerate(self._specs):
+            if not specs:
+                continue
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(
+                    worker,
+                    specs,
+                    self._inbound[worker],
+                    self._outbound[worker],
+                    self._replies[worker][0],
+                    self._manager.sym_tick_size_dict,
+                    self._manager.order_status_reconciler is not None,
+                ),
+                name=f"strategy-worker-{worker}",
+                daemon=True,
+            )
+            process.start()
+            self._processes.append(process)
+            thread = Thread(target=self._serve, args=(worker,), name=f"strategy-worker-service-{worker}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        _logger.info(
+            f"Started {len(self._processes)} strategy workers: "
+            f"{ {w: [s[3] for s in specs] for w, specs in enumerate(self._specs) if specs} }"
+        )
+
+    def stop(self):
+        for q in self._inbound:
+            q.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        for q in self._outbound:
+            q.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def send(self, worker: int, msg):
+        self._inbound[worker].put(msg)
+
+    def send_market(self, worker: int, kind: str, event):
+        """Send market data once per worker, even if several of its strategies want it"""
+        if self._last_market[worker] is event:
+            return
+        self._last_market[worker] = event
+        self._inbound[worker].put((kind, event))
+
+    def place_order(self, event, check_risk=False):
+        self._manager.place_order(event, check_risk=check_risk)
+        return event
+
+    @staticmethod
+    def _picklable(error):
+        return None if error is None else RuntimeError(str(error))  # broker exceptions may not unpickle
+
+    def cancel_orders(self, orders: list):
+        """(errors, exchange order ids) of the worker's copies of orders"""
+        errors = self._manager.cancel_orders(orders)
+        return [self._picklable(e) for e in errors], [order.luno_oid for order in orders]
+
+    def replace_orders(self, replacements: list):
+        """(results, new orders as placed)"""
+        results = self._manager.replace_orders(replacements)
+        return [(self._picklable(c), self._picklable(p)) for c, p in results], [new for _, new in replacements]
+
+    def _serve(self, worker: int):
+        """Handle what a worker sends back, on its own thread of the parent"""
+        while True:
+            msg = self._outbound[worker].get()
+            if msg is None:
+                break
+            kind = msg[0]
+            try:
+                if kind == "call":
+                    self._call(*msg[1:])
+                elif kind == "event":
+                    self._manager._event_engine.put(msg[1])
+                elif kind == "alert":
+                    self._manager._alerts.send_telegram_message(msg[1])
+                elif kind == "untrack":
+                    self._manager.untrack(msg[1])
+                elif kind == "log":
+                    _logger.handle(msg[1])
+            except Exception as e:
+                _logger.error(f"Strategy worker {worker} request {kind} failed: {e}")
+
+    def _call(self, worker, call_id, target, method, args, kwargs):
+        obj = self._manager._broker if target == "broker" else self
+        try:
+            result, error = getattr(obj, method)(*args, **kwargs), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            self._replies[worker][1].send((call_id, result, error))
+        except Exception as e:  # unpicklable result or exception
+            self._replies[worker][1].send((call_id, None, RuntimeError(f"{method} failed: {e}")))
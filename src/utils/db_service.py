@@ -1,6 +1,38 @@
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 
+from src.utils import metrics
+
+WRITE_METHODS = {
+    "insert_one", "insert_many", "update_one", "update_many",
+    "replace_one", "delete_one", "delete_many", "bulk_write",
+}
+WRITE_SECONDS = metrics.histogram(
+    "cts_mongo_write_seconds", "Mongo write time", ("collection", "operation")
+)
+WRITE_ERRORS = metrics.counter(
+    "cts_mongo_write_errors_total", "Mongo writes that raised", ("collection", "operation")
+)
+
+
+class TimedDatabase:
+    """Database whose collections time their writes, see src/utils/metrics.py"""
+
+    def __init__(self, db):
+        self.db = db
+        self._collections = {}
+
+    def __getitem__(self, name):
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = metrics.instrument(
+                self.db[name], WRITE_SECONDS, WRITE_ERRORS, (name,), WRITE_METHODS
+            )
+        return collection
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
 
 class DBService:
     def __init__(self, auth_config, logger):
@@ -29,7 +61,7 @@ class DBService:
         
         
     def get_database(self, db_name):
-        self.db = self.client[db_name]
+        self.db = TimedDatabase(self.client[db_name])
         return self.db
     
     def disconnect(self):
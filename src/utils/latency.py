@@ -0,0 +1,217 @@
+"""
+Tick-to-trade latency tracing
+
+With tracing enabled (enable(), or TradingSystem(trace_latency=True)), ticks
+and orders carry a trace: a list of (stage, time.monotonic_ns()) stamps added
+along the order path
+
+    ticker_request, ticker_response    TradeClient.get_ticker REST round trip
+    book_update / bus_read             streamed tick published / read off the bus
+    tick.put                           EventEngine.put
+    tick.handler_start, .handler_end   tick handlers (strategies) running
+    place_order                        StrategyManager.place_order, before the REST call
+    broker_ack                         place order call returned
+    order.put, order.handler_start, order.handler_end
+
+An order placed from a tick handler starts with a copy of that tick's trace.
+When an event's handlers finish, the time between consecutive stamps is
+recorded in a histogram per interval ("tick.put->tick.handler_start" is
+queueing), symbol and strategy, plus "tick_to_trade" (first stamp to
+broker_ack) for orders. snapshot() returns percentiles, run() dumps them
+periodically.
+
+Without tracing, `tracer` is None and events carry no trace.
+"""
+import asyncio
+import json
+import logging
+import pathlib
+import threading
+import time
+
+_logger = logging.getLogger("trading_system")
+
+tracer = None  # the active LatencyTracer, None when tracing is off
+
+ALL = "*"  # strategy label of tick traces, which are not tied to one strategy
+
+
+class LatencyHistogram:
+    """Log-linear histogram of ns durations, 8 buckets per power of 2 (about 6% resolution)"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def _bucket(ns: int) -> int:
+        shift = max(ns.bit_length() - 4, 0)
+        return (shift << 3) + (ns >> shift)
+
+    @staticmethod
+    def _bucket_value(index: int) -> float:
+        """Midpoint of a bucket in ns"""
+        if index < 16:
+            return float(index)
+        shift = (index >> 3) - 1
+        mantissa = index - (shift << 3)
+        return ((mantissa << shift) + ((mantissa + 1) << shift)) / 2
+
+    def record(self, ns: int):
+        if ns < 0:
+            ns = 0
+        index = self._bucket(ns)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += ns
+        if self.min is None or ns < self.min:
+            self.min = ns
+        if self.max is None or ns > self.max:
+            self.max = ns
+
+    def percentile(self, q: float) -> float:
+        """Approximate q quantile (0-1) in ns, None when empty"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return float(self.max)
+
+    def summary(self) -> dict:
+        """count and mean/p50/p90/p99/max in us"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000,
+            "p50_us": self.percentile(0.5) / 1000,
+            "p90_us": self.percentile(0.9) / 1000,
+            "p99_us": self.percentile(0.99) / 1000,
+            "max_us": self.max / 1000,
+        }
+
+
+class LatencyTracer:
+    def __init__(self, dump_interval: float = 60, dump_path: str = None):
+        """
+        Args:
+            dump_interval (float, optional): seconds between dumps in run(). Defaults to 60.
+            dump_path (str, optional): json file the snapshot is written to on every dump,
+                the snapshot is logged otherwise.
+        """
+        self.dump_interval = dump_interval
+        self.dump_path = pathlib.Path(dump_path) if dump_path is not None else None
+        self.strategy_names = {}  # sid -> name, for order traces
+        self._histograms = {}  # (interval, symbol, strategy) -> LatencyHistogram
+        self._lock = threading.Lock()  # traces finish on engine threads and the loop
+
+    def record(self, interval: str, symbol: str, strategy: str, ns: int):
+        key = (interval, symbol, strategy)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.record(ns)
+
+    def finish(self, event):
+        """Record the intervals of a traced event whose handlers are done"""
+        trace = event.trace
+        if not trace:
+            return
+        sid = getattr(event, "sid", None)
+        symbol = event.sym  # the pair, orders do not carry the exchange
+        strategy = ALL if sid is None else str(self.strategy_names.get(sid, sid))
+        for (stage, start), (next_stage, end) in zip(trace, trace[1:]):
+            self.record(f"{stage}->{next_stage}", symbol, strategy, end - start)
+        if sid is not None:
+            for stage, ns in trace:
+                if stage == "broker_ack":
+                    self.record("tick_to_trade", symbol, strategy, ns - trace[0][1])
+                    break
+
+    def snapshot(self) -> dict:
+        """{interval: {symbol: {strategy: summary}}}, see LatencyHistogram.summary"""
+        with self._lock:
+            items = [(k, h.summary()) for k, h in self._histograms.items()]
+        snapshot = {}
+        for (interval, symbol, strategy), summary in sorted(items):
+            snapshot.setdefault(interval, {}).setdefault(symbol, {})[strategy] = summary
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def dump(self):
+        snapshot = self.snapshot()
+        if self.dump_path is not None:
+            self.dump_path.parent.mkdir(parents=True, exist_ok=True)
+            self.dump_path.write_text(json.dumps(snapshot, indent=2))
+        else:
+            _logger.info(f"Latency: {json.dumps(snapshot)}")
+
+    async def run(self):
+        """Dump every dump_interval"""
+        while True:
+            await asyncio.sleep(self.dump_interval)
+            try:
+                self.dump()
+            except Exception as e:
+                _logger.error(f"Latency dump failed: {e}")
+
+
+def enable(dump_interval: float = 60, dump_path: str = None) -> LatencyTracer:
+    """Turn tracing on, returns the tracer"""
+    global tracer
+    tracer = LatencyTracer(dump_interval=dump_interval, dump_path=dump_path)
+    return tracer
+
+
+def disable():
+    global tracer
+    tracer = None
+
+
+def put(event):
+    """EventEngine.put stamp, e.g. tick.put"""
+    trace = getattr(event, "trace", None)
+    if trace is not None:
+        trace.append((f"{event.type.name.lower()}.put", time.monotonic_ns()))
+
+
+def handlers_started(events):
+    now = time.monotonic_ns()
+    for event in events:
+        trace = getattr(event, "trace", None)
+        if trace is not None:
+            trace.append((f"{event.type.name.lower()}.handler_start", now))
+
+
+def handlers_done(events):
+    """Stamp the end of the handlers and record the finished traces"""
+    now = time.monotonic_ns()
+    for event in events:
+        trace = getattr(event, "trace", None)
+        if trace is not None:
+            trace.append((f"{event.type.name.lower()}.handler_end", now))
+            if tracer is not None:
+                tracer.finish(event)
+
+
+def start_trace(event, stage: str, ns: int = None):
+    """Start the trace of a new event if tracing is on"""
+    if tracer is not None:
+        event.trace = [(stage, ns if ns is not None else time.monotonic_ns())]
+
+
+def stamp(event, stage: str, ns: int = None):
+    trace = getattr(event, "trace", None)
+    if trace is not None:
+        trace.append((stage, ns if ns is not None else time.monotonic_ns()))
@@ -0,0 +1,376 @@
+"""
+In-process metrics
+
+A small Prometheus style registry of counters, gauges and histograms, with
+optional labels, served in the Prometheus text format on a local HTTP
+endpoint (enable(), or TradingSystem(metrics_port=...)):
+
+    curl http://127.0.0.1:9108/metrics
+
+Metrics are declared once at import by the modules that update them:
+
+    cts_event_queue_depth{engine,lane}             events waiting, read on scrape
+    cts_event_dropped_total{engine,lane}           dropped by bounded PriorityLaneQueue lanes
+    cts_event_dispatch_seconds{engine,type}        handler time per event
+    cts_rest_request_seconds{exchange,method}      TradeClient REST calls
+    cts_rest_errors_total{exchange,method}
+    cts_mongo_write_seconds{collection,operation}  DBService writes
+    cts_mongo_write_errors_total{collection,operation}
+    cts_strategy_on_tick_seconds{strategy}         StrategyManager.on_tick per strategy
+    cts_heartbeat_work_seconds                     TradingSystem.run loop body
+    cts_heartbeat_slip_seconds                     last loop start past its heartbeat
+
+REST and Mongo calls are always timed (the call dwarfs the cost). The per
+event metrics (dispatch and on_tick times) are only recorded while `enabled`.
+"""
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_logger = logging.getLogger("trading_system")
+
+enabled = False  # record per event metrics, set by enable()
+
+DEFAULT_PORT = 9108
+# seconds, from event handlers (us) to REST calls (s)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, count: int = 1):
+        """Record value, count times (e.g. the mean handler time of a batch)"""
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += count
+            self.sum += value * count
+            self.count += count
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Metric:
+    """A named metric with one child per combination of label values"""
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), function=None):
+        """
+        Args:
+            name (str): metric name
+            documentation (str): HELP text
+            labelnames (tuple, optional): label names, children are made by labels()
+            function (callable, optional): returns {label values tuple: value} on every
+                scrape instead of the metric being updated
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        return _Value()
+
+    def labels(self, *values):
+        """Child for these label values (in labelnames order), created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self):
+        """(suffix, labels dict, value) of every child"""
+        if self.function is not None:
+            items = self.function().items()
+        else:
+            with self._lock:
+                items = [(k, c.value) for k, c in self._children.items() if all(type(v) is str for v in k)]
+        for values, value in items:
+            yield "", dict(zip(self.labelnames, values)), value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self._samples():
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            name = self.name + suffix
+            if label_text:
+                name += "{" + label_text + "}"
+            lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float, count: int = 1):
+        self.labels().observe(value, count)
+
+    def time(self):
+        """Context manager observing the seconds spent in it"""
+        return self.labels().time()
+
+    def _samples(self):
+        with self._lock:
+            children = [(k, c) for k, c in self._children.items() if all(type(v) is str for v in k)]
+        bounds = [_format_value(float(b)) for b in self.buckets] + ["+Inf"]
+        for values, child in children:
+            labels = dict(zip(self.labelnames, values))
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                yield "_bucket", {**labels, "le": bound}, cumulative
+            yield "_sum", labels, total
+            yield "_count", labels, count
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric, or return the one already registered under its name"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def get(self, name: str) -> Metric:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                _logger.error(f"Metric {metric.name} failed to render: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames=(), function=None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames, function))
+
+
+def gauge(name: str, documentation: str, labelnames=(), function=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+class _Instrumented:
+    """Proxy timing every public method call of an object, see instrument()"""
+
+    def __init__(self, target, seconds: Histogram, errors: Counter, labels: tuple, methods):
+        self._target = target
+        self._seconds = seconds
+        self._errors = errors
+        self._labels = labels
+        self._methods = methods
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        if self._methods is not None and name not in self._methods:
+            return attr
+        seconds = self._seconds.labels(*self._labels, name)
+        errors = self._errors.labels(*self._labels, name)
+
+        if inspect.iscoroutinefunction(attr):
+
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await attr(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    seconds.observe(time.perf_counter() - start)
+
+        else:
+
+            def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return attr(*args, **kwargs)
+                except Exception:
+                    errors.inc()
+                    raise
+                finally:
+                    seconds.observe(time.perf_counter() - start)
+
+        self.__dict__[name] = timed  # later lookups skip __getattr__
+        return timed
+
+
+def instrument(target, seconds: Histogram, errors: Counter, labels=(), methods=None):
+    """Wrap an API client so each method call (or coroutine) is timed and its exceptions counted
+
+    Args:
+        target: object whose methods are wrapped
+        seconds (Histogram): labelled by `labels` followed by the method name
+        errors (Counter): same labels as seconds
+        labels (tuple, optional): leading label values, e.g. ("luno",)
+        methods (set, optional): only these methods, all public ones otherwise
+    """
+    return _Instrumented(target, seconds, errors, tuple(labels), methods)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY):
+        """
+        Args:
+            port (int, optional): Defaults to 9108, 0 picks a free port.
+            host (str, optional): Defaults to 127.0.0.1 (local scrapers only).
+            registry (MetricsRegistry, optional): Defaults to the module registry.
+        """
+        handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        _logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def enable(port: int = DEFAULT_PORT, host: str = "127.0.0.1") -> MetricsServer:
+    """Record per event metrics and serve the registry, returns the server"""
+    global enabled
+    enabled = True
+    return MetricsServer(port=port, host=host)
+
+
+def disable():
+    global enabled
+    enabled = False
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from luno_python.error import APIError
+
+from src.brokerage.luno.AsyncTradeClient import AsyncTradeClient
+from src.brokerage.luno.async_client import AsyncLunoClient
+from src.events import OrderDir, OrderEvent, OrderType
+from src.strategies.strategy_manager import StrategyManager
+
+
+def reply(body, status=200, close=False):
+    data = json.dumps(body).encode()
+    head = f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+    if close:
+        head += "Connection: close\r\n"
+    return head.encode() + b"\r\n" + data
+
+
+def chunked(body, sizes):
+    data = json.dumps(body).encode()
+    out = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nTransfer-Encoding: chunked\r\n\r\n"
+    for size in sizes:
+        piece, data = data[:size], data[size:]
+        out += b"%x;ext=1\r\n%s\r\n" % (len(piece), piece)
+    assert not data
+    return out + b"0\r\nX-Trailer: 1\r\n\r\n"
+
+
+class LocalServer:
+    """HTTP/1.1 server answering each request with handler(request line), on its own loop thread
+
+    handler returns the response bytes, None to drop the connection without a
+    response, or ("hang",) to never answer.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+        self.requests = []
+        self.writers = []
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        threading.Thread(target=self._run, args=(ready,), daemon=True).start()
+        ready.wait()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        server = self._loop.run_until_complete(asyncio.start_server(self._serve, "127.0.0.1", 0))
+        self.port = server.sockets[0].getsockname()[1]
+        ready.set()
+        self._loop.run_forever()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        self.writers.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                line = head.split(b"\r\n")[0].decode()
+                self.requests.append(line)
+                response = self.handler(line)
+                if response == ("hang",):
+                    await asyncio.sleep(3600)
+                if response is None:
+                    break
+                writer.write(response)
+                await writer.drain()
+                if b"Connection: close" in response:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+    def drop_idle(self):
+        """Close every connection from the server side, as an idle timeout would"""
+        asyncio.run_coroutine_threadsafe(self._drop(), self._loop).result()
+
+    async def _drop(self):
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
+        await asyncio.sleep(0.05)
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(server, **kwargs):
+        client = AsyncLunoClient("id", "secret", base_url=server.base_url, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_chunked_response(make_client):
+    body = {"pair": "XBTMYR", "bid": "100", "ask": "101", "timestamp": 1}
+    server = LocalServer(lambda line: chunked(body, [5, 17, 100]))
+    client = make_client(server).blocking()
+    assert client.get_ticker(pair="XBTMYR") == body
+    # the connection is still usable after the trailers
+    assert client.get_ticker(pair="XBTMYR") == body
+    assert server.connections == 1
+
+
+def test_keep_alive_reuses_one_connection(make_client):
+    server = LocalServer(lambda line: reply({"order_id": "BX1"}))
+    client = make_client(server)
+    blocking = client.blocking()
+    for _ in range(5):
+        assert blocking.post_limit_order(pair="XBTMYR", price=1, type="BID", volume=1) == {"order_id": "BX1"}
+    assert server.connections == 1
+    assert client.connections == 1
+    assert client.requests == 5
+    assert server.requests[0].startswith("POST /api/1/postorder?pair=XBTMYR&price=1&type=BID&volume=1 ")
+
+
+def test_connection_close_is_not_reused(make_client):
+    server = LocalServer(lambda line: reply({"ok": True}, close=True))
+    blocking = make_client(server).blocking()
+    blocking.get_ticker(pair="XBTMYR")
+    blocking.get_ticker(pair="XBTMYR")
+    assert server.connections == 2
+
+
+def test_retries_once_when_the_server_closed_an_idle_connection(make_client):
+    server = LocalServer(lambda line: reply({"order_id": "BX1"}))
+    client = make_client(server)
+    blocking = client.blocking()
+    blocking.get_order_v3(client_order_id="c1")
+    server.drop_idle()
+    assert blocking.get_order_v3(client_order_id="c1") == {"order_id": "BX1"}
+    assert client.connections == 2
+    assert len(server.requests) == 2  # the stale connection got nothing
+
+
+def test_no_retry_on_a_new_connection(make_client):
+    server = LocalServer(lambda line: None)  # drops every request
+    blocking = make_client(server).blocking()
+    with pytest.raises((asyncio.IncompleteReadError, ConnectionError)):
+        blocking.stop_order(order_id="BX1")
+    assert server.connections == 1
+
+
+def test_api_error_payload_raises_api_error(make_client):
+    server = LocalServer(lambda line: reply({"error": "order not found", "error_code": "ErrOrderNotFound"}, 404))
+    blocking = make_client(server).blocking()
+    with pytest.raises(APIError):
+        blocking.stop_order(order_id="BX1")
+
+
+def test_per_method_timeout(make_client):
+    server = LocalServer(lambda line: ("hang",))
+    blocking = make_client(server, timeouts={"stop_order": 0.2}).blocking()
+    with pytest.raises(asyncio.TimeoutError):
+        blocking.stop_order(order_id="BX1")
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+def order(oid, luno_oid):
+    event = OrderEvent(1, "XBTMYR", OrderType.LMT, OrderDir.BID, 0.001, 100)
+    event.oid, event.luno_oid = oid, luno_oid
+    return event
+
+
+def test_strategy_manager_cancels_and_replaces_on_the_async_broker(make_client):
+    def handler(line):
+        if "stoporder" in line:
+            if "order_id=BAD" in line:
+                return reply({"error": "order not found", "error_code": "ErrOrderNotFound"}, 404)
+            return reply({"success": True})
+        if "exchange/3/order" in line:
+            return reply({"order_id": "LOOKED-UP"})
+        return reply({"order_id": "NEW"})
+
+    server = LocalServer(handler)
+    client = make_client(server, pool_size=4)
+    engine = FakeEngine()
+    manager = StrategyManager(
+        engine, None, {"min_tick_size": {}, "strategy": {}}, {}, None, None,
+        async_broker=AsyncTradeClient(engine, client),
+    )
+    manager._sid_oid_dict[1] = []
+    orders = [order("c1", "B1"), order("c2", "BAD"), order("c3", None)]
+    errors = manager.cancel_orders(orders)
+    assert errors[0] is None and errors[2] is None
+    assert isinstance(errors[1], APIError)
+    assert orders[2].luno_oid == "LOOKED-UP"
+
+    new = [order(None, None), order(None, None)]
+    results = manager.replace_orders([(orders[0], new[0]), (orders[1], new[1])])
+    assert results[0] == (None, None)
+    assert isinstance(results[1][0], APIError) and results[1][1] is None
+    assert new[0].luno_oid == "NEW" and engine.events == [new[0]]
+    assert new[1].oid is None  # never placed
+    assert client.connections <= 4
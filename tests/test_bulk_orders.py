@@ -0,0 +1,178 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from src.events import OrderDir, OrderEvent, OrderType
+from src.strategies.market_making_strategy import marketMaking
+from src.strategies.strategy_base import StrategyBase
+from src.strategies.strategy_manager import StrategyManager
+
+STRAT_CONFIG = {
+    "min_tick_size": {},
+    "strategy": {"quoter": {"params": None, "active": True, "capital": 100000, "instruments": ["ETHMYR.luno"]}},
+}
+
+
+class FakeBroker:
+    """Cancels fail for the exchange ids in fail_cancel, placements for prices in fail_place"""
+
+    def __init__(self, fail_cancel=(), fail_place=()):
+        self.fail_cancel = set(fail_cancel)
+        self.fail_place = set(fail_place)
+        self.cancelled = []
+        self.placed = []
+        self._lock = threading.Lock()
+
+    def cancel_order(self, luno_oid):
+        if luno_oid in self.fail_cancel:
+            raise RuntimeError("order not found")
+        with self._lock:
+            self.cancelled.append(luno_oid)
+
+    def get_order(self, oid):
+        return {"status": "PENDING"}
+
+    def place_limit_order(self, pair, price, type, volume, client_order_id, **kwargs):
+        if price in self.fail_place:
+            raise RuntimeError("insufficient balance")
+        with self._lock:
+            self.placed.append(price)
+        return {"order_id": f"L-{client_order_id}"}
+
+
+class FakeAsyncBroker:
+    """AsyncTradeClient stand-in, coroutines run to completion on submit"""
+
+    def __init__(self, broker):
+        self._broker = broker
+
+    def submit(self, coro):
+        future = Future()
+        future.set_result(asyncio.run(coro))
+        return future
+
+    async def cancel_order(self, luno_oid):
+        self._broker.cancel_order(luno_oid)
+
+    async def place_limit_order(self, **kwargs):
+        return self._broker.place_limit_order(**kwargs)
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class FakeAlerts:
+    def __init__(self):
+        self.messages = []
+
+    def send_telegram_message(self, message):
+        self.messages.append(message)
+
+
+class Quoter(StrategyBase):
+    def on_tick(self, event):
+        super().on_tick(event)
+
+
+def setup(broker, strategy=None, async_broker=False, clock=None):
+    strategy = strategy or Quoter()
+    alerts = FakeAlerts()
+    manager = StrategyManager(
+        event_engine=FakeEngine(),
+        primary_broker=broker,
+        strat_config=STRAT_CONFIG,
+        instrument_list={"quoter": ["ETHMYR.luno"]},
+        alerts_system=alerts,
+        database=None,
+        async_broker=FakeAsyncBroker(broker) if async_broker else None,
+        clock=clock,
+    )
+    manager.load_strategy(strat_dict={"quoter": strategy})
+    return strategy, alerts
+
+
+def standing(strategy, oid, direction=OrderDir.BID, price=9000):
+    order = OrderEvent(strategy.id, "ETHMYR", OrderType.LMT, direction, 0.1, price)
+    order.oid, order.luno_oid, order.order_time = oid, f"L-{oid}", 0
+    strategy.order_manager.on_new_order(order)
+    return order
+
+
+def new(strategy, price):
+    return OrderEvent(strategy.id, "ETHMYR", OrderType.LMT, OrderDir.BID, 0.1, price)
+
+
+def check_partial_cancel(async_broker):
+    broker = FakeBroker(fail_cancel={"L-b"})
+    strategy, alerts = setup(broker, async_broker=async_broker)
+    orders = [standing(strategy, oid) for oid in "abcd"]
+    cancelled = strategy.cancel_orders(orders)
+    assert [o.oid for o in cancelled] == ["a", "c", "d"]
+    assert list(strategy.order_manager.standing_orders) == ["b"]  # failed cancel stays standing
+    assert {o.oid for o in strategy.order_manager.canceled_order_set} == {"a", "c", "d"}
+    assert len(alerts.messages) == 1  # one alert for the batch
+    assert alerts.messages[0].count("Canceling order") == 3 and "Cancel failed" in alerts.messages[0]
+
+
+def test_bulk_cancel_keeps_orders_whose_cancel_failed():
+    check_partial_cancel(async_broker=False)
+
+
+def test_bulk_cancel_keeps_orders_whose_cancel_failed_async():
+    check_partial_cancel(async_broker=True)
+
+
+def check_partial_replace(async_broker):
+    broker = FakeBroker(fail_cancel={"L-b"}, fail_place={103})
+    strategy, alerts = setup(broker, async_broker=async_broker)
+    olds = [standing(strategy, oid) for oid in "abc"]
+    results = strategy.replace_orders([(old, new(strategy, 101 + i)) for i, old in enumerate(olds)])
+    assert results == [True, False, False]
+    assert sorted(broker.cancelled) == ["L-a", "L-c"]
+    assert broker.placed == [101]  # nothing placed where the cancel failed
+    assert list(strategy.order_manager.standing_orders) == ["b"]
+    assert any("Replacement order not placed" in m for m in alerts.messages)
+
+
+def test_bulk_replace_places_only_where_the_cancel_went_through():
+    check_partial_replace(async_broker=False)
+
+
+def test_bulk_replace_places_only_where_the_cancel_went_through_async():
+    check_partial_replace(async_broker=True)
+
+
+def test_market_making_cancels_by_client_order_id():
+    broker = FakeBroker(fail_cancel={"L-b2"})
+    strategy, _ = setup(broker, strategy=marketMaking())
+    for oid in ("b1", "b2"):
+        standing(strategy, oid, OrderDir.BID)
+    standing(strategy, "a1", OrderDir.ASK)
+    strategy.bid_counter, strategy.ask_counter = 2, 1
+    strategy.cancel_bids(["b1", "b2", "gone"])  # "gone" already filled or cancelled
+    strategy.cancel_asks(["a1"])
+    assert sorted(broker.cancelled) == ["L-a1", "L-b1"]
+    assert (strategy.bid_counter, strategy.ask_counter) == (1, 0)
+    assert list(strategy.order_manager.standing_orders) == ["b2"]
+
+
+def test_market_making_cancels_orders_older_than_order_refresh_time():
+    broker = FakeBroker()
+    now = {"ms": 0.0}
+    strategy, _ = setup(broker, strategy=marketMaking(), clock=lambda: now["ms"])
+    strategy.order_refresh_time = 60  # seconds
+    standing(strategy, "b1", OrderDir.BID)  # placed at 0 ms
+    standing(strategy, "a1", OrderDir.ASK)
+    strategy.bid_counter, strategy.ask_counter = 1, 1
+    now["ms"] = 30_000.0
+    strategy.on_order_status()
+    assert broker.cancelled == []
+    now["ms"] = 61_000.0
+    strategy.on_order_status()
+    assert sorted(broker.cancelled) == ["L-a1", "L-b1"]
+    assert (strategy.bid_counter, strategy.ask_counter) == (0, 0)
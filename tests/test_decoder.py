@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from src.orderbook.decoder import DECODERS, get_decoder
+
+# frames in the format of wss://ws.luno.com/api/1/stream/XBTMYR, fields the book does not use included
+FRAMES = [
+    '{"sequence":"5860891","trade_updates":null,"create_update":{"order_id":"BXA1","type":"BID",'
+    '"price":"451030.00","volume":"0.0021"},"delete_update":null,"status_update":null,"timestamp":1700000000123}',
+    '{"sequence":"5860892","trade_updates":null,"create_update":null,"delete_update":{"order_id":"BXA1"},'
+    '"status_update":null,"timestamp":1700000000130}',
+    '{"sequence":"5860893","trade_updates":[{"sequence":1,"base":"0.0005","counter":"225.5","maker_order_id":"BXB2",'
+    '"taker_order_id":"BXC3","order_id":"BXB2"},{"sequence":2,"base":"0.001","counter":"451.1",'
+    '"maker_order_id":"BXB4","taker_order_id":"BXC3","order_id":"BXB4"}],"create_update":null,'
+    '"delete_update":null,"status_update":null,"timestamp":1700000000141}',
+]
+
+SNAPSHOT = (
+    '{"sequence":"5860890","asks":[{"id":"BXA9","price":"451100.00","volume":"0.01"}],'
+    '"bids":[{"id":"BXB2","price":"451000.00","volume":"0.0005"}],"status":"ACTIVE","timestamp":1700000000000}'
+)
+
+
+def as_tuple(update):
+    """Plain values of a StreamUpdate, whichever classes the decoder built it from"""
+    create, delete, trades = update.create_update, update.delete_update, update.trade_updates
+    return (
+        update.sequence,
+        update.timestamp,
+        create and (create.order_id, create.type, create.price, create.volume),
+        delete and delete.order_id,
+        trades and [(t.base, t.counter, t.maker_order_id, t.taker_order_id) for t in trades],
+    )
+
+
+def decoder(name):
+    if name not in DECODERS:
+        pytest.skip(f"{name} not installed")
+    return get_decoder(name)
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_decoders_give_the_same_updates(name):
+    expected = [
+        ("5860891", 1700000000123, ("BXA1", "BID", "451030.00", "0.0021"), None, None),
+        ("5860892", 1700000000130, None, "BXA1", None),
+        (
+            "5860893",
+            1700000000141,
+            None,
+            None,
+            [("0.0005", "225.5", "BXB2", "BXC3"), ("0.001", "451.1", "BXB4", "BXC3")],
+        ),
+    ]
+    d = decoder(name)
+    assert [as_tuple(d.decode_update(frame)) for frame in FRAMES] == expected
+    assert [as_tuple(d.decode_update(frame.encode())) for frame in FRAMES] == expected  # bytes frames
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgspec"])
+def test_decoders_load_snapshots_as_dicts(name):
+    assert decoder(name).loads(SNAPSHOT) == json.loads(SNAPSHOT)
+
+
+def test_default_is_the_fastest_installed_and_unknown_names_fail():
+    fastest = next(name for name in ("msgspec", "orjson", "json") if name in DECODERS)
+    assert get_decoder().name == fastest
+    with pytest.raises(ValueError):
+        get_decoder("simdjson")
@@ -0,0 +1,38 @@
+from src.event_journal import EventJournal, read_journal
+from src.events import Exchange, FillEvent, OrderDir, OrderEvent, OrderType, TickEvent
+
+
+def events():
+    order = OrderEvent(1, "ETHMYR", OrderType.LMT, OrderDir.BID, 0.5, 9000.0)
+    order.oid, order.luno_oid = "oid-1", "L1"
+    return [
+        TickEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", 1000, 9000.0, 9001.0, 1.5, 2.5),
+        order,
+        FillEvent(1, "oid-1", "ETHMYR", OrderDir.BID, "0.5", "4500", "0.001", 1000, 1001),
+    ]
+
+
+def test_journal_round_trip(tmp_path):
+    journal = EventJournal(tmp_path, segment_bytes=200)  # small segments, several files
+    written = events() * 5
+    for event in written:
+        journal.append(event)
+    journal.close()
+    assert len(journal.segments) > 1
+    read = list(read_journal(tmp_path))
+    assert [type(e) for _, e in read] == [type(e) for e in written]
+    assert [e.to_tuple() for _, e in read] == [e.to_tuple() for e in written]
+    timestamps = [ts for ts, _ in read]
+    assert timestamps == sorted(timestamps)
+
+
+def test_record_failing_to_encode_does_not_lose_the_batch(tmp_path):
+    journal = EventJournal(tmp_path, flush_interval=60)  # one batch, written on close
+    tick, order, fill = events()
+    bad = TickEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", 1000, object(), 9001.0)  # not marshallable
+    for event in (tick, bad, order, fill):
+        journal.append(event)
+    journal.close()
+    assert journal.dropped == 1
+    assert journal.events == 3
+    assert [e.to_tuple() for _, e in read_journal(tmp_path)] == [e.to_tuple() for e in (tick, order, fill)]
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+
+from src.events import CheckOrderStatusEvent, EventType, Exchange, TickEvent
+from src.events_engine import AsyncEventEngine
+
+
+def tick(i):
+    return TickEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", i, 100.0, 101.0)
+
+
+def test_handler_thread_keeps_the_loop_free_and_the_order():
+    async def main():
+        engine = AsyncEventEngine(handler_thread=True)
+        seen, threads = [], set()
+
+        def on_status(event):
+            threads.add(threading.get_ident())
+            time.sleep(0.2)  # a REST round trip
+            seen.append("status")
+
+        def on_tick(event):
+            threads.add(threading.get_ident())
+            seen.append(event.timestamp)
+
+        engine.register_handler(EventType.CHECK_ORDER_STATUS, on_status)
+        engine.register_handler(EventType.TICK, on_tick)
+        engine.start()
+        engine.put(CheckOrderStatusEvent())
+        engine.put(tick(1))
+        engine.put(tick(2))
+        beats = 0
+        while len(seen) < 3:
+            await asyncio.sleep(0.01)
+            beats += 1  # the loop keeps running during the blocking handler
+        engine.stop()
+        return seen, threads, beats
+
+    seen, threads, beats = asyncio.run(main())
+    assert seen == ["status", 1, 2]
+    assert threading.get_ident() not in threads and len(threads) == 1
+    assert beats >= 10
+
+
+def test_handlers_run_on_the_loop_by_default():
+    async def main():
+        engine = AsyncEventEngine()
+        threads = []
+        engine.register_handler(EventType.TICK, lambda event: threads.append(threading.get_ident()))
+        engine.start()
+        engine.put(tick(1))
+        while not threads:
+            await asyncio.sleep(0)
+        engine.stop()
+        return threads
+
+    assert asyncio.run(main()) == [threading.get_ident()]
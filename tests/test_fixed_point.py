@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import pytest
+
+from src.orderbook.fixed_point import from_scaled_int, from_scaled_int_decimal, scaled_parser, to_scaled_int
+from src.orderbook.orderbook import orderBook
+
+AUTH = {"luno_key_id": "id", "luno_key_secret": "secret"}
+
+
+@pytest.mark.parametrize(
+    "value, scale, expected",
+    [
+        ("1234.5", 2, 123450),
+        ("1234.56", 2, 123456),
+        ("1234", 2, 123400),
+        ("0.000001", 6, 1),
+        ("0.1234567", 6, 123456),  # beyond the scale is truncated
+        ("100.00", 0, 100),
+    ],
+)
+def test_parse_to_scaled_int(value, scale, expected):
+    assert to_scaled_int(value, scale) == expected
+    assert scaled_parser(scale)(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0.01", "99.99", "1234567.89", "0.00"])
+def test_scaled_int_round_trip(value):
+    scaled = to_scaled_int(value, 2)
+    assert from_scaled_int_decimal(scaled, 2) == Decimal(value)
+    assert from_scaled_int(scaled, 2) == float(value)
+
+
+def test_book_parses_into_book_units_and_converts_back():
+    book = orderBook(AUTH, "XBTMYR", price_scale=2, volume_scale=6)
+    book.load_snapshot(
+        {
+            "sequence": "1",
+            "asks": [{"id": "A1", "price": "101.5", "volume": "0.000250"}],
+            "bids": [{"id": "B1", "price": "99.25", "volume": "2"}],
+        }
+    )
+    assert book.asks["A1"] == [10150, 250]
+    assert book.bids["B1"] == [9925, 2000000]
+    assert book.to_price(10150) == 101.5
+    assert book.to_price(10150, as_decimal=True) == Decimal("101.50")
+    assert book.to_volume(250) == 0.00025
+    assert book.to_volume(2000000, as_decimal=True) == Decimal("2")
+    # a Decimal book holds the same values as Decimals
+    decimal_book = orderBook(AUTH, "XBTMYR")
+    decimal_book.load_snapshot(
+        {"sequence": "1", "asks": [{"id": "A1", "price": "101.5", "volume": "0.000250"}], "bids": []}
+    )
+    price, volume = decimal_book.ask_levels.best()
+    assert (decimal_book.to_price(price), decimal_book.to_volume(volume)) == (101.5, 0.00025)
@@ -0,0 +1,64 @@
+from src.event_journal import EventJournal, read_journal
+from src.events import CheckOrderStatusEvent, Exchange, OrderDir, OrderEvent, OrderType, TickEvent
+from src.strategies.journal_replay import JournalReplay
+from src.strategies.strategy_base import StrategyBase
+
+STRAT_CONFIG = {
+    "min_tick_size": {},
+    "strategy": {"quoter": {"params": None, "active": True, "capital": 100000, "instruments": ["ETHMYR.luno"]}},
+}
+
+
+class Quoter(StrategyBase):
+    """Quotes a bid below the touch every other tick, pulls its quotes every fifth"""
+
+    def __init__(self):
+        super().__init__()
+        self.ticks = 0
+        self.seen = []
+
+    def on_tick(self, event):
+        super().on_tick(event)
+        self.ticks += 1
+        self.seen.append(self.now_ms())
+        if self.ticks % 5 == 0:
+            self.cancel_all()
+        elif self.ticks % 2 == 0:
+            self.place_order(OrderEvent(self.id, event.sym, OrderType.LMT, OrderDir.BID, 0.1, event.bid_p - 1))
+
+
+def record(path):
+    journal = EventJournal(path)
+    for i in range(40):
+        bid = 9000.0 + (i % 7) * 2 - (5 if i % 9 == 0 else 0)  # dips cross some resting bids
+        journal.append(TickEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", 1000 + i, bid, bid + 1))
+        if i % 4 == 3:
+            journal.append(CheckOrderStatusEvent())
+    journal.close()
+
+
+def replay(path):
+    strategy = Quoter()
+    result = JournalReplay(path, STRAT_CONFIG, {"quoter": strategy}, {"quoter": ["ETHMYR.luno"]})
+    result.run()
+    return result, strategy
+
+
+def test_replay_is_deterministic(tmp_path):
+    record(tmp_path)
+    first, first_strategy = replay(tmp_path)
+    second, second_strategy = replay(tmp_path)
+    assert first.orders and first.fills
+    assert [o.to_tuple() for o in first.orders] == [o.to_tuple() for o in second.orders]
+    assert [f.to_tuple() for f in first.fills] == [f.to_tuple() for f in second.fills]
+    assert first_strategy.seen == second_strategy.seen
+    assert [o.oid for o in first.orders] == [f"replay-{i}" for i in range(1, len(first.orders) + 1)]
+
+
+def test_replay_clock_reads_recording_times(tmp_path):
+    record(tmp_path)
+    tick_times = [ts / 1e6 for ts, e in read_journal(tmp_path, wall_clock=True) if isinstance(e, TickEvent)]
+    result, strategy = replay(tmp_path)
+    assert strategy.seen == tick_times
+    # every order is stamped with the time of the tick it was placed on
+    assert {o.order_time for o in result.orders} <= set(tick_times)
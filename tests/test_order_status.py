@@ -0,0 +1,89 @@
+from src.events import FillEvent, OrderDir, OrderEvent, OrderType
+from src.orders.order_manager import OrderManager
+from src.orders.order_status import OrderStatusReconciler
+
+
+class FakeBroker:
+    def __init__(self, closed):
+        self.closed = closed  # newest first
+        self.list_calls = 0
+        self.get_calls = 0
+
+    def list_closed_orders(self, pair, created_before=None, limit=100):
+        self.list_calls += 1
+        orders = [o for o in self.closed if created_before is None or o["creation_timestamp"] < created_before]
+        return orders[:limit]
+
+    def get_order(self, oid):
+        self.get_calls += 1
+        return {"status": "PENDING"}
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class Strategy:
+    def __init__(self):
+        self.order_manager = OrderManager("test")
+
+
+def standing(strategy, oid, order_time=1000):
+    order = OrderEvent(1, "XBTMYR", OrderType.LMT, OrderDir.BID, 0.01, 100)
+    order.oid, order.luno_oid, order.order_time = oid, f"L-{oid}", order_time
+    strategy.order_manager.on_new_order(order)
+    return order
+
+
+def closed(oid, base, counter, ts=2000):
+    return {
+        "order_id": f"L-{oid}",
+        "client_order_id": oid,
+        "status": "COMPLETE",
+        "base": base,
+        "counter": counter,
+        "fee_base": "0",
+        "creation_timestamp": ts,
+        "completed_timestamp": ts + 1,
+    }
+
+
+def test_zero_fill_completions_are_cancels_not_fills():
+    strategy = Strategy()
+    filled = standing(strategy, "filled")
+    unfilled = standing(strategy, "unfilled")
+    pending = standing(strategy, "pending")
+    broker = FakeBroker([closed("filled", "0.01", "1.0"), closed("unfilled", "0", "0")])
+    engine = FakeEngine()
+    reconciler = OrderStatusReconciler(broker, engine)
+
+    assert reconciler.reconcile([strategy]) == 1
+    assert [(type(e), e.oid, e.base_volume) for e in engine.events] == [(FillEvent, "filled", 0.01)]
+    manager = strategy.order_manager
+    assert unfilled not in manager.standing_order_set
+    assert unfilled in manager.canceled_order_set
+    assert manager.get_order("unfilled") is None
+    assert set(manager.standing_orders) == {"filled", "pending"}  # filled leaves on its FillEvent
+    assert broker.list_calls == 1
+
+    # the fill is not reported twice, the unfilled order is not checked again
+    assert reconciler.reconcile([strategy]) == 0
+    assert len(engine.events) == 1
+    assert filled in manager.standing_order_set and pending in manager.standing_order_set
+
+
+def test_one_listing_per_page_and_get_order_past_max_pages():
+    strategy = Strategy()
+    for i in range(30):
+        standing(strategy, f"o{i}", order_time=1000)
+    # 25 newer closed orders of others, pages of 10 never reach back to the standing ones
+    broker = FakeBroker([closed(f"x{i}", "1", "1", ts=5000 - i) for i in range(25)])
+    reconciler = OrderStatusReconciler(broker, FakeEngine(), page_limit=10, max_pages=2)
+    assert reconciler.reconcile([strategy]) == 0
+    assert broker.list_calls == 2
+    assert broker.get_calls == 30
+    assert reconciler.calls == 32
@@ -0,0 +1,115 @@
+from src.events import OrderDir, OrderEvent, OrderType
+from src.strategies.strategy_base import StrategyBase
+from src.strategies.strategy_manager import StrategyManager
+from src.strategies.strategy_worker import RemoteStrategy
+
+STRAT_CONFIG = {
+    "min_tick_size": {},
+    "strategy": {"quoter": {"params": None, "active": True, "capital": 100000, "instruments": ["ETHMYR.luno"]}},
+}
+
+
+class FakeBroker:
+    def __init__(self):
+        self.get_calls = 0
+
+    def get_order(self, oid):
+        self.get_calls += 1
+        return {"status": "PENDING"}
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class Clock:
+    def __init__(self):
+        self.now_ms = 0.0
+
+    def __call__(self):
+        return self.now_ms
+
+
+class Quoter(StrategyBase):
+    """Counts its order status checks, as marketMaking's stale order cancels would run"""
+
+    def __init__(self):
+        super().__init__()
+        self.checks = 0
+
+    def on_tick(self, event):
+        super().on_tick(event)
+
+    def on_order_status(self):
+        super().on_order_status()
+        self.checks += 1
+
+
+def setup(interval):
+    broker, clock, strategy = FakeBroker(), Clock(), Quoter()
+    manager = StrategyManager(
+        event_engine=FakeEngine(),
+        primary_broker=broker,
+        strat_config=STRAT_CONFIG,
+        instrument_list={"quoter": ["ETHMYR.luno"]},
+        alerts_system=None,
+        database=None,
+        clock=clock,
+        order_status_interval=interval,
+    )
+    manager.load_strategy(strat_dict={"quoter": strategy})
+    order = OrderEvent(strategy.id, "ETHMYR", OrderType.LMT, OrderDir.BID, 0.1, 9000)
+    order.oid = "standing"
+    strategy.order_manager.on_new_order(order)
+    return manager, broker, clock, strategy
+
+
+def test_strategies_check_every_heartbeat_exchange_polled_every_interval():
+    manager, broker, clock, strategy = setup(interval=30)
+    for second in range(61):  # one check per 1s heartbeat
+        clock.now_ms = second * 1000.0
+        manager.on_order_status()
+    assert strategy.checks == 61
+    assert broker.get_calls == 3  # at 0s, 30s and 60s
+
+
+def test_forced_check_polls_inside_the_interval():
+    manager, broker, clock, strategy = setup(interval=30)
+    manager.on_order_status()
+    clock.now_ms = 5000.0
+    manager.on_order_status()
+    assert broker.get_calls == 1
+    manager.on_order_status(force=True)  # e.g. after a user stream reconnect
+    assert broker.get_calls == 2
+    clock.now_ms = 20000.0
+    manager.on_order_status()
+    assert broker.get_calls == 2  # the interval restarts from the forced poll
+
+
+def test_no_interval_polls_on_every_check():
+    manager, broker, clock, strategy = setup(interval=0)
+    for _ in range(3):
+        manager.on_order_status()
+    assert broker.get_calls == 3
+
+
+def test_worker_strategies_get_the_poll_decision():
+    class Pool:
+        def __init__(self, manager):
+            self._manager = manager
+            self.sent = []
+
+        def send(self, worker, msg):
+            self.sent.append(msg)
+
+    manager, broker, clock, strategy = setup(interval=30)
+    pool = Pool(manager)
+    manager.strat_dict[strategy.id] = RemoteStrategy(pool, 0, strategy)
+    manager.on_order_status()
+    clock.now_ms = 1000.0
+    manager.on_order_status()
+    assert [msg[2] for msg in pool.sent] == [True, False]
@@ -0,0 +1,124 @@
+import json
+import random
+from decimal import Decimal
+
+import pytest
+
+from src.orderbook.decoder import update_from_dict
+from src.orderbook.features import BookFeatures
+from src.orderbook.orderbook import orderBook
+
+AUTH = {"luno_key_id": "id", "luno_key_secret": "secret"}
+
+SNAPSHOT = {
+    "sequence": "10",
+    "asks": [{"id": "A1", "price": "101.50", "volume": "1.000000"}],
+    "bids": [{"id": "B1", "price": "99.25", "volume": "2.000000"}],
+    "timestamp": 1,
+}
+
+
+def book(fixed_point):
+    scales = {"price_scale": 2, "volume_scale": 6} if fixed_point else {}
+    book = orderBook(AUTH, "XBTMYR", **scales)
+    book.load_snapshot(SNAPSHOT)
+    return book
+
+
+def trade_frame(sequence, maker, base, counter):
+    return json.dumps(
+        {
+            "sequence": str(sequence),
+            "trade_updates": [{"base": base, "counter": counter, "maker_order_id": maker, "taker_order_id": "T"}],
+            "timestamp": sequence,
+        }
+    )
+
+
+@pytest.mark.parametrize("fixed_point", [False, True])
+def test_trade_prices_are_floats_in_either_mode(fixed_point):
+    b = book(fixed_point)
+    seen = []
+    b.on_trades = lambda book, trades: seen.extend(trades)
+    b.apply_update(11, b.decoder.decode_update(trade_frame(11, "A1", "0.5", "50.75")))
+    b.apply_update(12, b.decoder.decode_update(trade_frame(12, "B1", "1.0", "99.25")))
+    assert [(t["price"], t["type"]) for t in seen] == [(101.5, "buy"), (99.25, "sell")]
+    assert all(type(t["price"]) is float for t in seen)
+
+
+def recompute(orders: dict, is_bid: bool):
+    """Aggregated [price, volume] levels from the per-order book, best first"""
+    volumes = {}
+    for price, volume in orders.values():
+        volumes[price] = volumes.get(price, 0) + volume
+    return [[p, v] for p, v in sorted(volumes.items(), reverse=is_bid)]
+
+
+@pytest.mark.parametrize("fixed_point", [False, True])
+def test_incremental_levels_and_sums_match_a_full_recompute(fixed_point):
+    rng = random.Random(7)
+    scales = {"price_scale": 2, "volume_scale": 6} if fixed_point else {}
+    b = orderBook(AUTH, "XBTMYR", feature_depths=(1, 3, 5), **scales)
+    b.load_snapshot({"sequence": "0", "asks": [], "bids": []})
+    next_id = 0
+    for step in range(2000):
+        live = list(b.bids) + list(b.asks)
+        action = rng.random()
+        if action < 0.5 or not live:
+            next_id += 1
+            side = rng.choice(["BID", "ASK"])
+            tick = rng.randint(0, 15)  # few prices, so levels are shared
+            price = 100 - tick * 0.25 if side == "BID" else 100.25 + tick * 0.25
+            volume = f"{rng.randint(1, 5) / 10:.6f}"
+            create = {"order_id": f"O{next_id}", "type": side, "price": f"{price:.2f}", "volume": volume}
+            b.handle_create(update_from_dict({"sequence": str(step), "create_update": create}))
+        elif action < 0.8:
+            delete = {"order_id": rng.choice(live)}
+            b.handle_delete(update_from_dict({"sequence": str(step), "delete_update": delete}))
+        else:
+            maker = rng.choice(live)
+            volume = b.to_volume((b.bids.get(maker) or b.asks.get(maker))[1])
+            base = volume if rng.random() < 0.5 else round(volume / 2, 6)  # full or partial fill
+            trade = {"base": f"{base:.6f}", "counter": "1", "maker_order_id": maker}
+            b.handle_trade(update_from_dict({"sequence": str(step), "trade_updates": [trade]}))
+
+        assert b.bid_levels.top() == recompute(b.bids, True)
+        assert b.ask_levels.top() == recompute(b.asks, False)
+        for i, depth in enumerate(b.features.depths):
+            assert b.features._bid_sums[i] == BookFeatures._sum_levels(b.bid_levels, depth)
+            assert b.features._ask_sums[i] == BookFeatures._sum_levels(b.ask_levels, depth)
+    assert len(b.bids) > 5 and len(b.asks) > 5  # the book got deeper than the tracked depths
+
+
+def test_features_match_their_formulas():
+    b = orderBook(AUTH, "XBTMYR", feature_depths=(1, 2))
+    b.load_snapshot(
+        {
+            "sequence": "0",
+            "bids": [
+                {"id": "B1", "price": "99", "volume": "1"},
+                {"id": "B2", "price": "99", "volume": "2"},
+                {"id": "B3", "price": "98", "volume": "4"},
+                {"id": "B4", "price": "97", "volume": "8"},
+            ],
+            "asks": [
+                {"id": "A1", "price": "101", "volume": "1"},
+                {"id": "A2", "price": "102", "volume": "5"},
+            ],
+        }
+    )
+    b.update_features(levels=2)
+    # top 2 levels: bids 99 x 3, 98 x 4; asks 101 x 1, 102 x 5
+    vwap_b, vwap_a = Decimal(99 * 3 + 98 * 4) / 7, Decimal(101 * 1 + 102 * 5) / 6
+    assert b.vamp == (vwap_b + vwap_a) / 2
+    assert b.mid_price == 100
+    assert b.microprice == Decimal(99 * 1 + 101 * 3) / 4
+    assert b.order_imbalance == Decimal(7) / 13
+
+    # the best ask goes, 102 becomes the top and the features follow
+    b.handle_delete(update_from_dict({"sequence": "1", "delete_update": {"order_id": "A1"}}))
+    b.update_features(levels=2)
+    assert b.mid_price == Decimal("100.5")
+    assert b.microprice == Decimal(99 * 5 + 102 * 3) / 8
+    assert b.vamp == (vwap_b + 102) / 2
+    assert b.order_imbalance == Decimal(7) / 12
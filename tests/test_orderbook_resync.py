@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+from src.orderbook import orderbook as orderbook_module
+from src.orderbook.orderbook import ConnectionThrottle, orderBook
+
+AUTH = {"luno_key_id": "id", "luno_key_secret": "secret"}
+
+
+def snapshot(sequence):
+    return json.dumps(
+        {
+            "sequence": str(sequence),
+            "asks": [{"id": "A1", "price": "101", "volume": "1"}],
+            "bids": [{"id": "B1", "price": "99", "volume": "1"}],
+            "timestamp": 1,
+        }
+    )
+
+
+def create(sequence, order_id, side, price):
+    return json.dumps(
+        {
+            "sequence": str(sequence),
+            "create_update": {"order_id": order_id, "type": side, "price": price, "volume": "1"},
+            "delete_update": None,
+            "trade_updates": None,
+            "timestamp": sequence,
+        }
+    )
+
+
+class FakeSocket:
+    """Stream session replaying frames, then waiting until closed"""
+
+    def __init__(self, frames):
+        self.frames = asyncio.Queue()
+        for frame in frames:
+            self.frames.put_nowait(frame)
+        self.closed = False
+
+    async def send(self, msg):
+        pass
+
+    async def recv(self):
+        return await self.frames.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        frame = await self.frames.get()
+        if frame is None:
+            raise StopAsyncIteration
+        return frame
+
+    async def close(self):
+        self.closed = True
+        self.frames.put_nowait(None)
+
+
+def patch_connect(monkeypatch, sessions):
+    """websockets.connect returns the next session, or raises it if it is an exception"""
+    attempts = []
+
+    async def connect(url):
+        attempts.append(url)
+        session = sessions.pop(0)
+        if isinstance(session, Exception):
+            raise session
+        return session
+
+    monkeypatch.setattr(orderbook_module.websockets, "connect", connect)
+    return attempts
+
+
+def new_book():
+    return orderBook(AUTH, "XBTMYR", throttle=ConnectionThrottle(backoff=0), reorder_window=2)
+
+
+def gap_frames():
+    # 11 applies, 13..15 wait for 12 until the reorder window overflows and a resync starts
+    return [snapshot(10), create(11, "B2", "BID", "98"), create(13, "A2", "ASK", "102"),
+            create(14, "A3", "ASK", "103"), create(15, "A4", "ASK", "104")]
+
+
+def test_failed_resync_reconnects_from_run(monkeypatch):
+    first = FakeSocket(gap_frames())
+    second = FakeSocket([snapshot(20), create(21, "B3", "BID", "100")])
+    attempts = patch_connect(monkeypatch, [first, OSError("snapshot session refused"), second])
+    book = new_book()
+
+    async def scenario():
+        task = asyncio.create_task(book.run())
+        for _ in range(100):
+            await asyncio.sleep(0)
+            if book.ws is second and book.sequence == 21:
+                break
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert len(attempts) == 3  # session, failed snapshot session, one reconnect
+    assert first.closed
+    assert book.stats["gaps"] == 1
+    assert book.stats["resyncs"] == 1
+    assert book.stats["reconnects"] == 1
+    assert book.synced
+    assert book.sequence == 21
+    assert book.mid_price is not None
+    assert book.microprice is not None
+    assert book.vamp is not None
+
+
+def test_failed_reconnect_after_failed_resync_raises_from_run(monkeypatch):
+    patch_connect(
+        monkeypatch,
+        [FakeSocket(gap_frames()), OSError("snapshot session refused"), OSError("connect refused")],
+    )
+    book = new_book()
+
+    async def scenario():
+        with pytest.raises(OSError, match="connect refused"):
+            await asyncio.wait_for(book.run(), timeout=5)
+
+    asyncio.run(scenario())
+    assert book.ws is None
+    assert book._resync_task is None
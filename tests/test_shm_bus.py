@@ -0,0 +1,71 @@
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from src.marketdata.shm_bus import MarketDataBusSubscriber, MarketDataBusWriter
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+        self.threads = set()
+
+    def put(self, event):
+        self.threads.add(threading.current_thread().name)
+        self.events.append(event)
+
+
+def test_subscriber_polls_on_its_own_thread_and_reads_levels():
+    name = f"cts_test_bus_{os.getpid()}"
+    writer = MarketDataBusWriter(["ETHMYR.luno", "XBTMYR.luno"], name=name, depth=3)
+    engine = FakeEngine()
+    subscriber = MarketDataBusSubscriber(engine, ["ETHMYR.luno"], name=name)
+    try:
+        subscriber.start()
+        writer.publish("ETHMYR.luno", 1, 100.0, 101.0, 2.0, None, bids=[[100.0, 2.0], [99.0, 1.0]], asks=[[101.0, 3.0]])
+        writer.publish("XBTMYR.luno", 1, 1.0, 2.0)  # not subscribed
+        deadline = time.monotonic() + 5
+        while not engine.events and time.monotonic() < deadline:
+            time.sleep(0.001)
+        assert [(e.code, e.bid_p, e.ask_p, e.bid_v, e.ask_v) for e in engine.events] == [
+            ("ETHMYR.luno", 100.0, 101.0, 2.0, None)
+        ]
+        assert engine.threads == {"md-bus"}
+        assert subscriber.levels("ETHMYR.luno") == ([[100.0, 2.0], [99.0, 1.0]], [[101.0, 3.0]])
+        assert subscriber.levels("XBTMYR.luno") == ([], [])
+    finally:
+        subscriber.close()
+        writer.close()
+
+
+def test_second_writer_does_not_take_over_a_live_bus():
+    name = f"cts_test_bus_live_{os.getpid()}"
+    writer = MarketDataBusWriter(["ETHMYR.luno"], name=name)
+    try:
+        with pytest.raises(FileExistsError, match="is live"):
+            MarketDataBusWriter(["ETHMYR.luno"], name=name)
+        assert struct.unpack_from("<H", writer._buf, 10)[0] == 1  # still live for its readers
+        writer.publish("ETHMYR.luno", 1, 100.0, 101.0)
+    finally:
+        writer.close()
+
+
+def test_writer_replaces_a_bus_left_by_a_dead_feed():
+    name = f"cts_test_bus_stale_{os.getpid()}"
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    crashed = MarketDataBusWriter(["ETHMYR.luno"], name=name)
+    struct.pack_into("<I", crashed._buf, 24, dead.pid)  # as if written by the exited process
+    writer = MarketDataBusWriter(["ETHMYR.luno", "XBTMYR.luno"], name=name)
+    try:
+        assert struct.unpack_from("<H", crashed._shm.buf, 10)[0] == 2  # readers of the old one see it closed
+        writer.publish("XBTMYR.luno", 1, 1.0, 2.0)
+    finally:
+        writer.close()
+        crashed._buf = None
+        crashed._shm.close()
@@ -0,0 +1,89 @@
+import pytest
+
+from src.orderbook.orderbook import orderBook
+from src.orderbook.snapshot import load_snapshot, save_snapshot
+
+AUTH = {"luno_key_id": "id", "luno_key_secret": "secret"}
+
+SCALES = {
+    "decimal": {},
+    "fixed_point": {"price_scale": 2, "volume_scale": 6},
+    "fixed_point_int64": {"price_scale": 8, "volume_scale": 8},  # values past int32
+}
+
+
+def book(scales):
+    b = orderBook(AUTH, "XBTMYR", **scales)
+    b.load_snapshot(
+        {
+            "sequence": "41",
+            "timestamp": 1700000000000,
+            "bids": [
+                {"id": "B1", "price": "99.25", "volume": "1.5"},
+                {"id": "B2", "price": "99.25", "volume": "0.25"},
+                {"id": "B3", "price": "98.00", "volume": "40"},
+            ],
+            "asks": [
+                {"id": "A1", "price": "101.50", "volume": "0.000001"},
+                {"id": "A2", "price": "150000.00", "volume": "3"},
+            ],
+        }
+    )
+    return b
+
+
+@pytest.mark.parametrize("mode", list(SCALES))
+def test_save_then_load_gives_the_same_book(tmp_path, mode):
+    original = book(SCALES[mode])
+    path = tmp_path / "XBTMYR.bin"
+    original.save_states(path)
+
+    restored = orderBook(AUTH, "XBTMYR", **SCALES[mode])
+    assert restored.load_states(path)
+    assert restored.sequence == original.sequence
+    assert restored.timestamp == original.timestamp
+    assert restored.bids == original.bids
+    assert restored.asks == original.asks
+    assert restored._order_index == original._order_index
+    assert restored.bid_levels.top() == original.bid_levels.top()
+    assert restored.ask_levels.top() == original.ask_levels.top()
+    original.update_features()
+    for feature in ("vamp", "mid_price", "microprice", "order_imbalance"):
+        assert getattr(restored, feature) == getattr(original, feature)
+    assert not restored.synced  # usable, until the stream confirms it
+
+
+def test_int64_values_widen_the_encoding(tmp_path):
+    original = book(SCALES["fixed_point_int64"])
+    path = tmp_path / "XBTMYR.bin"
+    original.save_states(path)
+    data = load_snapshot(path)
+    assert data["asks"]["A2"] == [15000000000000, 300000000]
+
+
+def test_snapshot_of_another_book_is_not_loaded(tmp_path):
+    path = tmp_path / "XBTMYR.bin"
+    book(SCALES["fixed_point"]).save_states(path)
+    assert not orderBook(AUTH, "XBTMYR").load_states(path)  # Decimal book, fixed-point snapshot
+    assert not orderBook(AUTH, "ETHMYR", price_scale=2, volume_scale=6).load_states(path)
+    path.write_bytes(b"not a snapshot")
+    assert not orderBook(AUTH, "XBTMYR", price_scale=2, volume_scale=6).load_states(path)
+
+
+@pytest.mark.parametrize("mode", list(SCALES))
+def test_cut_short_snapshot_is_not_loaded(tmp_path, mode):
+    path = tmp_path / "XBTMYR.bin"
+    book(SCALES[mode]).save_states(path)
+    path.write_bytes(path.read_bytes()[:-3])  # e.g. the disk filled up
+    with pytest.raises(ValueError):
+        load_snapshot(path)
+    restored = orderBook(AUTH, "XBTMYR", **SCALES[mode])
+    assert not restored.load_states(path)
+    assert restored.sequence is None and restored.bids == {}
+
+
+def test_save_snapshot_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / "book.bin"
+    save_snapshot(path, "XBTMYR", 1, 2, [], [], {}, {})
+    assert [p.name for p in tmp_path.iterdir()] == ["book.bin"]
+    assert load_snapshot(path)["sequence"] == 1
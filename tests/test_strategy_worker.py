@@ -0,0 +1,103 @@
+import threading
+import time
+
+from src.events import Exchange, OrderDir, OrderEvent, OrderType, TickEvent
+from src.strategies.strategy_base import StrategyBase
+from src.strategies.strategy_worker import StrategyWorkerPool
+
+
+class RoundTripStrategy(StrategyBase):
+    """Places an order per tick and reports what came back from the parent"""
+
+    def on_tick(self, event):
+        broker = self.strategy_manager._broker
+        if event.sym == "SLOW":
+            broker.slow()
+        order = OrderEvent(self.id, event.sym, OrderType.LMT, OrderDir.BID, 0.01, event.bid_p)
+        self.place_order(order)
+        status = broker.get_order(order.oid)["state"]
+        self.strategy_manager._event_engine.put(("placed", self.id, order.oid, order.luno_oid, status))
+
+
+class FakeBroker:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_order(self, oid):
+        return {"order_id": f"L-{oid}", "state": "PENDING"}
+
+    def slow(self):
+        self.release.wait(10)
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class FakeManager:
+    def __init__(self):
+        self._broker = FakeBroker()
+        self._event_engine = FakeEngine()
+        self._alerts = None
+        self.sym_tick_size_dict = {}
+        self.order_status_reconciler = None
+
+    def place_order(self, event, check_risk=False):
+        event.oid = f"oid-{event.sid}"
+        event.luno_oid = f"L-{event.oid}"
+
+
+def tick(sym):
+    return TickEvent(sym, Exchange.LUNO, f"{sym}.luno", 0, 100, 101)
+
+
+def start_pool(manager, symbols):
+    pool = StrategyWorkerPool(manager, n_workers=len(symbols))
+    proxies = []
+    for sid, sym in enumerate(symbols, start=1):
+        strategy = RoundTripStrategy()
+        strategy.id, strategy.name, strategy.active = sid, f"s{sid}", True
+        strategy.set_symbols([f"{sym}.luno"])
+        proxies.append(pool.add(strategy))
+    pool.start()
+    return pool, proxies
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_worker_rpc_round_trip():
+    manager = FakeManager()
+    pool, proxies = start_pool(manager, ["XBTMYR"])
+    try:
+        proxies[0].on_tick(tick("XBTMYR"))
+        assert wait_for(lambda: manager._event_engine.events)
+        # placement fields set by the parent reached the worker's copy of the order
+        assert manager._event_engine.events == [("placed", 1, "oid-1", "L-oid-1", "PENDING")]
+    finally:
+        pool.stop()
+
+
+def test_slow_call_only_blocks_its_own_worker():
+    manager = FakeManager()
+    pool, proxies = start_pool(manager, ["SLOW", "XBTMYR"])
+    try:
+        proxies[0].on_tick(tick("SLOW"))
+        proxies[1].on_tick(tick("XBTMYR"))
+        assert wait_for(lambda: manager._event_engine.events)
+        assert [e[1] for e in manager._event_engine.events] == [2]  # worker 1 got through
+        manager._broker.release.set()
+        assert wait_for(lambda: len(manager._event_engine.events) == 2)
+    finally:
+        manager._broker.release.set()
+        pool.stop()
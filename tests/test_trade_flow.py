@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.events import Exchange, OrderDir, TickEvent, TradeEvent
+from src.marketdata.trade_flow import TradeFlow
+from src.strategies.market_making_strategy import marketMaking
+
+
+def test_vwap_and_imbalance_over_each_window():
+    flow = TradeFlow(windows=(10, 60))
+    flow.add(100.0, 10.0, 1.0, is_buy=True)
+    flow.add(101.5, 20.0, 3.0, is_buy=False)
+    flow.add(150.0, 30.0, 2.0, is_buy=True)
+    assert flow.vwap(60) == pytest.approx((10 * 1 + 20 * 3 + 30 * 2) / 6)
+    assert flow.imbalance(60) == pytest.approx((1 - 3 + 2) / 6)
+    assert flow.count(60) == 3 and flow.buy_count(60) == 2
+    # the 10s window only holds the last trade
+    assert flow.count(10) == 1
+    assert flow.vwap(10) == pytest.approx(30.0)
+    assert flow.imbalance(10) == pytest.approx(1.0)
+
+
+def test_windows_expire_with_now_without_new_trades():
+    flow = TradeFlow(windows=(10, 60))
+    for i in range(5):
+        flow.add(100.0 + i, 10.0, 1.0, is_buy=True)
+    assert flow.count(10, now=104.5) == 5
+    assert flow.count(10, now=112.0) == 2  # trades at 100-102 left the 10s window
+    assert flow.count(60, now=112.0) == 5
+    assert flow.count(10, now=120.0) == 0
+    assert flow.vwap(10, now=120.0) is None
+    assert flow.imbalance(10, now=120.0) == 0.0
+    assert flow.count(60, now=1000.0) == 0  # past every window
+    flow.add(1001.0, 12.0, 2.0, is_buy=False)
+    assert flow.count(60) == 1 and flow.imbalance(60) == -1.0
+
+
+def test_window_not_tracked():
+    with pytest.raises(ValueError):
+        TradeFlow(windows=(10,)).count(60)
+
+
+def market_maker(flow, clock):
+    strategy = marketMaking()
+    strategy.flow_window = 10
+    strategy.max_flow_imbalance = 0.5
+    strategy.min_flow_trades = 3
+    strategy.strategy_manager = SimpleNamespace(trade_flows={"ETHMYR.luno": flow}, clock=clock)
+    return strategy
+
+
+def test_regime_suitable_again_once_a_burst_goes_quiet():
+    flow = TradeFlow(windows=(10,))
+    now = {"ms": 0.0}
+    strategy = market_maker(flow, lambda: now["ms"])
+    for i in range(5):  # one-sided buying
+        flow.on_trade(
+            TradeEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", 100_000 + i * 100, 9000.0, 1.0, OrderDir.BID)
+        )
+    tick = TickEvent("ETHMYR", Exchange.LUNO, "ETHMYR.luno", 100_500, 8999.0, 9001.0)
+    now["ms"] = 100_500.0
+    assert not strategy.regime_suitable(tick)
+    now["ms"] = 130_000.0  # no trades since
+    assert strategy.regime_suitable(tick)
@@ -0,0 +1,124 @@
+from src.brokerage.luno.user_stream import LunoUserStream
+from src.events import FillEvent, OrderDir, OrderEvent, OrderType
+from src.orders.order_manager import OrderManager
+from src.orders.order_status import OrderStatusReconciler
+from src.strategies.strategy_base import StrategyBase
+from src.strategies.strategy_manager import StrategyManager
+
+AUTH = {"luno_key_id": "id", "luno_key_secret": "secret"}
+STRAT_CONFIG = {
+    "min_tick_size": {},
+    "strategy": {"quoter": {"params": None, "active": True, "capital": 100000, "instruments": ["ETHMYR.luno"]}},
+}
+
+
+class FakeEngine:
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+
+class FakeBroker:
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+
+    def cancel_order(self, luno_oid):
+        pass
+
+    def get_order(self, oid):
+        return self.statuses.get(oid, {"status": "PENDING"})
+
+    def list_closed_orders(self, pair, created_before=None, limit=100):
+        return [dict(info, client_order_id=oid) for oid, info in self.statuses.items()]
+
+
+class FakeAlerts:
+    def send_telegram_message(self, message):
+        pass
+
+
+class FakeDatabase(dict):
+    def __missing__(self, key):
+        return FakeCollection()
+
+
+class FakeCollection:
+    def insert_one(self, doc):
+        pass
+
+
+class Quoter(StrategyBase):
+    def on_tick(self, event):
+        super().on_tick(event)
+
+
+def setup(broker, batch_order_status=False):
+    stream = LunoUserStream(AUTH, FakeEngine())
+    strategy = Quoter()
+    manager = StrategyManager(
+        event_engine=FakeEngine(),
+        primary_broker=broker,
+        strat_config=STRAT_CONFIG,
+        instrument_list={"quoter": ["ETHMYR.luno"]},
+        alerts_system=FakeAlerts(),
+        database=FakeDatabase(),
+        batch_order_status=batch_order_status,
+    )
+    manager.user_stream = stream
+    manager.load_strategy(strat_dict={"quoter": strategy})
+    return stream, manager, strategy
+
+
+def placed(manager, strategy, oid):
+    order = OrderEvent(strategy.id, "ETHMYR", OrderType.LMT, OrderDir.BID, 0.1, 9000)
+    order.oid, order.luno_oid, order.order_time = oid, None, 1000
+    manager._set_luno_oid(order, f"L-{oid}")  # tracks it, as on placement
+    strategy.order_manager.on_new_order(order)
+    return order
+
+
+def closed(base):
+    return {
+        "status": "COMPLETE",
+        "base": base,
+        "counter": "900" if base != "0" else "0",
+        "fee_base": "0",
+        "creation_timestamp": 2000,
+        "completed_timestamp": 2001,
+        "order_id": "",
+    }
+
+
+def test_stream_completion_untracks():
+    stream, manager, strategy = setup(FakeBroker())
+    placed(manager, strategy, "a")
+    fill = {"order_id": "L-a", "base_fill": "0.1", "counter_fill": "900"}
+    stream.handle_message({"type": "order_fill", "order_fill_update": fill})
+    stream.handle_message({"type": "order_status", "order_status_update": {"order_id": "L-a", "status": "COMPLETE"}})
+    assert stream._orders == {} and stream._luno_oids == {} and stream._fills == {}
+
+
+def test_cancels_and_polled_fills_untrack():
+    broker = FakeBroker({"filled": closed("0.1"), "unfilled": closed("0")})
+    stream, manager, strategy = setup(broker)
+    for oid in ("cancelled", "filled", "unfilled", "standing"):
+        placed(manager, strategy, oid)
+    strategy.cancel_orders([strategy.order_manager.get_order("cancelled")])
+    manager.on_order_status()  # polls get_order: one fill, one closed unfilled
+    for event in manager._event_engine.events:
+        if isinstance(event, FillEvent):
+            manager.on_fill(event)
+    assert list(stream._luno_oids) == ["standing"]
+    assert list(stream._orders) == ["L-standing"]
+
+
+def test_reconciler_untracks_orders_closed_unfilled():
+    broker = FakeBroker({"unfilled": closed("0")})
+    stream, manager, strategy = setup(broker, batch_order_status=True)
+    placed(manager, strategy, "unfilled")
+    placed(manager, strategy, "standing")
+    broker.statuses["unfilled"]["order_id"] = "L-unfilled"
+    manager.on_order_status()
+    assert list(stream._luno_oids) == ["standing"]